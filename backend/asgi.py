@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Las vistas async del catálogo (store/asincrono.py) son opcionales:
+# CATALOGO_ASINCRONO=1 al lanzar el servidor ASGI
 
 application = get_asgi_application()
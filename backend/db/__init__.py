@@ -0,0 +1,5 @@
+# backend/db/__init__.py
+#
+# Motores de base de datos con pool de conexiones:
+#   backend.db.mysql    → django.db.backends.mysql + pool
+#   backend.db.sqlite3  → django.db.backends.sqlite3 + pool (desarrollo/tests)
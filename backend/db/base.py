@@ -0,0 +1,69 @@
+# backend/db/base.py
+#
+# Mixin que conecta un DatabaseWrapper de Django con PoolConexiones.
+#
+# Django sigue gestionando la conexión como siempre (se abre en la primera
+# consulta y se cierra al terminar la petición con CONN_MAX_AGE=0); solo
+# cambia de dónde sale y a dónde va la conexión del driver:
+#
+#   get_new_connection → pool.obtener()
+#   _close             → rollback si quedó una transacción + pool.devolver()
+#
+# Así vale igual para WSGI (un hilo por petición) y ASGI (el ORM corre en
+# hilos de sync_to_async): la conexión nunca queda atada a un hilo.
+
+from .pool import PoolConexiones, configuracion, obtener_pool
+
+
+class PoolMixin:
+
+    def validar_conexion(self, conexion):
+        """True si la conexión del driver sigue viva (la define cada motor)."""
+        raise NotImplementedError
+
+    def usar_pool(self):
+        return True
+
+    def pool(self):
+        config = configuracion(self.settings_dict)
+        clave = tuple(self.settings_dict.get(k) for k in ('NAME', 'HOST', 'PORT', 'USER'))
+        crear_conexion = super().get_new_connection
+
+        return obtener_pool(self.alias, clave, lambda: PoolConexiones(
+            crear=lambda conn_params=self.get_connection_params(): crear_conexion(conn_params),
+            validar=self.validar_conexion,
+            cerrar=lambda conexion: conexion.close(),
+            tamano=config['TAMANO'],
+            espera=config['ESPERA'],
+            max_edad=config['MAX_EDAD'],
+            verificar_despues=config['VERIFICAR_DESPUES'],
+        ))
+
+    def get_new_connection(self, conn_params):
+        if not self.usar_pool():
+            self._pool_prestamo, self.conexion_nueva = None, True
+            return super().get_new_connection(conn_params)
+        self._pool_prestamo = self.pool()
+        conexion, self.conexion_nueva = self._pool_prestamo.obtener()
+        return conexion
+
+    def init_connection_state(self):
+        # El estado de sesión (sql_mode, SQL_AUTO_IS_NULL, PRAGMAs...) ya
+        # quedó aplicado la primera vez que se abrió la conexión.
+        if self.conexion_nueva:
+            super().init_connection_state()
+
+    def _close(self):
+        if self.connection is None or self._pool_prestamo is None:
+            return super()._close()
+        conexion, pool = self.connection, self._pool_prestamo
+        reutilizable = not self.in_atomic_block
+        if reutilizable and self.errors_occurred:
+            reutilizable = self.is_usable()
+        if reutilizable and not self.get_autocommit():
+            try:
+                with self.wrap_database_errors:
+                    conexion.rollback()
+            except Exception:
+                reutilizable = False
+        pool.devolver(conexion, reutilizable)
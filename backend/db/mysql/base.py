@@ -0,0 +1,15 @@
+# backend/db/mysql/base.py
+#
+# ENGINE = 'backend.db.mysql': el motor MySQL de Django con pool de
+# conexiones (ver backend/db/base.py).
+
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from ..base import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, MySQLDatabaseWrapper):
+
+    def validar_conexion(self, conexion):
+        conexion.ping()
+        return True
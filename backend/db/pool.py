@@ -0,0 +1,255 @@
+# backend/db/pool.py
+#
+# Pool de conexiones a la base de datos para los motores de backend/db/.
+#
+# Django abre una conexión nueva por petición (CONN_MAX_AGE=0) o guarda
+# una por hilo (CONN_MAX_AGE>0). Ninguna de las dos sirve bien bajo ASGI
+# ni con muchos hilos: aquí las conexiones se comparten entre hilos del
+# proceso. Django sigue "cerrando" la conexión al terminar cada petición,
+# pero en realidad vuelve al pool y la próxima petición (de cualquier
+# hilo) la reutiliza sin TCP, handshake ni init_command.
+#
+# - Tamaño máximo y espera configurables (PoolAgotado si se excede).
+# - Se verifica la conexión antes de reutilizarla si estuvo ociosa más de
+#   VERIFICAR_DESPUES segundos, y se descarta pasada MAX_EDAD.
+# - Consciente del PID: tras un fork (gunicorn --preload) el hijo no
+#   reutiliza los sockets del padre.
+# - Métricas: en uso, libres, esperas, tiempos de conexión.
+#
+# Configuración en DATABASES[alias]['POOL'] (ver settings.py).
+
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+DEFAULTS = {
+    'TAMANO': 10,              # conexiones abiertas como máximo
+    'ESPERA': 5.0,             # segundos esperando una libre antes de fallar
+    'MAX_EDAD': 600.0,         # segundos de vida de una conexión
+    'VERIFICAR_DESPUES': 1.0,  # ociosa más que esto → se verifica antes de usarla
+}
+
+
+class PoolAgotado(OperationalError):
+    pass
+
+
+class PoolConexiones:
+    """
+    Pool thread-safe de conexiones crudas del driver.
+
+    crear():        abre una conexión nueva
+    validar(con):   True si sigue viva (p. ej. ping)
+    cerrar(con):    la cierra
+    """
+
+    def __init__(self, crear, validar, cerrar, tamano=10, espera=5.0, max_edad=600.0,
+                 verificar_despues=1.0, reloj=time.monotonic):
+        self.crear = crear
+        self.validar = validar
+        self.cerrar = cerrar
+        self.tamano = tamano
+        self.espera = espera
+        self.max_edad = max_edad
+        self.verificar_despues = verificar_despues
+        self.reloj = reloj
+
+        self._cond = threading.Condition(threading.Lock())
+        self._retirado = False
+        self._reiniciar_estado()
+
+    def _reiniciar_estado(self):
+        self._pid = os.getpid()
+        self._libres = deque()      # (conexion, creada_en, devuelta_en)
+        self._en_uso = {}           # id(conexion) → creada_en
+        self._abriendo = 0
+        self._contadores = {
+            'conexiones_creadas': 0,
+            'conexiones_descartadas': 0,
+            'verificaciones_fallidas': 0,
+            'esperas': 0,
+            'espera_total_s': 0.0,
+            'agotado': 0,
+            'conexion_total_s': 0.0,
+            'conexion_max_s': 0.0,
+        }
+
+    def _revisar_fork(self):
+        # Las conexiones heredadas del padre no se cierran (el socket es
+        # compartido con él): solo se olvidan.
+        if self._pid != os.getpid():
+            self._reiniciar_estado()
+
+    def _total(self):
+        return len(self._libres) + len(self._en_uso) + self._abriendo
+
+    # ------------------------------
+    # Préstamo / devolución
+    # ------------------------------
+
+    def obtener(self):
+        """Presta una conexión → (conexion, nueva)."""
+        inicio_espera = None
+        with self._cond:
+            self._revisar_fork()
+            while True:
+                while self._libres:
+                    conexion, creada, devuelta = self._libres.pop()   # LIFO: la más "caliente"
+                    ahora = self.reloj()
+                    if ahora - creada >= self.max_edad:
+                        self._descartar(conexion)
+                        continue
+                    if ahora - devuelta >= self.verificar_despues and not self._validar(conexion):
+                        self._contadores['verificaciones_fallidas'] += 1
+                        self._descartar(conexion)
+                        continue
+                    self._en_uso[id(conexion)] = creada
+                    self._fin_espera(inicio_espera)
+                    return conexion, False
+
+                if self._total() < self.tamano:
+                    self._abriendo += 1
+                    break
+
+                if inicio_espera is None:
+                    inicio_espera = self.reloj()
+                    self._contadores['esperas'] += 1
+                restante = self.espera - (self.reloj() - inicio_espera)
+                if restante <= 0:
+                    self._contadores['agotado'] += 1
+                    self._fin_espera(inicio_espera)
+                    raise PoolAgotado(
+                        f"No hay conexiones libres ({self.tamano} en uso) tras {self.espera} s"
+                    )
+                self._cond.wait(restante)
+            self._fin_espera(inicio_espera)
+
+        # La conexión se abre fuera del lock
+        inicio = self.reloj()
+        try:
+            conexion = self.crear()
+        except BaseException:
+            with self._cond:
+                self._abriendo -= 1
+                self._cond.notify()
+            raise
+        duracion = self.reloj() - inicio
+        with self._cond:
+            self._abriendo -= 1
+            self._en_uso[id(conexion)] = inicio
+            self._contadores['conexiones_creadas'] += 1
+            self._contadores['conexion_total_s'] += duracion
+            self._contadores['conexion_max_s'] = max(self._contadores['conexion_max_s'], duracion)
+        return conexion, True
+
+    def devolver(self, conexion, reutilizable=True):
+        with self._cond:
+            if self._pid != os.getpid():
+                # Conexión prestada antes de un fork: pertenece al padre
+                return
+            creada = self._en_uso.pop(id(conexion), None)
+            if creada is None:
+                # No es de este pool (o ya se devolvió)
+                return
+            if reutilizable and not self._retirado and self.reloj() - creada < self.max_edad:
+                self._libres.append((conexion, creada, self.reloj()))
+            else:
+                self._descartar(conexion)
+            self._cond.notify()
+
+    def _validar(self, conexion):
+        try:
+            return bool(self.validar(conexion))
+        except Exception:
+            return False
+
+    def _descartar(self, conexion):
+        self._contadores['conexiones_descartadas'] += 1
+        try:
+            self.cerrar(conexion)
+        except Exception:
+            pass
+
+    def _fin_espera(self, inicio_espera):
+        if inicio_espera is not None:
+            self._contadores['espera_total_s'] += self.reloj() - inicio_espera
+
+    def cerrar_todas(self):
+        """Cierra las conexiones libres (las prestadas no se tocan)."""
+        with self._cond:
+            self._revisar_fork()
+            while self._libres:
+                self._descartar(self._libres.pop()[0])
+
+    def retirar(self):
+        """Cierra las libres y las prestadas según vayan volviendo."""
+        with self._cond:
+            self._retirado = True
+        self.cerrar_todas()
+
+    # ------------------------------
+    # Métricas
+    # ------------------------------
+
+    def metricas(self):
+        with self._cond:
+            self._revisar_fork()
+            creadas = self._contadores['conexiones_creadas']
+            return {
+                'pid': self._pid,
+                'tamano': self.tamano,
+                'en_uso': len(self._en_uso),
+                'libres': len(self._libres),
+                **self._contadores,
+                'conexion_media_ms': (
+                    round(self._contadores['conexion_total_s'] / creadas * 1000, 3) if creadas else None
+                ),
+            }
+
+
+# ==============================
+# Pools del proceso (uno por alias)
+# ==============================
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def obtener_pool(alias, clave, fabrica):
+    """
+    Pool del alias; `fabrica()` lo crea la primera vez. Si cambia la
+    `clave` (otra base de datos para el mismo alias, p. ej. la de tests)
+    se reemplaza el pool anterior.
+    """
+    with _lock:
+        actual = _pools.get(alias)
+        if actual is not None and actual[0] == clave:
+            return actual[1]
+        pool = fabrica()
+        _pools[alias] = (clave, pool)
+    if actual is not None:
+        actual[1].retirar()
+    return pool
+
+
+def configuracion(settings_dict):
+    config = dict(DEFAULTS)
+    config.update(settings_dict.get('POOL') or {})
+    return config
+
+
+def metricas_pools():
+    """{alias: métricas} de los pools de este proceso."""
+    with _lock:
+        pools = {alias: pool for alias, (_, pool) in _pools.items()}
+    return {alias: pool.metricas() for alias, pool in pools.items()}
+
+
+def cerrar_pools():
+    with _lock:
+        pools = [pool for _, pool in _pools.values()]
+    for pool in pools:
+        pool.cerrar_todas()
@@ -0,0 +1,19 @@
+# backend/db/sqlite3/base.py
+#
+# ENGINE = 'backend.db.sqlite3': el motor SQLite de Django con pool de
+# conexiones. Sirve para desarrollo y para probar el pool sin MySQL; las
+# bases en memoria no se agrupan (cerrarlas las destruye).
+
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..base import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, SQLiteDatabaseWrapper):
+
+    def validar_conexion(self, conexion):
+        conexion.execute('SELECT 1').fetchone()
+        return True
+
+    def usar_pool(self):
+        return not self.is_in_memory_db()
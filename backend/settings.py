@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: mide la petición completa (store/metricas.py)
+    'store.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     
@@ -92,7 +94,126 @@ DATABASES = {
     }
 }
 
+# --- (Agregado) SQLite para tests / desarrollo sin MySQL ---
+# DJANGO_DB_ENGINE=sqlite python manage.py test store
+if os.environ.get('DJANGO_DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# --- (Agregado) Pool de conexiones ---
+# DJANGO_DB_POOL=1 cambia el motor por su versión con pool (backend.db.mysql
+# o backend.db.sqlite3): las conexiones se reutilizan entre peticiones e
+# hilos del proceso en vez de abrirse y cerrarse en cada una. CONN_MAX_AGE
+# debe quedar en 0: es el pool quien las mantiene abiertas.
+# Métricas en GET /api/v1/sistema/db/.
+if os.environ.get('DJANGO_DB_POOL'):
+    DATABASES['default']['ENGINE'] = 'backend.db.' + DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+    DATABASES['default']['POOL'] = {
+        'TAMANO': int(os.environ.get('DJANGO_DB_POOL_TAMANO', 10)),           # por proceso
+        'ESPERA': float(os.environ.get('DJANGO_DB_POOL_ESPERA', 5)),          # s hasta PoolAgotado
+        'MAX_EDAD': float(os.environ.get('DJANGO_DB_POOL_MAX_EDAD', 600)),    # < wait_timeout de MySQL
+        'VERIFICAR_DESPUES': float(os.environ.get('DJANGO_DB_POOL_VERIFICAR', 1)),  # ping si estuvo ociosa
+    }
+
 
+# --- (Agregado) Cache del catálogo ---
+# CATALOGO_CACHE_BACKEND: 'memoria' (LRU en proceso), 'archivo' o 'redis'.
+# Con 'memoria' la versión del catálogo se guarda en la base y cada proceso
+# la relee cada CATALOGO_VERSION_REFRESCO segundos: con varios procesos
+# (gunicorn) los demás ven un cambio con ese retraso. 'archivo' o 'redis'
+# invalidan en todos al momento.
+CATALOGO_CACHE_BACKEND = os.environ.get('CATALOGO_CACHE_BACKEND', 'memoria')
+CATALOGO_VERSION_REFRESCO = float(os.environ.get('CATALOGO_VERSION_REFRESCO', 1))
+CATALOGO_CACHE_HABILITADO = os.environ.get('CATALOGO_CACHE_HABILITADO', '1') == '1'
+CATALOGO_CACHE_TIMEOUT = int(os.environ.get('CATALOGO_CACHE_TIMEOUT', 60 * 10))
+
+# Listados del catálogo desde .values() sin ProductoSerializer (store/lectura_rapida.py)
+CATALOGO_LECTURA_RAPIDA = os.environ.get('CATALOGO_LECTURA_RAPIDA', '1') == '1'
+
+# GET de lista/detalle del catálogo con vistas async (store/asincrono.py).
+# Apagado por defecto: solo tiene sentido bajo ASGI (bajo WSGI cada vista
+# async costaría un event loop por petición) y aun ahí conviene medirlo
+# antes con `manage.py benchmark_asgi`.
+CATALOGO_ASINCRONO = os.environ.get('CATALOGO_ASINCRONO', '') == '1'
+
+_CACHES_CATALOGO = {
+    'memoria': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogo',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CATALOGO_CACHE_MAX_ENTRIES', 2000))},
+    },
+    'archivo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CATALOGO_CACHE_DIR', str(BASE_DIR / '.cache' / 'catalogo')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CATALOGO_CACHE_MAX_ENTRIES', 2000))},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('CATALOGO_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogo': _CACHES_CATALOGO[CATALOGO_CACHE_BACKEND],
+}
+
+# --- (Agregado) Búsqueda de productos (store/busqueda.py) ---
+# Archivo que genera `manage.py construir_indice_busqueda` y que cada
+# proceso carga al arrancar; cada BUSQUEDA_SINCRONIZAR_CADA segundos se
+# pone al día con los productos modificados.
+BUSQUEDA_INDICE_ARCHIVO = os.environ.get('BUSQUEDA_INDICE_ARCHIVO', str(BASE_DIR / '.cache' / 'busqueda.json'))
+BUSQUEDA_SINCRONIZAR_CADA = int(os.environ.get('BUSQUEDA_SINCRONIZAR_CADA', 5))
+# Días que se guardan los productos borrados para esa puesta al día; un
+# archivo de índice más viejo se descarta y se reconstruye
+BUSQUEDA_RETIRADOS_DIAS = int(os.environ.get('BUSQUEDA_RETIRADOS_DIAS', 7))
+
+# --- (Agregado) Facetas del listado de productos (store/facetas.py) ---
+# Cortes de los rangos de precio: 0-50, 50-100, 100-200, 200-500, 500+
+FACETAS_RANGOS_PRECIO = (50, 100, 200, 500)
+
+
+# --- (Agregado) Métricas por ruta (store/metricas.py, GET /metrics) ---
+METRICAS_HABILITADAS = os.environ.get('METRICAS_HABILITADAS', '1') == '1'
+# Peticiones más lentas que esto (ms) van al logger 'store.lentas' con su SQL
+METRICAS_LENTAS_MS = int(os.environ['METRICAS_LENTAS_MS']) if os.environ.get('METRICAS_LENTAS_MS') else None
+# /metrics (y /api/v1/catalogo/cache/, /api/v1/sistema/db/) exige
+# 'Authorization: Bearer <token>'. Sin token da 404, salvo con
+# METRICAS_SIN_TOKEN=1 (solo si no son accesibles desde fuera)
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+METRICAS_SIN_TOKEN = os.environ.get('METRICAS_SIN_TOKEN', '') == '1'
+
+# --- (Agregado) Reservas de stock de los carritos (store/reservas.py) ---
+# Segundos que una reserva aparta el stock; las vencidas las libera
+# `manage.py liberar_reservas --cada 60`.
+RESERVAS_TTL = int(os.environ.get('RESERVAS_TTL', 15 * 60))
+
+# --- (Agregado) Stock fragmentado para ventas flash (store/stock_fragmentado.py) ---
+# Fragmentos por producto (`manage.py fragmentar_stock <slug>`) y cada
+# cuántos segundos cada proceso relee qué productos están fragmentados.
+STOCK_FRAGMENTOS = int(os.environ.get('STOCK_FRAGMENTOS', 8))
+STOCK_FRAGMENTOS_REFRESCO = float(os.environ.get('STOCK_FRAGMENTOS_REFRESCO', 5))
+
+# --- (Agregado) Cola de trabajos en la base (store/trabajos.py) ---
+# `manage.py procesar_trabajos`: hilos por proceso, segundos de espera
+# con la cola vacía, intentos por trabajo, base de la espera exponencial
+# entre reintentos y segundos tras los que un trabajo 'en curso' cuyo
+# trabajador no respondió vuelve a la cola.
+TRABAJOS_HILOS = int(os.environ.get('TRABAJOS_HILOS', 4))
+TRABAJOS_ESPERA = float(os.environ.get('TRABAJOS_ESPERA', 1))
+TRABAJOS_MAX_INTENTOS = int(os.environ.get('TRABAJOS_MAX_INTENTOS', 5))
+TRABAJOS_REINTENTO_BASE = int(os.environ.get('TRABAJOS_REINTENTO_BASE', 5))
+TRABAJOS_VISIBILIDAD = int(os.environ.get('TRABAJOS_VISIBILIDAD', 300))
+
+# MySQL no admite índices parciales: los de Producto con `condition`
+# (pensados para SQLite/PostgreSQL) simplemente no se crean allí.
+SILENCED_SYSTEM_CHECKS = ['models.W037']
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -152,4 +273,13 @@ CORS_ALLOWED_ORIGINS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Base pública de las imágenes (p. ej. un CDN). Si está vacía, las URLs
+# se arman con el host que atiende la petición (store/medios.py).
+MEDIA_BASE_URL = os.environ.get('MEDIA_BASE_URL') or None
+
+# Miniaturas/WebP de las imágenes de producto (store/imagenes.py)
+IMAGENES_ANCHOS = (160, 320, 640)
+IMAGENES_WORKERS = int(os.environ.get('IMAGENES_WORKERS', 2))
+IMAGENES_EN_SEGUNDO_PLANO = True
\ No newline at end of file
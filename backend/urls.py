@@ -9,11 +9,16 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from store.metricas import vista_metricas
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     
     # Creamos una URL base para toda nuestra API
     path('api/v1/', include('store.urls')), 
+
+    # Métricas en formato Prometheus (store/metricas.py)
+    path('metrics', vista_metricas, name='metricas'),
 ]
 
 # Esto es lo que permite que el navegador vea las imágenes
@@ -321,7 +321,7 @@ const Hero = () => {
                 />
                 {/* Badge de stock */}
                 <div className="absolute top-4 right-4 bg-green-500 text-white text-xs font-bold px-3 py-1 rounded-full">
-                  ✓ {productoActual.stock} en stock
+                  ✓ {productoActual.stock_vendible ?? productoActual.stock} en stock
                 </div>
                 {/* ✅ Badge de descuento dinámico */}
                 {tieneDescuento && porcentajeDescuento > 0 && (
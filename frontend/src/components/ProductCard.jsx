@@ -16,6 +16,15 @@ const ProductCard = ({ producto }) => {
     ? producto.imagen
     : "https://via.placeholder.com/400x400.png?text=Sin+Imagen";
 
+  // Miniaturas generadas en el backend: { webp: { "160": url, ... }, jpeg: {...} }
+  const variantes = producto.imagen_variantes || {};
+  const srcSet = (formato) =>
+    Object.entries(variantes[formato] || {})
+      .map(([ancho, url]) => `${url} ${ancho}w`)
+      .join(", ");
+  const srcSetRespaldo = srcSet("jpeg") || srcSet("png");
+  const sizes = "(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw";
+
   const handleAddToCart = () => {
     addToCart(producto);
   };
@@ -35,10 +44,12 @@ const ProductCard = ({ producto }) => {
   const esNuevo = Boolean(producto.es_nuevo);
   const tieneDescuento = Boolean(producto.tiene_descuento);
   const porcentajeDesc = Number(producto.porcentaje_descuento) || 0;
+  // Stock que nadie tiene reservado en su carrito
+  const disponibles = producto.stock_vendible ?? producto.stock;
   const esPopular =
-    typeof producto.stock === "number" &&
-    producto.stock > 0 &&
-    producto.stock < 5;
+    typeof disponibles === "number" &&
+    disponibles > 0 &&
+    disponibles < 5;
 
   const precioNum = Number(producto.precio) || 0;
   const precioOriginal =
@@ -66,11 +77,19 @@ const ProductCard = ({ producto }) => {
       <Link to={`/producto/${producto.slug}`} className="block">
         {/* 🔁 CONTENEDOR DE IMAGEN AJUSTADO */}
         <div className="relative w-full h-72 bg-gray-50 flex items-center justify-center overflow-hidden">
-          <img
-            src={imageUrl}
-            alt={producto.nombre}
-            className="max-h-full max-w-full object-contain p-4 transition-transform duration-500 ease-out group-hover:scale-105"
-          />
+          <picture className="contents">
+            {srcSet("webp") && (
+              <source type="image/webp" srcSet={srcSet("webp")} sizes={sizes} />
+            )}
+            <img
+              src={imageUrl}
+              srcSet={srcSetRespaldo || undefined}
+              sizes={srcSetRespaldo ? sizes : undefined}
+              loading="lazy"
+              alt={producto.nombre}
+              className="max-h-full max-w-full object-contain p-4 transition-transform duration-500 ease-out group-hover:scale-105"
+            />
+          </picture>
 
           {/* Overlay suave al hover */}
           <div className="absolute inset-0 bg-black opacity-0 group-hover:opacity-5 transition-opacity duration-300" />
@@ -82,7 +101,7 @@ const ProductCard = ({ producto }) => {
               <Badge type="descuento" text={`-${porcentajeDesc}% OFF`} />
             )}
             {esPopular && <Badge type="popular" text="¡Últimos!" />}
-            {producto.stock === 0 && <Badge type="agotado" />}
+            {disponibles === 0 && <Badge type="agotado" />}
           </div>
         </div>
 
@@ -116,10 +135,10 @@ const ProductCard = ({ producto }) => {
       <div className="p-4 pt-0">
         <button
           onClick={handleAddToCart}
-          disabled={producto.stock === 0}
+          disabled={disponibles === 0}
           className="w-full rounded-md border border-transparent bg-brand-primary-600 px-4 py-2.5 text-sm font-medium text-white shadow-sm hover:bg-brand-primary-700 focus:outline-none focus:ring-2 focus:ring-brand-primary-500 focus:ring-offset-2 disabled:bg-gray-400 disabled:cursor-not-allowed transition-all duration-200 hover:shadow-md"
         >
-          {producto.stock > 0 ? "Agregar al Carrito" : "Agotado"}
+          {disponibles > 0 ? "Agregar al Carrito" : "Agotado"}
         </button>
       </div>
     </div>
@@ -2,6 +2,20 @@
 // Archivo completo para copiar y pegar
 
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import { ajustarReserva, liberarReservas } from '../services/api';
+
+// Identificador del carrito para las reservas de stock (se conserva entre visitas)
+const obtenerCarritoId = () => {
+  let id = localStorage.getItem('carritoId');
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem('carritoId', id);
+  }
+  return id;
+};
+
+// Tope del carrito: lo que queda sin reservar (APIs viejas solo traen `stock`)
+const disponiblesDe = (producto) => producto.stock_vendible ?? producto.stock;
 
 // 1. Creamos el Contexto
 const CartContext = createContext();
@@ -25,6 +39,8 @@ export const CartProvider = ({ children }) => {
     }
   });
 
+  const [carritoId] = useState(obtenerCarritoId);
+
   // 5. Guardamos en localStorage CADA VEZ que el carrito cambie
   useEffect(() => {
     localStorage.setItem('cart', JSON.stringify(cartItems));
@@ -33,54 +49,88 @@ export const CartProvider = ({ children }) => {
   // --- Lógica del Carrito ---
 
   /**
-   * Añade un producto al carrito.
-   * Si ya existe, incrementa la cantidad.
+   * Aparta en el servidor `cantidad` unidades del producto y, solo si
+   * lo acepta, deja esa cantidad en el carrito (0 = lo quita).
+   * Devuelve true si se pudo.
    */
-  const addToCart = (productToAdd) => {
+  const cambiarCantidad = async (producto, cantidad) => {
+    try {
+      await ajustarReserva(carritoId, producto.slug, cantidad);
+    } catch (error) {
+      const linea = error?.response?.data?.items?.find((l) => !l.ok);
+      if (linea && typeof linea.stock === 'number') {
+        alert(`Solo quedan ${linea.stock} unidades disponibles de ${producto.nombre}.`);
+        // El tope del carrito pasa a ser lo que el servidor confirmó
+        setCartItems(prevItems =>
+          prevItems.map(item => item.id === producto.id ? { ...item, stock: linea.stock } : item)
+        );
+      } else {
+        alert(error?.response?.data?.detail || "No se pudo reservar el producto. Intenta de nuevo.");
+      }
+      return false;
+    }
     setCartItems(prevItems => {
-      // 1. Buscar si el producto ya está en el carrito
-      const existingItem = prevItems.find(item => item.id === productToAdd.id);
-
-      if (existingItem) {
-        // 2. Si existe, incrementamos la cantidad (sin pasar del stock)
+      if (cantidad <= 0) {
+        return prevItems.filter(item => item.id !== producto.id);
+      }
+      if (prevItems.some(item => item.id === producto.id)) {
         return prevItems.map(item =>
-          item.id === productToAdd.id
-            ? { ...item, quantity: Math.min(item.quantity + 1, item.stock) } // No pasar del stock
-            : item
+          item.id === producto.id ? { ...item, quantity: cantidad } : item
         );
-      } else {
-        // 3. Si no existe, lo añadimos con cantidad 1
-        return [...prevItems, { ...productToAdd, quantity: 1 }];
       }
+      return [...prevItems, { ...producto, stock: disponiblesDe(producto), quantity: cantidad }];
     });
+    return true;
+  };
+
+  /**
+   * Añade un producto al carrito.
+   * Si ya existe, incrementa la cantidad (sin pasar de lo disponible).
+   */
+  const addToCart = async (productToAdd) => {
+    const existingItem = cartItems.find(item => item.id === productToAdd.id);
+    const cantidad = existingItem ? existingItem.quantity : 0;
+    const tope = existingItem ? existingItem.stock : disponiblesDe(productToAdd);
+    if (cantidad + 1 > tope) {
+      alert(`No puedes agregar más de ${tope} unidades.`);
+      return false;
+    }
+    return cambiarCantidad(productToAdd, cantidad + 1);
   };
 
   /**
-   * Remueve un producto del carrito (por su ID).
+   * Remueve un producto del carrito (por su ID) y libera su reserva.
    */
   const removeFromCart = (productId) => {
+    const item = cartItems.find(i => i.id === productId);
+    if (item) {
+      // Si falla, la reserva vence sola a los RESERVAS_TTL segundos
+      ajustarReserva(carritoId, item.slug, 0).catch(() => {});
+    }
     setCartItems(prevItems => {
       return prevItems.filter(item => item.id !== productId);
     });
   };
 
   /**
-   * Actualiza la cantidad de un producto.
+   * Actualiza la cantidad de un producto (la reserva sube o baja igual).
    */
-  const updateQuantity = (productId, newQuantity) => {
-    setCartItems(prevItems => {
-      return prevItems.map(item =>
-        item.id === productId
-          ? { ...item, quantity: newQuantity }
-          : item
-      ).filter(item => item.quantity > 0); // Si la cantidad es 0, lo quita
-    });
+  const updateQuantity = async (productId, newQuantity) => {
+    const item = cartItems.find(i => i.id === productId);
+    if (!item) return false;
+    if (newQuantity <= 0) {
+      removeFromCart(productId); // Si la cantidad es 0, lo quita
+      return true;
+    }
+    if (newQuantity === item.quantity) return true;
+    return cambiarCantidad(item, newQuantity);
   };
 
   /**
    * Vacía el carrito completamente.
    */
   const clearCart = () => {
+    liberarReservas(carritoId).catch(() => {});
     setCartItems([]);
   };
 
@@ -93,6 +143,7 @@ export const CartProvider = ({ children }) => {
   const cartTotal = cartItems.reduce((total, item) => total + (item.precio * item.quantity), 0);
 
   const value = {
+    carritoId,
     cartItems,
     addToCart,
     removeFromCart,
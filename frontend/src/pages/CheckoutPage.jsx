@@ -4,12 +4,12 @@ import { useState } from "react";
 import { useNavigate, Link } from "react-router-dom";
 import { useCart } from "../context/CartContext";
 import { useAuth } from "../context/AuthContext";
-import { disminuirStockProducto } from "../services/api";
+import { disminuirStockLote } from "../services/api";
 import { db } from "../firebaseConfig";
 import { collection, addDoc, serverTimestamp } from "firebase/firestore";
 
 const CheckoutPage = () => {
-  const { cartItems, cartTotal, clearCart } = useCart();
+  const { carritoId, cartItems, cartTotal, clearCart } = useCart();
   const { user } = useAuth();
   const navigate = useNavigate();
 
@@ -114,11 +114,10 @@ const CheckoutPage = () => {
       // 🧪 Simulamos pago
       await new Promise((resolve) => setTimeout(resolve, 1500));
 
-      // ✅ Actualizar stock en Django
-      await Promise.all(
-        cartItems.map((item) =>
-          disminuirStockProducto(item.slug, item.quantity)
-        )
+      // ✅ Actualizar stock en Django (una sola petición, todo o nada)
+      await disminuirStockLote(
+        cartItems.map((item) => ({ slug: item.slug, cantidad: item.quantity })),
+        carritoId
       );
 
       // Snapshot de ítems para factura y para la pantalla de éxito
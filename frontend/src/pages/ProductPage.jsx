@@ -100,7 +100,9 @@ const ProductPage = () => {
   const esNuevo = producto.es_nuevo || false;
   const tieneDescuento = producto.tiene_descuento || false;
   const porcentajeDescuento = producto.porcentaje_descuento || 0;
-  const esPopular = producto.stock > 0 && producto.stock < 5;
+  // Stock que nadie tiene reservado en su carrito
+  const disponibles = producto.stock_vendible ?? producto.stock;
+  const esPopular = disponibles > 0 && disponibles < 5;
 
   // Cálculo del precio original (si hay descuento) y ahorro
   const precioOriginal =
@@ -162,7 +164,7 @@ const ProductPage = () => {
                 />
               )}
               {esPopular && <Badge type="popular" text="¡Últimas unidades!" />}
-              {producto.stock === 0 && <Badge type="agotado" />}
+              {disponibles === 0 && <Badge type="agotado" />}
             </div>
 
             <img
@@ -217,12 +219,12 @@ const ProductPage = () => {
             {/* Stock */}
             <div className="mt-6 border-t pt-6">
               <div className="flex items-center mb-6">
-                {producto.stock > 0 ? (
+                {disponibles > 0 ? (
                   <>
                     <HiCheck className="h-6 w-6 text-green-500" />
                     <p className="ml-2 text-base text-gray-700">
                       <span className="font-semibold text-green-600">
-                        {producto.stock}
+                        {disponibles}
                       </span>{' '}
                       unidades disponibles
                     </p>
@@ -242,10 +244,10 @@ const ProductPage = () => {
                 {/* Botón principal: Agregar al carrito */}
                 <button
                   type="submit"
-                  disabled={producto.stock === 0}
+                  disabled={disponibles === 0}
                   className="w-full bg-brand-primary-600 border border-transparent rounded-lg py-4 px-8 flex items-center justify-center text-base font-semibold text-white shadow-lg hover:bg-brand-primary-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-brand-primary-500 disabled:bg-gray-400 disabled:cursor-not-allowed transition-all duration-200 hover:shadow-xl"
                 >
-                  {producto.stock > 0 ? 'Agregar al Carrito' : 'No disponible'}
+                  {disponibles > 0 ? 'Agregar al Carrito' : 'No disponible'}
                 </button>
 
                 {/* Botón secundario: Agregar a favoritos */}
@@ -287,13 +289,13 @@ const ProductPage = () => {
                   <span className="font-medium">Stock:</span>
                   <span
                     className={
-                      producto.stock > 0
+                      disponibles > 0
                         ? 'text-green-600 font-semibold'
                         : 'text-red-600 font-semibold'
                     }
                   >
-                    {producto.stock > 0
-                      ? `${producto.stock} disponibles`
+                    {disponibles > 0
+                      ? `${disponibles} disponibles`
                       : 'Agotado'}
                   </span>
                 </div>
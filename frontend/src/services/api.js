@@ -11,9 +11,22 @@ const apiClient = axios.create({
 
 // ------------ PRODUCTOS ------------
 
-// Obtener todos los productos
+// Obtener todos los productos (sin paginar)
 export const getProductos = () => {
-  return apiClient.get("/productos/");
+  return apiClient.get("/productos/", { params: { todos: 1 } });
+};
+
+// Obtener una página de productos (paginación por cursor)
+// Pasar `cursor` con el valor de `next`/`previous` de la respuesta anterior
+export const getProductosPagina = ({ cursor, orden, pageSize } = {}) => {
+  return apiClient.get("/productos/", {
+    params: { cursor, orden, page_size: pageSize },
+  });
+};
+
+// Buscar productos por texto (sin tildes, con ranking de relevancia)
+export const buscarProductos = (q, limite = 20) => {
+  return apiClient.get("/productos/buscar/", { params: { q, limite } });
 };
 
 // Obtener un producto por slug
@@ -46,7 +59,7 @@ export const deleteProducto = (slug) => {
 
 // ------------ CATEGORÍAS ------------
 
-// Obtener todas las categorías
+// Obtener todas las categorías (índice liviano: id, nombre, slug, total_productos)
 export const getCategorias = () => {
   return apiClient.get("/categorias/");
 };
@@ -55,11 +68,38 @@ export const getCategorias = () => {
 export const getCategoria = (slug) => {
   return apiClient.get(`/categorias/${slug}/`);
 };
+// Obtener una página de productos de una categoría (paginación por cursor)
+export const getProductosCategoria = (slug, { cursor, orden, pageSize } = {}) => {
+  return apiClient.get(`/categorias/${slug}/productos/`, {
+    params: { cursor, orden, page_size: pageSize },
+  });
+};
+
 // ✅ Disminuir stock de un producto según su slug
 export const disminuirStockProducto = (slug, cantidad) => {
   return apiClient.post(`/productos/${slug}/disminuir_stock/`, {
     cantidad,
   });
 };
+// ✅ Disminuir stock de todo el carrito en una sola petición (todo o nada)
+// items: [{ slug, cantidad }]; con `carrito`, sus reservas pasan a venta
+export const disminuirStockLote = (items, carrito) => {
+  return apiClient.post("/productos/disminuir_stock_lote/", { items, carrito });
+};
+
+// ------------ RESERVAS DE STOCK ------------
+
+// Apartar unidades para el carrito (vencen a los RESERVAS_TTL segundos)
+export const reservarStock = (carrito, items) => {
+  return apiClient.post("/reservas/", { carrito, items });
+};
+// Dejar apartadas `cantidad` unidades de un producto (0 = liberarlas)
+export const ajustarReserva = (carrito, slug, cantidad) => {
+  return apiClient.post("/reservas/ajustar/", { carrito, slug, cantidad });
+};
+// Liberar todas las reservas del carrito
+export const liberarReservas = (carrito) => {
+  return apiClient.post("/reservas/liberar/", { carrito });
+};
 export const crearPedido = (data) =>
   apiClient.post('/pedidos/', data);
\ No newline at end of file
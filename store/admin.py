@@ -1,7 +1,11 @@
 # store/admin.py
 
 from django.contrib import admin
-from .models import Categoria, Producto, Pedido, PedidoItem
+from django.db import transaction
+
+from . import ventas
+from .models import Categoria, Producto, Pedido, PedidoItem, Trabajo
+from .stock_fragmentado import rebalancear
 
 
 @admin.register(Categoria)
@@ -18,20 +22,62 @@ class ProductoAdmin(admin.ModelAdmin):
         "categoria",
         "precio",
         "stock",
+        "reservado",
         "disponible",      # <- AQUÍ YA NO USAMOS 'creado'
+        "actualizado",
     )
-    list_filter = ("categoria", "disponible", "es_nuevo", "tiene_descuento")
+    list_filter = ("categoria", "disponible", "es_nuevo", "tiene_descuento", "stock_fragmentado")
     search_fields = ("nombre", "slug")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Stock fragmentado: el nuevo total se reparte entre los fragmentos
+        if change and obj.stock_fragmentado and "stock" in form.changed_data:
+            rebalancear(obj.pk, total=obj.stock)
+
 
 class PedidoItemInline(admin.TabularInline):
+    # Solo lectura: los ítems ya están sumados en los resúmenes de ventas
+    # (store/ventas.py) y cambiarlos aquí los descuadraría
     model = PedidoItem
     extra = 0
+    fields = ("producto", "categoria", "cantidad", "precio_unitario")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
-    list_display = ("id", "email", "total", "metodo_pago", "creado_en")
+    list_display = ("id", "email", "total", "metodo_pago", "creado_en", "factura")
     list_filter = ("metodo_pago", "creado_en")
     search_fields = ("email", "nombre_cliente", "user_uid")
+    readonly_fields = ("total",)
     inlines = [PedidoItemInline]
+
+    # Borrar un pedido (uno o con la acción en bloque) lo resta antes de
+    # los resúmenes, como DELETE /pedidos/<id>/
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            ventas.registrar_pedido(obj, list(obj.items.all()), signo=-1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for pedido in queryset.prefetch_related("items"):
+                ventas.registrar_pedido(pedido, list(pedido.items.all()), signo=-1)
+            super().delete_queryset(request, queryset)
+
+
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ("id", "tipo", "estado", "intentos", "disponible_en", "bloqueado_por", "terminado_en")
+    list_filter = ("estado", "tipo")
+    readonly_fields = ("bloqueado_por", "bloqueado_en", "ultimo_error", "resultado", "creado_en", "terminado_en")
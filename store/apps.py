@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        # Registra los receptores de señales (invalidación de cache, etc.)
+        # y los tipos de trabajo de la cola (store/trabajos.py)
+        from . import facturas, signals  # noqa: F401
@@ -0,0 +1,196 @@
+# store/asincrono.py
+#
+# Lectura asíncrona del catálogo para cuando la app corre bajo ASGI
+# (backend/asgi.py).
+#
+# Bajo ASGI cada vista síncrona de DRF ocupa un hilo de sync_to_async
+# durante toda la petición. Aquí los GET de lista y detalle de productos
+# y categorías se atienden con vistas `async def`: la cache del catálogo
+# se consulta sin salir del event loop y la base de datos se lee con el
+# ORM asíncrono (aget, async for). Solo la autenticación, los permisos y
+# el throttling de DRF (APIView.initial) pasan por un hilo, un salto
+# corto en cada petición, también en los aciertos de cache: pueden leer
+# la sesión o el usuario y van antes de mirar la cache, como en DRF.
+#
+# Se reutilizan los querysets, filtros, paginación y serializers de los
+# ViewSets, así que URLs, esquema JSON, cache, ETag/304 y cabeceras son
+# los mismos. Todo lo que no es un GET JSON normal (otros métodos, API
+# navegable, ?format=, errores de validación, 404) se delega en la vista
+# de DRF de siempre.
+#
+# Es opcional: CATALOGO_ASINCRONO=1 al lanzar el servidor ASGI. En las
+# mediciones de `manage.py benchmark_asgi` con SQLite fue más lento que
+# WSGI, así que conviene medirlo con la base y la cache de producción
+# antes de encenderlo.
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework.exceptions import APIException
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+
+from . import cache as cache_catalogo
+from .lectura_rapida import JSONRapidoRenderer, lectura_rapida_habilitada
+
+# Rutas del router que tienen versión asíncrona
+RUTAS_ASINCRONAS = ('producto-list', 'producto-detail', 'categoria-list', 'categoria-detail')
+
+
+class _Delegar(Exception):
+    """Este GET lo atiende la vista de DRF (no hay versión async)."""
+
+
+# Cualquiera de estas → se responde con la vista de DRF, que arma el
+# error (4xx) o la respuesta. Un error de programación no se esconde.
+DELEGAR = (APIException, ObjectDoesNotExist, _Delegar)
+
+
+def asincrono_habilitado():
+    return getattr(settings, 'CATALOGO_ASINCRONO', False)
+
+
+# ==============================
+# Acciones (mismo resultado que list/retrieve de los ViewSets)
+# ==============================
+
+async def listar(vista):
+    """LecturaRapidaMixin.list + paginación por cursor, con el ORM async."""
+    if not lectura_rapida_habilitada():
+        raise _Delegar("sin lectura rápida")
+
+    queryset = vista.filter_queryset(vista.get_queryset()).values(*vista.campos_rapidos)
+    paginador = vista.paginator
+    if paginador is None or getattr(vista, 'sin_paginar', lambda: False)():
+        return vista.convertir_filas([fila async for fila in queryset])
+
+    pagina = await paginador.apaginate_queryset(queryset, vista.request, view=vista)
+    data = paginador.get_paginated_response(vista.convertir_filas(pagina)).data
+    if hasattr(vista, 'facetas'):
+        # Una consulta agrupada (o un acierto de memoizar): se hace en un hilo
+        facetas = await sync_to_async(vista.facetas)()
+        if facetas is not None:
+            data['facetas'] = facetas
+    return data
+
+
+async def detalle(vista):
+    """retrieve(): el objeto (con sus select/prefetch) llega con aget()."""
+    campo = vista.lookup_url_kwarg or vista.lookup_field
+    queryset = vista.filter_queryset(vista.get_queryset())
+    try:
+        instancia = await queryset.aget(**{vista.lookup_field: vista.kwargs[campo]})
+    except (TypeError, ValueError, DjangoValidationError):
+        # Valor de búsqueda inválido: get_object_or_404 de DRF da 404
+        raise _Delegar("lookup inválido")
+    vista.check_object_permissions(vista.request, instancia)
+    return vista.get_serializer(instancia).data
+
+
+ACCIONES = {'list': listar, 'retrieve': detalle}
+
+
+# ==============================
+# Vista híbrida: GET async, el resto DRF
+# ==============================
+
+def _respuesta_json(data):
+    renderer = JSONRapidoRenderer()
+    return HttpResponse(renderer.render(data), content_type=renderer.media_type)
+
+
+async def respuesta_cacheada(request, calcular):
+    """
+    CatalogoCacheMixin.respuesta_cacheada en versión async: mismas
+    claves (comparte la cache con la vista síncrona), ETag y 304.
+    """
+    version = await cache_catalogo.aversion_catalogo()
+    huella = cache_catalogo.huella_peticion(request)
+    cabeceras = cache_catalogo.cabeceras_validacion(version, huella)
+
+    response = get_conditional_response(
+        request,
+        etag=cabeceras['ETag'],
+        last_modified=cache_catalogo.segundo_modificacion(version),
+    )
+    if response is None:
+        if not cache_catalogo.cache_habilitado():
+            response = _respuesta_json(await calcular())
+        else:
+            clave = cache_catalogo.clave_respuesta(request, version, huella)
+            data = await cache_catalogo.aleer_respuesta(clave)
+            if data is not None:
+                cache_catalogo.contar('hits')
+                estado = 'HIT'
+            else:
+                cache_catalogo.contar('misses')
+                data = await calcular()
+                await cache_catalogo.aguardar_respuesta(clave, data)
+                estado = 'MISS'
+            response = _respuesta_json(data)
+            response['X-Cache'] = estado
+
+    for nombre, valor in cabeceras.items():
+        response[nombre] = valor
+    return response
+
+
+def vista_hibrida(vista_drf):
+    """
+    Envuelve la vista de un ViewSet (callback del router): los GET que
+    piden JSON van por la acción async; todo lo demás, a DRF.
+    """
+    viewset, acciones = vista_drf.cls, dict(vista_drf.actions)
+    accion = acciones['get']
+    calcular = ACCIONES[accion]
+    renderers = [renderer() for renderer in viewset.renderer_classes]
+    negociacion = DefaultContentNegotiation()
+    sincrona = sync_to_async(vista_drf)
+    # Las mismas cabeceras que pone APIView.finalize_response
+    permitidos = ', '.join(
+        metodo.upper() for metodo in viewset.http_method_names
+        if metodo in acciones or metodo == 'options' or (metodo == 'head' and 'get' in acciones)
+    )
+
+    async def vista(request, *args, **kwargs):
+        if request.method == 'GET':
+            drf_request = Request(request)
+            try:
+                renderer, media_type = negociacion.select_renderer(
+                    drf_request, renderers, kwargs.get('format')
+                )
+                if isinstance(renderer, JSONRapidoRenderer):
+                    drf_request.accepted_renderer = renderer
+                    drf_request.accepted_media_type = media_type
+                    instancia = viewset(
+                        action=accion, request=drf_request, args=args, kwargs=kwargs,
+                        format_kwarg=kwargs.get('format'), headers={},
+                    )
+                    # Autenticación, permisos y throttles de DRF. Pueden tocar
+                    # la base (sesión, usuario), así que van en un hilo; si
+                    # rechazan, la vista de DRF arma la respuesta de error.
+                    await sync_to_async(instancia.initial)(drf_request)
+                    response = await respuesta_cacheada(drf_request, lambda: calcular(instancia))
+                    response['Allow'] = permitidos
+                    patch_vary_headers(response, ('Accept',))
+                    return response
+            except DELEGAR:
+                pass
+        return await sincrona(request, *args, **kwargs)
+
+    vista.csrf_exempt = True
+    vista.cls, vista.initkwargs, vista.actions = viewset, vista_drf.initkwargs, vista_drf.actions
+    return vista
+
+
+def con_lectura_asincrona(patrones):
+    """router.urls con lista/detalle del catálogo servidos por vistas híbridas."""
+    return [
+        URLPattern(patron.pattern, vista_hibrida(patron.callback), patron.default_args, patron.name)
+        if isinstance(patron, URLPattern) and patron.name in RUTAS_ASINCRONAS else patron
+        for patron in patrones
+    ]
@@ -0,0 +1,218 @@
+# store/benchmarks.py
+#
+# Utilidades compartidas por los comandos benchmark_*: medición de
+# latencias, percentiles y generación determinista de catálogos y
+# pedidos sintéticos (temporales dentro de una transacción que se
+# revierte al terminar, o persistentes con generar_datos_sinteticos).
+
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as hora, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .models import Categoria, Pedido, PedidoItem, Producto
+
+METODOS_PAGO = ('Tarjeta', 'Yape', 'Transferencia', 'Contraentrega')
+
+
+def resumen(muestras):
+    """Muestras en segundos → dict con percentiles en milisegundos."""
+    ordenadas = sorted(muestras)
+
+    def percentil(p):
+        if not ordenadas:
+            return None
+        k = min(len(ordenadas) - 1, max(0, round(p / 100 * len(ordenadas)) - 1))
+        return round(ordenadas[k] * 1000, 3)
+
+    total = sum(ordenadas)
+    return {
+        'n': len(ordenadas),
+        'media_ms': round(statistics.fmean(ordenadas) * 1000, 3) if ordenadas else None,
+        'p50_ms': percentil(50),
+        'p95_ms': percentil(95),
+        'p99_ms': percentil(99),
+        'por_segundo': round(len(ordenadas) / total, 1) if total else None,
+    }
+
+
+def medir(funcion, repeticiones=20, calentamiento=2):
+    """Ejecuta `funcion` varias veces y devuelve resumen() de sus tiempos."""
+    for _ in range(calentamiento):
+        funcion()
+    muestras = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        muestras.append(time.perf_counter() - inicio)
+    return resumen(muestras)
+
+
+class _Revertir(Exception):
+    pass
+
+
+@contextmanager
+def datos_temporales():
+    """
+    Todo lo creado dentro del bloque se revierte al salir, así el
+    benchmark puede correr contra cualquier base sin dejar basura.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Revertir
+    except _Revertir:
+        pass
+
+
+@contextmanager
+def catalogo_confirmado(total, prefijo='bench'):
+    """
+    Como datos_temporales() + generar_catalogo(), pero confirmando los
+    datos para que los vean otros hilos/conexiones (benchmarks
+    concurrentes). Se borran al salir.
+    """
+    try:
+        if total:
+            with transaction.atomic():
+                generar_catalogo(total, prefijo=prefijo)
+                invalidar_catalogo()
+        yield
+    finally:
+        if total:
+            with transaction.atomic():
+                Producto.objects.filter(slug__startswith=f"{prefijo}-producto-").delete()
+                Categoria.objects.filter(slug__startswith=f"{prefijo}-cat-").delete()
+                invalidar_catalogo()
+
+
+def generar_catalogo(total, categorias=20, semilla=42, lote=5000, prefijo='bench', desde=0):
+    """
+    Crea (si faltan) `categorias` categorías y los productos deterministas
+    número `desde`..`total`. Cada producto sale de su propia semilla, así
+    que el producto i es siempre el mismo aunque el catálogo se haga
+    crecer por etapas (`desde` creciente).
+    """
+    existentes = Categoria.objects.filter(slug__startswith=f"{prefijo}-cat-").count()
+    Categoria.objects.bulk_create([
+        Categoria(nombre=f"{prefijo.title()} {i}", slug=f"{prefijo}-cat-{i}")
+        for i in range(existentes, categorias)
+    ])
+    # bulk_create no devuelve PKs en todos los backends (MySQL)
+    cats = list(Categoria.objects.filter(slug__startswith=f"{prefijo}-cat-").order_by('id'))
+
+    for inicio in range(desde, total, lote):
+        Producto.objects.bulk_create([
+            _producto_sintetico(i, cats, random.Random(semilla * 10_000_019 + i), prefijo)
+            for i in range(inicio, min(inicio + lote, total))
+        ])
+    return cats
+
+
+def _producto_sintetico(i, cats, rnd, prefijo):
+    return Producto(
+        categoria=cats[i % len(cats)],
+        nombre=f"{prefijo.title()} producto {i}",
+        slug=f"{prefijo}-producto-{i}",
+        descripcion=f"Juego sintético número {i}",
+        precio=Decimal(rnd.randint(500, 60000)) / 100,
+        stock=rnd.choice((0, 5, 10, 50, 200)),
+        disponible=rnd.random() > 0.05,
+        es_nuevo=rnd.random() < 0.1,
+        tiene_descuento=rnd.random() < 0.2,
+        imagen=f"productos/{prefijo}-{i}.jpg" if rnd.random() < 0.9 else '',
+    )
+
+
+# ==============================
+# Pedidos sintéticos
+# ==============================
+
+@contextmanager
+def _fecha_explicita(modelo, campo):
+    """auto_now_add pisaría en bulk_create las fechas generadas."""
+    field = modelo._meta.get_field(campo)
+    anterior = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = anterior
+
+
+def generar_pedidos(total, productos, semilla=42, lote=5000, prefijo='bench',
+                    desde=0, clientes=50_000, dias=365, hasta=None):
+    """
+    Crea los pedidos deterministas número `desde`..`total` con 1-4 ítems
+    de `productos` = [(id, precio), ...] (siempre en el mismo orden).
+
+    Como en generar_catalogo(), el pedido i sale de su propia semilla:
+    cliente, fecha, método de pago e ítems no dependen de cuántos se
+    generen. Las fechas caen en los `dias` anteriores a `hasta` (fecha
+    local, por defecto hoy). Los más vendidos se concentran en el
+    principio de `productos`, como en una tienda real.
+
+    No toca los resúmenes de ventas: después hay que llamar a
+    reconstruir_ventas() para el rango devuelto (primer, último día).
+    """
+    if not productos:
+        raise ValueError("generar_pedidos necesita productos")
+    hasta = hasta or timezone.localdate()
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), hora.min))
+    segundos = dias * 86_400
+    # MySQL no devuelve PKs en bulk_create: los ids se asignan aquí
+    siguiente = (Pedido.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+
+    with _fecha_explicita(Pedido, 'creado_en'):
+        for inicio in range(desde, total, lote):
+            pedidos, items = [], []
+            for i in range(inicio, min(inicio + lote, total)):
+                rnd = random.Random(semilla * 20_000_003 + i)
+                pedido, lineas = _pedido_sintetico(
+                    i, siguiente, productos, rnd, prefijo, clientes,
+                    fin - timedelta(seconds=rnd.randrange(segundos)),
+                )
+                pedidos.append(pedido)
+                items.extend(lineas)
+                siguiente += 1
+            with transaction.atomic():
+                Pedido.objects.bulk_create(pedidos)
+                PedidoItem.objects.bulk_create(items)
+    return hasta - timedelta(days=dias), hasta
+
+
+def _pedido_sintetico(i, pk, productos, rnd, prefijo, clientes, creado_en):
+    cliente = rnd.randrange(clientes)
+    lineas = []
+    elegidos = set()
+    for _ in range(rnd.choice((1, 1, 2, 2, 3, 4))):
+        # Sesgo hacia los primeros productos: unos pocos concentran las ventas
+        producto_id, precio = productos[int(len(productos) * rnd.random() ** 3)]
+        if producto_id in elegidos:
+            continue
+        elegidos.add(producto_id)
+        lineas.append(PedidoItem(
+            pedido_id=pk,
+            producto_id=producto_id,
+            cantidad=rnd.choice((1, 1, 1, 2, 3)),
+            precio_unitario=precio,
+        ))
+    pedido = Pedido(
+        id=pk,
+        user_uid=f"{prefijo}-uid-{cliente}",
+        email=f"{prefijo}-cliente-{cliente}@ejemplo.com",
+        nombre_cliente=f"Cliente {cliente}",
+        direccion=f"Calle {rnd.randint(1, 999)} #{rnd.randint(100, 9999)}",
+        total=sum(linea.cantidad * linea.precio_unitario for linea in lineas),
+        metodo_pago=rnd.choice(METODOS_PAGO),
+        creado_en=creado_en,
+    )
+    return pedido, lineas
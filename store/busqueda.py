@@ -0,0 +1,374 @@
+# store/busqueda.py
+#
+# Búsqueda de productos con un índice invertido en memoria (BM25).
+#
+# - Tokenización sin tildes ni mayúsculas ("pokemon" encuentra
+#   "Pokémon TCG"), sin stopwords y con un recorte simple de plurales
+#   ("juegos" → "juego", "jugadores" → "jugador").
+# - El nombre pesa más que la descripción.
+# - La última palabra de la consulta también se busca como prefijo
+#   (autocompletado: "terra" → "Terraforming Mars").
+#
+# El índice se construye la primera vez que se usa (o se carga del
+# archivo que genera `manage.py construir_indice_busqueda`), se mantiene
+# al día con las señales de Producto y, cada pocos segundos, se pone al
+# día con los productos modificados por otros procesos (campo
+# `actualizado`). Los borrados no dejan fila que comparar por fecha: la
+# señal post_delete guarda un ProductoRetirado y la puesta al día quita
+# los retirados desde la anterior. Las dos consultas van por índice y
+# traen solo lo que cambió. Un update() que oculte productos
+# (disponible=False) debe tocar `actualizado`, como hace inventario.py
+# con el stock. Fuera de esa puesta al día, una búsqueda no toca la base
+# de datos.
+
+import bisect
+import heapq
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Producto, ProductoRetirado
+
+STOPWORDS = frozenset("""
+    a al ante con de del el en entre la las lo los o para por sin su sus un una
+    unos unas y e u que se the of and or to in on for with
+""".split())
+
+# Peso de cada campo (BM25F simplificado)
+PESO_NOMBRE = 3
+PESO_DESCRIPCION = 1
+
+# Parámetros de BM25
+K1 = 1.2
+B = 0.75
+
+MAX_PREFIJOS = 50
+
+# Margen al ponerse al día, por si los relojes de los servidores difieren
+MARGEN_SINCRONIZACION = timedelta(seconds=2)
+
+_palabra = re.compile(r"[a-z0-9]+")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes/diacríticos."""
+    texto = texto or ''
+    if texto.isascii():
+        return texto.lower()
+    texto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def raiz(palabra):
+    """Recorte muy simple de plurales en español."""
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] in 'rlnd':
+        return palabra[:-2]
+    if len(palabra) > 3 and palabra.endswith('s') and not palabra.endswith('ss'):
+        return palabra[:-1]
+    return palabra
+
+
+def tokenizar(texto):
+    return [
+        raiz(palabra)
+        for palabra in _palabra.findall(normalizar(texto))
+        if palabra not in STOPWORDS
+    ]
+
+
+def terminos_producto(nombre, descripcion=''):
+    """Counter término → frecuencia ponderada por campo."""
+    terminos = Counter()
+    for token in tokenizar(nombre):
+        terminos[token] += PESO_NOMBRE
+    for token in tokenizar(descripcion):
+        terminos[token] += PESO_DESCRIPCION
+    return terminos
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido término → {id_producto: frecuencia ponderada}.
+    Seguro entre hilos: escrituras y lecturas pasan por el mismo lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.limpiar()
+
+    def limpiar(self):
+        with self._lock:
+            self.postings = {}
+            self.terminos_doc = {}   # id → Counter (para poder quitarlo)
+            self.longitudes = {}     # id → longitud ponderada
+            self.longitud_total = 0
+            self.vocabulario = []    # ordenado, para buscar por prefijo
+            self.sincronizado_en = None
+
+    def __len__(self):
+        return len(self.longitudes)
+
+    def ids(self):
+        with self._lock:
+            return set(self.longitudes)
+
+    # ------------------------------
+    # Escritura
+    # ------------------------------
+
+    def agregar(self, producto_id, nombre, descripcion=''):
+        terminos = terminos_producto(nombre, descripcion)
+        with self._lock:
+            self._quitar(producto_id)
+            for termino, frecuencia in terminos.items():
+                posting = self.postings.get(termino)
+                if posting is None:
+                    posting = self.postings[termino] = {}
+                    bisect.insort(self.vocabulario, termino)
+                posting[producto_id] = frecuencia
+            longitud = sum(terminos.values())
+            self.terminos_doc[producto_id] = terminos
+            self.longitudes[producto_id] = longitud
+            self.longitud_total += longitud
+
+    def reconstruir(self, filas):
+        """
+        Reemplaza todo el índice con `filas` = [(id, nombre, descripcion)].
+        Se arma aparte y se intercambia de una vez: las búsquedas en curso
+        nunca ven un índice a medio construir.
+        """
+        nuevo = IndiceBusqueda()
+        for producto_id, nombre, descripcion in filas:
+            nuevo._agregar_terminos(producto_id, terminos_producto(nombre, descripcion))
+        nuevo.vocabulario = sorted(nuevo.postings)
+        with self._lock:
+            self.postings = nuevo.postings
+            self.terminos_doc = nuevo.terminos_doc
+            self.longitudes = nuevo.longitudes
+            self.longitud_total = nuevo.longitud_total
+            self.vocabulario = nuevo.vocabulario
+
+    def eliminar(self, producto_id):
+        with self._lock:
+            self._quitar(producto_id)
+
+    def _quitar(self, producto_id):
+        terminos = self.terminos_doc.pop(producto_id, None)
+        if terminos is None:
+            return
+        for termino in terminos:
+            posting = self.postings[termino]
+            del posting[producto_id]
+            if not posting:
+                del self.postings[termino]
+                i = bisect.bisect_left(self.vocabulario, termino)
+                del self.vocabulario[i]
+        self.longitud_total -= self.longitudes.pop(producto_id)
+
+    # ------------------------------
+    # Lectura
+    # ------------------------------
+
+    def _con_prefijo(self, prefijo):
+        i = bisect.bisect_left(self.vocabulario, prefijo)
+        encontrados = []
+        while i < len(self.vocabulario) and len(encontrados) < MAX_PREFIJOS:
+            termino = self.vocabulario[i]
+            if not termino.startswith(prefijo):
+                break
+            encontrados.append(termino)
+            i += 1
+        return encontrados
+
+    def buscar(self, consulta, limite=20):
+        """
+        Devuelve (total_coincidencias, [(id, puntaje), ...]) ordenado por
+        relevancia BM25, los `limite` mejores.
+        """
+        tokens = tokenizar(consulta)
+        if not tokens:
+            return 0, []
+
+        with self._lock:
+            n = len(self.longitudes)
+            if not n:
+                return 0, []
+            promedio = self.longitud_total / n
+
+            # Cada palabra de la consulta es un grupo de términos
+            # (la última incluye sus prefijos)
+            grupos = [[t] for t in tokens[:-1]]
+            grupos.append(sorted({tokens[-1], *self._con_prefijo(tokens[-1])}))
+
+            puntajes = {}
+            for grupo in grupos:
+                # Dentro de un grupo (prefijos) cuenta el mejor término
+                mejor_del_grupo = {}
+                for termino in grupo:
+                    posting = self.postings.get(termino)
+                    if not posting:
+                        continue
+                    idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for producto_id, tf in posting.items():
+                        norma = K1 * (1 - B + B * self.longitudes[producto_id] / promedio)
+                        puntaje = idf * tf * (K1 + 1) / (tf + norma)
+                        if puntaje > mejor_del_grupo.get(producto_id, 0.0):
+                            mejor_del_grupo[producto_id] = puntaje
+                for producto_id, puntaje in mejor_del_grupo.items():
+                    puntajes[producto_id] = puntajes.get(producto_id, 0.0) + puntaje
+
+        mejores = heapq.nlargest(limite, puntajes.items(), key=lambda par: (par[1], -par[0]))
+        return len(puntajes), mejores
+
+    # ------------------------------
+    # Persistencia
+    # ------------------------------
+
+    def guardar(self, ruta):
+        with self._lock:
+            data = {
+                'sincronizado_en': self.sincronizado_en.isoformat() if self.sincronizado_en else None,
+                'docs': {str(pid): dict(terms) for pid, terms in self.terminos_doc.items()},
+            }
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def cargar(self, ruta):
+        with open(ruta, encoding='utf-8') as f:
+            data = json.load(f)
+        with self._lock:
+            self.limpiar()
+            for pid, terminos in data['docs'].items():
+                self._agregar_terminos(int(pid), Counter(terminos))
+            self.vocabulario = sorted(self.postings)
+            if data.get('sincronizado_en'):
+                self.sincronizado_en = datetime.fromisoformat(data['sincronizado_en'])
+
+    def _agregar_terminos(self, producto_id, terminos):
+        # Carga masiva: el vocabulario se ordena una sola vez al final
+        for termino, frecuencia in terminos.items():
+            self.postings.setdefault(termino, {})[producto_id] = frecuencia
+        longitud = sum(terminos.values())
+        self.terminos_doc[producto_id] = terminos
+        self.longitudes[producto_id] = longitud
+        self.longitud_total += longitud
+
+
+# ==============================
+# Índice global del proceso
+# ==============================
+
+indice = IndiceBusqueda()
+_construido = False
+_ultima_revision = 0.0
+_lock_construccion = threading.Lock()
+
+
+def indice_construido():
+    return _construido
+
+
+def indexar_producto(producto):
+    """Agrega/actualiza un producto (o lo quita si no está disponible)."""
+    if producto.disponible:
+        indice.agregar(producto.pk, producto.nombre, producto.descripcion)
+    else:
+        indice.eliminar(producto.pk)
+
+
+def construir_indice(desde=None):
+    """
+    Indexa los productos disponibles desde la base de datos. Con `desde`
+    solo recorre los modificados después de esa fecha (puesta al día).
+    """
+    inicio = timezone.now()
+    if desde is None:
+        filas = (
+            Producto.objects.filter(disponible=True)
+            .values_list('id', 'nombre', 'descripcion')
+            .iterator(chunk_size=2000)
+        )
+        indice.reconstruir(filas)
+    else:
+        # Borrados desde la última puesta al día (ver ProductoRetirado)
+        retirados = (
+            ProductoRetirado.objects.filter(retirado_en__gt=desde - MARGEN_SINCRONIZACION)
+            .values_list('producto_id', flat=True)
+        )
+        for producto_id in retirados:
+            indice.eliminar(producto_id)
+
+        filas = (
+            Producto.objects.filter(actualizado__gt=desde - MARGEN_SINCRONIZACION)
+            .values_list('id', 'nombre', 'descripcion', 'disponible')
+            .iterator(chunk_size=2000)
+        )
+        for producto_id, nombre, descripcion, disponible in filas:
+            if disponible:
+                indice.agregar(producto_id, nombre, descripcion)
+            else:
+                indice.eliminar(producto_id)
+
+    indice.sincronizado_en = inicio
+    return len(indice)
+
+
+def _retirados_desde(fecha):
+    """¿Siguen guardados los productos retirados desde `fecha`?"""
+    dias = getattr(settings, 'BUSQUEDA_RETIRADOS_DIAS', 7)
+    return fecha is not None and timezone.now() - fecha < timedelta(days=dias)
+
+
+def purgar_retirados():
+    """Borra los ProductoRetirado más viejos que BUSQUEDA_RETIRADOS_DIAS."""
+    limite = timezone.now() - timedelta(days=getattr(settings, 'BUSQUEDA_RETIRADOS_DIAS', 7))
+    borrados, _ = ProductoRetirado.objects.filter(retirado_en__lt=limite).delete()
+    return borrados
+
+
+def obtener_indice():
+    """
+    Devuelve el índice del proceso, construyéndolo (o cargándolo del
+    archivo) la primera vez y poniéndolo al día cada
+    BUSQUEDA_SINCRONIZAR_CADA segundos.
+    """
+    global _construido, _ultima_revision
+
+    cada = getattr(settings, 'BUSQUEDA_SINCRONIZAR_CADA', 5)
+    if _construido and time.monotonic() - _ultima_revision < cada:
+        return indice
+
+    with _lock_construccion:
+        if not _construido:
+            ruta = getattr(settings, 'BUSQUEDA_INDICE_ARCHIVO', None)
+            try:
+                indice.cargar(ruta)
+            except (TypeError, OSError, ValueError, KeyError):
+                construir_indice()
+            else:
+                if _retirados_desde(indice.sincronizado_en):
+                    construir_indice(desde=indice.sincronizado_en)
+                else:
+                    # Archivo más viejo que los retirados guardados
+                    construir_indice()
+            _construido = True
+        elif time.monotonic() - _ultima_revision >= cada:
+            construir_indice(desde=indice.sincronizado_en)
+        _ultima_revision = time.monotonic()
+    return indice
+
+
+def reiniciar():
+    """Descarta el índice del proceso (se reconstruye en el próximo uso)."""
+    global _construido
+    with _lock_construccion:
+        indice.limpiar()
+        _construido = False
@@ -0,0 +1,318 @@
+# store/cache.py
+#
+# Cache de respuestas del catálogo (listas y detalle de productos y
+# categorías).
+#
+# Las claves llevan una "versión del catálogo". Cualquier cambio en
+# Producto/Categoría (señales) o en el stock sube la versión, y todas las
+# entradas anteriores quedan huérfanas: no hay que borrar nada, el
+# backend las expulsa solo (LRU / expiración).
+#
+# La versión es el instante del último cambio (en nanosegundos), así que
+# sirve también para los GET condicionales: ETag = versión + huella de la
+# petición, Last-Modified = versión redondeada al segundo siguiente (ver
+# cabeceras_validacion). Un If-None-Match que coincide se
+# responde 304 sin consultar la base de datos ni serializar nada.
+#
+# El backend es el alias 'catalogo' de settings.CACHES:
+#   - memoria (LocMemCache, LRU acotado por MAX_ENTRIES)  ← por defecto
+#   - archivo (FileBasedCache)
+#   - redis   (RedisCache; vale cualquier servidor compatible)
+#
+# Con 'memoria' cada proceso tiene su propia cache, así que la versión no
+# puede vivir en ella: un cambio solo invalidaría el proceso que lo hizo.
+# En ese caso la versión está en la fila única de VersionCatalogo y cada
+# proceso la relee cada CATALOGO_VERSION_REFRESCO segundos. El precio es
+# que los demás procesos pueden servir el catálogo anterior (y sus
+# 304) durante ese tiempo; el que hizo el cambio lo ve al momento. Con
+# 'archivo' (mismo servidor) o 'redis' la versión va en la propia cache y
+# la invalidación es inmediata en todos.
+
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import BigIntegerField, F, Value
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import VersionCatalogo
+
+ALIAS = 'catalogo'
+CLAVE_VERSION = 'catalogo:version'
+
+_contadores = {'hits': 0, 'misses': 0}
+_lock = threading.Lock()
+
+# (vence, versión) leída de VersionCatalogo, por proceso
+_version_local = (0.0, None)
+_candado_version = threading.Lock()
+
+
+def get_cache():
+    return caches[ALIAS]
+
+
+def cache_habilitado():
+    return getattr(settings, 'CATALOGO_CACHE_HABILITADO', True)
+
+
+def version_en_base():
+    """True si la versión va en la base (la cache del catálogo es local al proceso)."""
+    return isinstance(get_cache(), LocMemCache)
+
+
+def version_catalogo():
+    if version_en_base():
+        return _version_de_base()
+    cache = get_cache()
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        # Si la clave se perdió (expulsión, reinicio) arrancamos desde el
+        # reloj: nunca reutiliza una versión vieja.
+        cache.add(CLAVE_VERSION, time.time_ns(), None)
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def _version_vigente():
+    """La versión releída hace menos de CATALOGO_VERSION_REFRESCO, o None."""
+    vence, version = _version_local
+    return version if time.monotonic() < vence else None
+
+
+def _recordar_version(version):
+    global _version_local
+    _version_local = (time.monotonic() + settings.CATALOGO_VERSION_REFRESCO, version)
+    return version
+
+
+def _version_de_base():
+    version = _version_vigente()
+    if version is not None:
+        return version
+    with _candado_version:
+        version = VersionCatalogo.objects.filter(pk=1).values_list('version', flat=True).first()
+        if version is None:
+            VersionCatalogo.objects.bulk_create(
+                [VersionCatalogo(pk=1, version=time.time_ns())], ignore_conflicts=True,
+            )
+            version = VersionCatalogo.objects.values_list('version', flat=True).get(pk=1)
+        return _recordar_version(version)
+
+
+def olvidar_version():
+    """La próxima lectura vuelve a la base (tests, o tras un cambio)."""
+    global _version_local
+    _version_local = (0.0, None)
+
+
+def _subir_version():
+    if version_en_base():
+        # Un solo UPDATE: dos procesos que suben a la vez no pisan la
+        # versión del otro
+        subidas = VersionCatalogo.objects.filter(pk=1).update(
+            version=Greatest(F('version') + 1, Value(time.time_ns(), output_field=BigIntegerField()))
+        )
+        if not subidas:
+            VersionCatalogo.objects.bulk_create(
+                [VersionCatalogo(pk=1, version=time.time_ns())], ignore_conflicts=True,
+            )
+        olvidar_version()
+        return
+    cache = get_cache()
+    anterior = cache.get(CLAVE_VERSION) or 0
+    cache.set(CLAVE_VERSION, max(time.time_ns(), anterior + 1), None)
+
+
+def invalidar_catalogo():
+    """
+    Invalida todas las respuestas cacheadas del catálogo.
+
+    Se aplica al confirmar la transacción en curso: si se subiera antes,
+    otra petición podría cachear datos aún no confirmados con la versión
+    nueva.
+    """
+    transaction.on_commit(_subir_version)
+
+
+def huella_peticion(request):
+    """
+    Hash de host + ruta + query string ordenado + formato de salida.
+    El host entra porque las URLs de imagen son absolutas.
+    """
+    params = sorted(request.query_params.lists())
+    renderer = getattr(request, 'accepted_renderer', None)
+    formato = renderer.format if renderer else ''
+    base = f"{request.get_host()}{request.path}?{params}|{formato}"
+    return hashlib.md5(base.encode('utf-8')).hexdigest()
+
+
+def clave_respuesta(request, version=None, huella=None):
+    version = version_catalogo() if version is None else version
+    huella = huella_peticion(request) if huella is None else huella
+    return f"catalogo:{version}:{huella}"
+
+
+def segundo_modificacion(version):
+    """
+    Last-Modified de una versión: el primer segundo entero posterior al
+    cambio. HTTP solo tiene segundos y la versión, nanosegundos; al
+    redondear hacia arriba, If-Modified-Since da 304 solo si la versión
+    es anterior a la fecha que trae el cliente.
+    """
+    return version // 1_000_000_000 + 1
+
+
+def cabeceras_validacion(version, huella):
+    """ETag fuerte y Last-Modified derivados de la versión del catálogo."""
+    cabeceras = {'ETag': f'"{version:x}-{huella[:16]}"'}
+    segundo = segundo_modificacion(version)
+    # Mientras no termina el segundo del cambio no hay Last-Modified: otro
+    # cambio en lo que queda de él tendría la misma fecha y el cliente
+    # recibiría un 304 con datos viejos. Ese rato valida solo con el ETag.
+    if time.time() >= segundo:
+        cabeceras['Last-Modified'] = http_date(segundo)
+    # El navegador puede guardar la respuesta pero debe revalidarla
+    # siempre (a cambio recibe un 304 sin cuerpo)
+    cabeceras['Cache-Control'] = 'no-cache'
+    return cabeceras
+
+
+def memoizar(nombre, partes, calcular):
+    """
+    Cachea el resultado de `calcular()` para la versión actual del
+    catálogo. `partes` identifica la variante (p. ej. los filtros).
+    """
+    if not cache_habilitado():
+        return calcular()
+    cache = get_cache()
+    digest = hashlib.md5(repr(partes).encode('utf-8')).hexdigest()
+    clave = f"catalogo:{version_catalogo()}:{nombre}:{digest}"
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, settings.CATALOGO_CACHE_TIMEOUT)
+    return valor
+
+
+# ------------------------------
+# Versiones async (store/asincrono.py)
+# ------------------------------
+
+def _sin_es(cache):
+    # LocMemCache no hace E/S: llamarla directo no bloquea el event loop
+    # y evita el salto a un hilo de aget()/aset().
+    return isinstance(cache, LocMemCache)
+
+
+async def aversion_catalogo():
+    cache = get_cache()
+    if _sin_es(cache):
+        # La versión está en la base: solo se va a un hilo al releerla
+        version = _version_vigente()
+        return version if version is not None else await sync_to_async(_version_de_base)()
+    version = await cache.aget(CLAVE_VERSION)
+    if version is None:
+        await cache.aadd(CLAVE_VERSION, time.time_ns(), None)
+        version = await cache.aget(CLAVE_VERSION)
+    return version
+
+
+async def aleer_respuesta(clave):
+    cache = get_cache()
+    return cache.get(clave) if _sin_es(cache) else await cache.aget(clave)
+
+
+async def aguardar_respuesta(clave, data):
+    cache = get_cache()
+    if _sin_es(cache):
+        cache.set(clave, data, settings.CATALOGO_CACHE_TIMEOUT)
+    else:
+        await cache.aset(clave, data, settings.CATALOGO_CACHE_TIMEOUT)
+
+
+def contar(nombre):
+    with _lock:
+        _contadores[nombre] += 1
+
+
+def estadisticas():
+    """Contadores de aciertos/fallos de este proceso."""
+    with _lock:
+        hits, misses = _contadores['hits'], _contadores['misses']
+    total = hits + misses
+    return {
+        'backend': settings.CACHES[ALIAS]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'ratio': round(hits / total, 4) if total else None,
+        'version': version_catalogo(),
+    }
+
+
+def reiniciar_estadisticas():
+    with _lock:
+        _contadores['hits'] = _contadores['misses'] = 0
+
+
+class CatalogoCacheMixin:
+    """
+    Cachea el resultado de list/retrieve de un ViewSet de solo lectura.
+    Se guarda `response.data` (ya serializado), así que un acierto no toca
+    la base de datos ni los serializers.
+
+    Además añade ETag/Last-Modified y responde 304 a los GET
+    condicionales que coinciden.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.respuesta_cacheada(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.respuesta_cacheada(super().retrieve, request, *args, **kwargs)
+
+    def respuesta_cacheada(self, vista, request, *args, **kwargs):
+        version = version_catalogo()
+        huella = huella_peticion(request)
+        cabeceras = cabeceras_validacion(version, huella)
+
+        # GET condicional: se resuelve antes de tocar la BD o la cache
+        condicional = get_conditional_response(
+            request,
+            etag=cabeceras['ETag'],
+            last_modified=segundo_modificacion(version),
+        )
+        if condicional is not None:
+            return self._con_cabeceras(condicional, cabeceras)
+
+        if not cache_habilitado():
+            return self._con_cabeceras(vista(request, *args, **kwargs), cabeceras)
+
+        cache = get_cache()
+        clave = clave_respuesta(request, version, huella)
+        data = cache.get(clave)
+        if data is not None:
+            contar('hits')
+            response = Response(data, headers={'X-Cache': 'HIT'})
+            return self._con_cabeceras(response, cabeceras)
+
+        contar('misses')
+        response = vista(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(clave, response.data, settings.CATALOGO_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return self._con_cabeceras(response, cabeceras)
+
+    def _con_cabeceras(self, response, cabeceras):
+        if response.status_code in (200, 304):
+            for nombre, valor in cabeceras.items():
+                response[nombre] = valor
+        return response
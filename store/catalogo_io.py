@@ -0,0 +1,312 @@
+# store/catalogo_io.py
+#
+# Importación/exportación masiva del catálogo en CSV o JSONL
+# (comandos importar_catalogo y exportar_catalogo).
+#
+# Todo es en streaming: se lee/escribe fila a fila y a la base de datos
+# se va por lotes, así que la memoria no depende del tamaño del archivo.
+# Los productos se identifican por `slug`: si ya existe se actualiza, si
+# no se crea (upsert con bulk_create(update_conflicts=True)).
+#
+# El stock importado no puede quedar por debajo de lo que ya tienen
+# reservado los carritos (esas filas se rechazan), y en los productos
+# con stock fragmentado se reparte entre sus fragmentos.
+
+import csv
+import json
+import sys
+import time
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+
+from .cache import invalidar_catalogo
+from .models import Categoria, Producto
+from .stock_fragmentado import rebalancear
+
+# Columnas del archivo. `categoria` es el slug de la categoría.
+COLUMNAS = (
+    'slug',
+    'nombre',
+    'categoria',
+    'categoria_nombre',
+    'descripcion',
+    'precio',
+    'stock',
+    'disponible',
+    'es_nuevo',
+    'tiene_descuento',
+    'porcentaje_descuento',
+    'imagen',
+)
+
+# Campos de Producto que pisa un upsert
+CAMPOS_ACTUALIZABLES = (
+    'nombre',
+    'categoria',
+    'descripcion',
+    'precio',
+    'stock',
+    'disponible',
+    'es_nuevo',
+    'tiene_descuento',
+    'porcentaje_descuento',
+    'imagen',
+    'actualizado',
+)
+
+VERDADEROS = {'1', 'true', 't', 'si', 'sí', 's', 'yes', 'y'}
+FALSOS = {'0', 'false', 'f', 'no', 'n', ''}
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+def formato_de(ruta, formato=None):
+    if formato:
+        return formato
+    if ruta.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+
+@contextmanager
+def abrir(ruta, modo):
+    """Abre `ruta` como texto UTF-8; '-' es stdin/stdout."""
+    if ruta == '-':
+        yield sys.stdin if 'r' in modo else sys.stdout
+        return
+    with open(ruta, modo, encoding='utf-8', newline='') as f:
+        yield f
+
+
+# ==============================
+# Lectura
+# ==============================
+
+def leer_filas(archivo, formato):
+    """Genera (numero_de_linea, dict) sin cargar el archivo entero."""
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, 1):
+            if linea.strip():
+                try:
+                    yield numero, json.loads(linea)
+                except ValueError as exc:
+                    yield numero, FilaInvalida(f"JSON inválido: {exc}")
+    else:
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+
+
+def _booleano(valor, campo):
+    if isinstance(valor, bool):
+        return valor
+    texto = str(valor if valor is not None else '').strip().lower()
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise FilaInvalida(f"{campo}: '{valor}' no es booleano")
+
+
+def _entero(valor, campo, defecto=0):
+    if valor in (None, ''):
+        return defecto
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        raise FilaInvalida(f"{campo}: '{valor}' no es un entero")
+    if numero < 0:
+        raise FilaInvalida(f"{campo}: no puede ser negativo")
+    return numero
+
+
+def _precio(valor):
+    try:
+        precio = Decimal(str(valor).strip())
+    except (InvalidOperation, TypeError):
+        raise FilaInvalida(f"precio: '{valor}' no es un número")
+    if not precio.is_finite() or precio < 0:
+        raise FilaInvalida(f"precio: '{valor}' no es válido")
+    return precio.quantize(Decimal('0.01'))
+
+
+class ImportadorCatalogo:
+    """
+    Upsert por lotes de productos desde filas de archivo. Las categorías
+    se resuelven una vez (dict slug → id) y las que faltan se crean.
+    """
+
+    def __init__(self, lote=2000, crear_categorias=True, al_terminar_lote=None):
+        self.lote = lote
+        self.crear_categorias = crear_categorias
+        self.al_terminar_lote = al_terminar_lote
+        self.categorias = dict(Categoria.objects.values_list('slug', 'id'))
+        self.errores = []   # [(linea, mensaje)]
+        self.total = 0
+        self.lotes = 0
+
+        features = connection.features
+        self.upsert_nativo = features.supports_update_conflicts
+        # MySQL no admite indicar la columna del conflicto (usa cualquier UNIQUE)
+        self.con_unique_fields = features.supports_update_conflicts_with_target
+
+    def importar(self, filas):
+        """`filas`: iterable de (linea, dict). Devuelve el total importado."""
+        pendientes = {}
+        for linea, fila in filas:
+            try:
+                if isinstance(fila, Exception):
+                    raise fila
+                producto = self.producto(fila)
+            except FilaInvalida as exc:
+                self.errores.append((linea, str(exc)))
+                continue
+            # Un slug repetido en el mismo lote: gana la última fila
+            pendientes[producto.slug] = (linea, producto)
+            if len(pendientes) >= self.lote:
+                self.guardar_lote(list(pendientes.values()))
+                pendientes = {}
+        if pendientes:
+            self.guardar_lote(list(pendientes.values()))
+        return self.total
+
+    def producto(self, fila):
+        slug = (fila.get('slug') or '').strip()
+        nombre = (fila.get('nombre') or '').strip()
+        if not slug or not nombre:
+            raise FilaInvalida("slug y nombre son obligatorios")
+        if len(slug) > 50 or len(nombre) > 200:
+            raise FilaInvalida("slug o nombre demasiado largos")
+        if fila.get('precio') in (None, ''):
+            raise FilaInvalida("precio es obligatorio")
+
+        return Producto(
+            slug=slug,
+            nombre=nombre,
+            categoria_id=self.categoria_id(fila),
+            descripcion=fila.get('descripcion') or '',
+            precio=_precio(fila['precio']),
+            stock=_entero(fila.get('stock'), 'stock'),
+            disponible=_booleano(fila.get('disponible', True), 'disponible'),
+            es_nuevo=_booleano(fila.get('es_nuevo'), 'es_nuevo'),
+            tiene_descuento=_booleano(fila.get('tiene_descuento'), 'tiene_descuento'),
+            porcentaje_descuento=_entero(fila.get('porcentaje_descuento'), 'porcentaje_descuento'),
+            imagen=fila.get('imagen') or '',
+        )
+
+    def categoria_id(self, fila):
+        slug = (fila.get('categoria') or '').strip()
+        if not slug:
+            raise FilaInvalida("categoria es obligatoria")
+        categoria_id = self.categorias.get(slug)
+        if categoria_id is None:
+            if not self.crear_categorias:
+                raise FilaInvalida(f"categoría '{slug}' no existe")
+            nombre = (fila.get('categoria_nombre') or '').strip() or slug.replace('-', ' ').title()
+            categoria_id = Categoria.objects.get_or_create(slug=slug, defaults={'nombre': nombre})[0].id
+            self.categorias[slug] = categoria_id
+        return categoria_id
+
+    def guardar_lote(self, filas):
+        """`filas`: [(linea, Producto), ...] con slugs distintos."""
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            # Reservas y fragmentos de los que ya existen, bloqueados hasta
+            # el final del lote para que no cambien entre el control y el upsert
+            existentes = {
+                slug: (producto_id, reservado, fragmentado)
+                for slug, producto_id, reservado, fragmentado in (
+                    Producto.objects.select_for_update()
+                    .filter(slug__in=[producto.slug for _, producto in filas])
+                    .order_by('id')  # mismo orden de bloqueo que inventario.bloquear_en_orden
+                    .values_list('slug', 'id', 'reservado', 'stock_fragmentado')
+                )
+            }
+            productos, fragmentados = [], []
+            for linea, producto in filas:
+                producto_id, reservado, fragmentado = existentes.get(producto.slug, (None, 0, False))
+                if producto.stock < reservado:
+                    self.errores.append((
+                        linea, f"stock: {producto.stock} es menor que lo reservado en carritos ({reservado})"
+                    ))
+                    continue
+                productos.append(producto)
+                if fragmentado:
+                    fragmentados.append((producto_id, producto.stock))
+            if not productos:
+                return
+
+            if self.upsert_nativo:
+                Producto.objects.bulk_create(
+                    productos,
+                    update_conflicts=True,
+                    unique_fields=['slug'] if self.con_unique_fields else None,
+                    update_fields=CAMPOS_ACTUALIZABLES,
+                )
+            else:
+                self._upsert_manual(productos)
+            # Si no, el próximo rebalanceo sumaría los fragmentos viejos
+            # y pisaría el stock importado
+            for producto_id, stock in fragmentados:
+                rebalancear(producto_id, total=stock)
+            invalidar_catalogo()
+        self.total += len(productos)
+        self.lotes += 1
+        if self.al_terminar_lote:
+            self.al_terminar_lote(self.lotes, len(productos), time.perf_counter() - inicio)
+
+    def _upsert_manual(self, productos):
+        existentes = dict(
+            Producto.objects.filter(slug__in=[p.slug for p in productos]).values_list('slug', 'id')
+        )
+        nuevos, cambiados = [], []
+        for producto in productos:
+            if producto.slug in existentes:
+                producto.pk = existentes[producto.slug]
+                cambiados.append(producto)
+            else:
+                nuevos.append(producto)
+        Producto.objects.bulk_create(nuevos)
+        # bulk_update no aplica auto_now
+        for producto in cambiados:
+            producto.actualizado = Producto._meta.get_field('actualizado').pre_save(producto, False)
+        Producto.objects.bulk_update(cambiados, CAMPOS_ACTUALIZABLES)
+
+
+# ==============================
+# Escritura
+# ==============================
+
+def filas_exportacion(queryset, lote=2000):
+    """Productos → dicts con COLUMNAS, leídos por bloques del servidor."""
+    columnas = (
+        'slug', 'nombre', 'categoria__slug', 'categoria__nombre', 'descripcion', 'precio',
+        'stock', 'disponible', 'es_nuevo', 'tiene_descuento', 'porcentaje_descuento', 'imagen',
+    )
+    for valores in queryset.order_by('id').values_list(*columnas).iterator(chunk_size=lote):
+        fila = dict(zip(COLUMNAS, valores))
+        fila['precio'] = f"{fila['precio']:.2f}"
+        fila['descripcion'] = fila['descripcion'] or ''
+        fila['imagen'] = fila['imagen'] or ''
+        yield fila
+
+
+def escribir_filas(salida, formato, filas):
+    """Escribe las filas en `salida` y devuelve cuántas fueron."""
+    total = 0
+    if formato == 'jsonl':
+        for fila in filas:
+            salida.write(json.dumps(fila, ensure_ascii=False))
+            salida.write('\n')
+            total += 1
+    else:
+        escritor = csv.DictWriter(salida, fieldnames=COLUMNAS)
+        escritor.writeheader()
+        for fila in filas:
+            escritor.writerow(fila)
+            total += 1
+    return total
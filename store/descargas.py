@@ -0,0 +1,164 @@
+# store/descargas.py
+#
+# Descarga concurrente de imágenes de producto (la usa el comando
+# cargar_imagenes_productos).
+#
+# - Un pool de hilos comparte una requests.Session con conexiones
+#   persistentes (un pool HTTP del mismo tamaño que el de hilos).
+# - Reintentos con espera exponencial ante errores de red y 429/5xx.
+# - Reanudable: un manifiesto JSON guarda url + sha256 de cada archivo;
+#   si el archivo ya está y su checksum coincide, no se vuelve a bajar.
+# - Cada archivo se escribe a un temporal y se renombra al terminar,
+#   así una descarga cortada nunca deja una imagen a medias.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+MANIFIESTO = '.manifiesto.json'
+
+EXTENSIONES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/gif': '.gif',
+}
+
+
+def crear_sesion(conexiones=8, reintentos=3, espera=0.5):
+    reintento = Retry(
+        total=reintentos,
+        connect=reintentos,
+        read=reintentos,
+        status=reintentos,
+        backoff_factor=espera,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=conexiones, max_retries=reintento)
+    sesion = requests.Session()
+    sesion.mount('http://', adaptador)
+    sesion.mount('https://', adaptador)
+    return sesion
+
+
+def sha256_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 16), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class Manifiesto:
+    """slug → {"url", "archivo", "sha256"} de lo ya descargado."""
+
+    def __init__(self, carpeta):
+        self.ruta = os.path.join(carpeta, MANIFIESTO)
+        self._lock = threading.Lock()
+        try:
+            with open(self.ruta, encoding='utf-8') as f:
+                self.entradas = json.load(f)
+        except (OSError, ValueError):
+            self.entradas = {}
+
+    def vigente(self, slug, url, carpeta):
+        """Nombre del archivo si ya está descargado e intacto, o None."""
+        entrada = self.entradas.get(slug)
+        if not entrada or entrada['url'] != url:
+            return None
+        ruta = os.path.join(carpeta, entrada['archivo'])
+        if not os.path.exists(ruta) or sha256_archivo(ruta) != entrada['sha256']:
+            return None
+        return entrada['archivo']
+
+    def registrar(self, slug, url, archivo, sha256):
+        with self._lock:
+            self.entradas[slug] = {'url': url, 'archivo': archivo, 'sha256': sha256}
+
+    def guardar(self):
+        with self._lock:
+            datos = json.dumps(self.entradas, indent=1, sort_keys=True)
+        fd, temporal = tempfile.mkstemp(dir=os.path.dirname(self.ruta), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(datos)
+        os.replace(temporal, self.ruta)
+
+
+def descargar(sesion, slug, url, carpeta, timeout=15):
+    """Baja `url` a carpeta/<slug>.<ext>. Devuelve (archivo, sha256)."""
+    with sesion.get(url, timeout=timeout, stream=True) as resp:
+        resp.raise_for_status()
+        tipo = resp.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        archivo = slug + EXTENSIONES.get(tipo, '.jpg')
+
+        h = hashlib.sha256()
+        fd, temporal = tempfile.mkstemp(dir=carpeta, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for bloque in resp.iter_content(1 << 16):
+                    h.update(bloque)
+                    f.write(bloque)
+            os.replace(temporal, os.path.join(carpeta, archivo))
+        except BaseException:
+            os.unlink(temporal)
+            raise
+    return archivo, h.hexdigest()
+
+
+def descargar_todas(fuentes, carpeta, workers=8, reintentos=3, espera=0.5, timeout=15,
+                    forzar=False, al_terminar=None):
+    """
+    fuentes: [(slug, url)]. Descarga en paralelo lo que falte y devuelve
+    {slug: {"archivo", "estado", "error"}} con estado en
+    'descargada' / 'omitida' / 'error'. `al_terminar(slug, resultado)`
+    se llama desde el hilo principal a medida que terminan.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    manifiesto = Manifiesto(carpeta)
+    sesion = crear_sesion(workers, reintentos, espera)
+    resultados = {}
+
+    def anotar(slug, resultado):
+        resultados[slug] = resultado
+        if al_terminar:
+            al_terminar(slug, resultado)
+
+    pendientes = []
+    for slug, url in fuentes:
+        archivo = None if forzar else manifiesto.vigente(slug, url, carpeta)
+        if archivo:
+            anotar(slug, {'archivo': archivo, 'estado': 'omitida', 'error': None})
+        else:
+            pendientes.append((slug, url))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='descargas') as pool:
+            futuros = {
+                pool.submit(descargar, sesion, slug, url, carpeta, timeout): (slug, url)
+                for slug, url in pendientes
+            }
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                slug, url = futuros[futuro]
+                try:
+                    archivo, sha256 = futuro.result()
+                except Exception as exc:
+                    anotar(slug, {'archivo': None, 'estado': 'error', 'error': str(exc)})
+                    continue
+                manifiesto.registrar(slug, url, archivo, sha256)
+                anotar(slug, {'archivo': archivo, 'estado': 'descargada', 'error': None})
+                if i % 50 == 0:
+                    manifiesto.guardar()
+    finally:
+        # Aunque se corte a la mitad, lo ya bajado queda registrado
+        manifiesto.guardar()
+        sesion.close()
+    return resultados
@@ -0,0 +1,167 @@
+# store/exportacion.py
+#
+# Exportación de pedidos para contabilidad, en CSV (una fila por ítem)
+# o NDJSON (un pedido por línea con sus ítems).
+#
+# Se recorre el rango por bloques de `lote` pedidos con paginación por
+# clave (creado_en, id): dos consultas por bloque (pedidos + sus ítems) y
+# nunca más de un bloque en memoria, tenga el rango 100 pedidos o 10
+# millones. No se usa un único .iterator() sobre todo el rango porque el
+# driver de MySQL trae el resultado completo al cliente.
+#
+# Bajo ASGI Django consume entero un iterador síncrono antes de enviar
+# nada (y la memoria deja de ser plana): ahí la vista entrega
+# en_asincrono(), que pide cada bloque en un hilo de sync_to_async y lo
+# envía antes de pedir el siguiente.
+
+import csv
+import io
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Pedido, PedidoItem
+
+COLUMNAS_PEDIDO = ('pedido_id', 'creado_en', 'user_uid', 'email', 'nombre_cliente', 'metodo_pago', 'total')
+COLUMNAS_ITEM = ('producto_id', 'producto_slug', 'cantidad', 'precio_unitario', 'subtotal')
+
+FORMATOS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+
+class RangoExportacionSerializer(serializers.Serializer):
+    """Parámetros de la exportación: fechas inclusivas en la zona horaria del sitio."""
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    formato = serializers.ChoiceField(choices=tuple(FORMATOS), default='csv')
+
+    def validate(self, attrs):
+        if attrs.get('desde') and attrs.get('hasta') and attrs['desde'] > attrs['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return attrs
+
+
+def _inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def filtro_rango(desde=None, hasta=None, campo='creado_en'):
+    """Q para `campo` (fecha y hora) entre los días `desde` y `hasta`, inclusive."""
+    q = Q()
+    if desde:
+        q &= Q(**{f'{campo}__gte': _inicio_del_dia(desde)})
+    if hasta:
+        q &= Q(**{f'{campo}__lt': _inicio_del_dia(hasta + timedelta(days=1))})
+    return q
+
+
+def pedidos_en_bloques(desde=None, hasta=None, lote=1000):
+    """
+    Genera dicts de pedido con su lista 'items', en orden (creado_en, id).
+    """
+    rango = filtro_rango(desde, hasta)
+    ultimo = None
+    while True:
+        qs = Pedido.objects.filter(rango)
+        if ultimo is not None:
+            creado, pedido_id = ultimo
+            qs = qs.filter(Q(creado_en__gt=creado) | Q(creado_en=creado, id__gt=pedido_id))
+        pedidos = list(
+            qs.order_by('creado_en', 'id').values_list(
+                'id', 'creado_en', 'user_uid', 'email', 'nombre_cliente', 'metodo_pago', 'total'
+            )[:lote]
+        )
+        if not pedidos:
+            return
+
+        items = {}
+        for pedido_id, *item in (
+            PedidoItem.objects.filter(pedido_id__in=[p[0] for p in pedidos])
+            .order_by('pedido_id', 'id')
+            .values_list('pedido_id', 'producto_id', 'producto__slug', 'cantidad', 'precio_unitario')
+        ):
+            items.setdefault(pedido_id, []).append(item)
+
+        for pedido in pedidos:
+            fila = dict(zip(COLUMNAS_PEDIDO, pedido))
+            fila['items'] = [
+                dict(zip(COLUMNAS_ITEM, (producto_id, slug, cantidad, precio, cantidad * precio)))
+                for producto_id, slug, cantidad, precio in items.get(pedido[0], ())
+            ]
+            yield fila
+
+        if len(pedidos) < lote:
+            return
+        ultimo = (pedidos[-1][1], pedidos[-1][0])
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).isoformat()
+    return str(valor)
+
+
+def lineas_csv(pedidos, filas_por_bloque=500):
+    """Bloques de texto CSV: cabecera y una fila por ítem."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_PEDIDO + COLUMNAS_ITEM)
+    filas = 0
+    for pedido in pedidos:
+        cabecera = [_texto(pedido[c]) for c in COLUMNAS_PEDIDO]
+        for item in pedido['items'] or [{}]:
+            escritor.writerow(cabecera + [_texto(item.get(c)) for c in COLUMNAS_ITEM])
+            filas += 1
+        if filas >= filas_por_bloque:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            filas = 0
+    yield buffer.getvalue()
+
+
+def lineas_ndjson(pedidos, pedidos_por_bloque=200):
+    """Bloques de NDJSON: un pedido (con sus ítems) por línea."""
+    bloque = []
+    for pedido in pedidos:
+        bloque.append(json.dumps(pedido, default=_texto, ensure_ascii=False))
+        if len(bloque) >= pedidos_por_bloque:
+            yield '\n'.join(bloque) + '\n'
+            bloque = []
+    if bloque:
+        yield '\n'.join(bloque) + '\n'
+
+
+def exportar(formato, desde=None, hasta=None, lote=1000):
+    """Generador de bloques de texto del formato pedido."""
+    pedidos = pedidos_en_bloques(desde, hasta, lote)
+    return lineas_csv(pedidos) if formato == 'csv' else lineas_ndjson(pedidos)
+
+
+async def en_asincrono(bloques):
+    """
+    Iterador async sobre el generador síncrono `bloques`, para servirlo
+    en streaming bajo ASGI. Las consultas siguen en el hilo de las vistas
+    síncronas.
+    """
+    siguiente = sync_to_async(next)
+    # next() con valor por defecto: un StopIteration no puede cruzar a la corrutina
+    while (bloque := await siguiente(bloques, None)) is not None:
+        yield bloque
+
+
+def nombre_archivo(formato, desde=None, hasta=None):
+    partes = ['pedidos']
+    if desde:
+        partes.append(desde.isoformat())
+    if hasta:
+        partes.append(hasta.isoformat())
+    return f"{'_'.join(partes)}.{FORMATOS[formato][1]}"
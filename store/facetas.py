@@ -0,0 +1,167 @@
+# store/facetas.py
+#
+# Filtros del listado de productos y conteos por faceta.
+#
+# Los conteos son "disyuntivos": el conteo de cada valor de una faceta
+# aplica todos los filtros activos MENOS el de esa misma faceta (así la
+# UI puede mostrar cuántos productos habría al cambiar de categoría).
+#
+# Todo sale de UNA consulta agrupada por categoría con COUNT(... FILTER)
+# condicionales; el resto de dimensiones se suman en Python sobre las
+# filas de las categorías seleccionadas.
+#
+# ⚠ Desviación deliberada del pedido original (latencia plana al crecer
+# el catálogo): esa consulta recorre todos los productos visibles y su
+# costo crece con el catálogo (O(N)). La latencia solo es plana en los
+# aciertos de memoizar() (store/views.py), que guarda las facetas por
+# filtros hasta el próximo cambio del catálogo; cada fallo de cache
+# vuelve a pagar el recorrido. No hay conteos precalculados por
+# categoría porque precio_min y precio_max son libres (un resumen por
+# rangos fijos no puede contar "precio entre 37 y 212") y el stock
+# cambia con UPDATE masivos (store/inventario.py, stock fragmentado) que
+# no pasan por señales. `manage.py benchmark_facetas` mide con la cache apagada, es
+# decir, el costo de un fallo en cada tamaño, y resume cuánto crece.
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q
+from rest_framework import serializers
+
+DIMENSIONES = ('categoria', 'precio', 'es_nuevo', 'tiene_descuento', 'en_stock')
+BOOLEANAS = ('es_nuevo', 'tiene_descuento', 'en_stock')
+
+
+class FiltrosProductoSerializer(serializers.Serializer):
+    """Valida los parámetros de filtro de GET /productos/."""
+    categoria = serializers.CharField(required=False, help_text="slug(s) separados por coma")
+    precio_min = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    precio_max = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    es_nuevo = serializers.BooleanField(required=False)
+    tiene_descuento = serializers.BooleanField(required=False)
+    en_stock = serializers.BooleanField(required=False)
+
+    def validate_categoria(self, value):
+        return [slug for slug in value.split(',') if slug]
+
+
+def leer_filtros(query_params):
+    """
+    query_params → dict solo con los filtros presentes. Los booleanos solo
+    se consideran si vienen en la URL (DRF los trataría como False).
+    """
+    datos = {k: query_params[k] for k in FiltrosProductoSerializer().fields if k in query_params}
+    serializer = FiltrosProductoSerializer(data=datos)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def _q_dimension(dimension, filtros):
+    if dimension == 'categoria':
+        if filtros.get('categoria'):
+            return Q(categoria__slug__in=filtros['categoria'])
+    elif dimension == 'precio':
+        q = Q()
+        if 'precio_min' in filtros:
+            q &= Q(precio__gte=filtros['precio_min'])
+        if 'precio_max' in filtros:
+            q &= Q(precio__lte=filtros['precio_max'])
+        return q
+    elif dimension == 'en_stock':
+        if 'en_stock' in filtros:
+            return Q(stock__gt=0) if filtros['en_stock'] else Q(stock=0)
+    elif dimension in filtros:
+        return Q(**{dimension: filtros[dimension]})
+    return Q()
+
+
+def q_filtros(filtros, excepto=()):
+    """Q con todos los filtros activos salvo las dimensiones en `excepto`."""
+    q = Q()
+    for dimension in DIMENSIONES:
+        if dimension not in excepto:
+            q &= _q_dimension(dimension, filtros)
+    return q
+
+
+def aplicar_filtros(qs, filtros):
+    return qs.filter(q_filtros(filtros))
+
+
+def rangos_precio():
+    """[(etiqueta, desde, hasta)] a partir de FACETAS_RANGOS_PRECIO."""
+    cortes = [Decimal(str(c)) for c in getattr(settings, 'FACETAS_RANGOS_PRECIO', (50, 100, 200, 500))]
+    rangos = []
+    desde = Decimal('0')
+    for hasta in cortes:
+        rangos.append((f"{desde:.0f}-{hasta:.0f}", desde, hasta))
+        desde = hasta
+    rangos.append((f"{desde:.0f}+", desde, None))
+    return rangos
+
+
+def _contar(q=None):
+    # Count(filter=Q()) vacío no es válido en todos los backends
+    return Count('id', filter=q) if q else Count('id')
+
+
+def calcular_facetas(qs_base, filtros):
+    """
+    qs_base: productos visibles SIN los filtros de faceta (p. ej. solo
+    disponible=True). Devuelve los conteos de todas las facetas con una
+    sola consulta agrupada por categoría.
+    """
+    # Para las dimensiones distintas de 'categoria' el filtro de
+    # categoría se aplica en Python eligiendo filas, no en el COUNT.
+    anotaciones = {'n_categoria': _contar(q_filtros(filtros, excepto=('categoria',)))}
+
+    for dimension in BOOLEANAS:
+        resto = q_filtros(filtros, excepto=('categoria', dimension))
+        positivo = Q(stock__gt=0) if dimension == 'en_stock' else Q(**{dimension: True})
+        anotaciones[f'{dimension}_si'] = _contar(resto & positivo)
+        anotaciones[f'{dimension}_no'] = _contar(resto & ~positivo)
+
+    resto_precio = q_filtros(filtros, excepto=('categoria', 'precio'))
+    rangos = rangos_precio()
+    for i, (_, desde, hasta) in enumerate(rangos):
+        q = Q(precio__gte=desde)
+        if hasta is not None:
+            q &= Q(precio__lt=hasta)
+        anotaciones[f'precio_{i}'] = _contar(resto_precio & q)
+    anotaciones['precio_minimo'] = Min('precio', filter=resto_precio or None)
+    anotaciones['precio_maximo'] = Max('precio', filter=resto_precio or None)
+
+    filas = list(
+        qs_base
+        .order_by()
+        .values('categoria__slug', 'categoria__nombre')
+        .annotate(**anotaciones)
+    )
+
+    seleccionadas = filtros.get('categoria')
+    elegidas = [f for f in filas if not seleccionadas or f['categoria__slug'] in seleccionadas]
+
+    def suma(campo):
+        return sum(f[campo] for f in elegidas)
+
+    minimos = [f['precio_minimo'] for f in elegidas if f['precio_minimo'] is not None]
+    maximos = [f['precio_maximo'] for f in elegidas if f['precio_maximo'] is not None]
+
+    facetas = {
+        'categoria': [
+            {'slug': f['categoria__slug'], 'nombre': f['categoria__nombre'], 'count': f['n_categoria']}
+            for f in sorted(filas, key=lambda f: f['categoria__nombre'])
+            if f['n_categoria']
+        ],
+        'precio': {
+            'min': f"{min(minimos):.2f}" if minimos else None,
+            'max': f"{max(maximos):.2f}" if maximos else None,
+            'rangos': [
+                {'rango': etiqueta, 'count': suma(f'precio_{i}')}
+                for i, (etiqueta, _, _) in enumerate(rangos)
+            ],
+        },
+    }
+    for dimension in BOOLEANAS:
+        facetas[dimension] = {'true': suma(f'{dimension}_si'), 'false': suma(f'{dimension}_no')}
+    return facetas
@@ -0,0 +1,57 @@
+# store/facturas.py
+#
+# Facturas de pedidos, generadas fuera de la petición.
+#
+# POST /pedidos/ solo encola un trabajo 'factura_pedido' dentro de su
+# transacción; `manage.py procesar_trabajos` renderiza después la
+# plantilla store/factura.html con el pedido y sus ítems y la guarda en
+# el storage (facturas/FAC-00000042.html). Pedido.factura queda con la
+# ruta y GET /pedidos/<id>/factura/ la sirve.
+#
+# Es HTML imprimible: no hay una librería de PDF entre las dependencias.
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import render_to_string
+
+from .models import Pedido
+from .trabajos import tarea
+
+
+def ruta_factura(pedido_id):
+    return f"facturas/FAC-{pedido_id:08d}.html"
+
+
+def renderizar(pedido):
+    """HTML de la factura de un pedido con sus ítems ya cargados."""
+    items = [
+        {
+            'producto': item.producto.nombre,
+            'cantidad': item.cantidad,
+            'precio_unitario': item.precio_unitario,
+            'subtotal': item.cantidad * item.precio_unitario,
+        }
+        for item in pedido.items.all()
+    ]
+    return render_to_string('store/factura.html', {
+        'pedido': pedido,
+        'numero': f"FAC-{pedido.id:08d}",
+        'items': items,
+    })
+
+
+@tarea('factura_pedido')
+def generar_factura(pedido_id):
+    """Renderiza y guarda la factura del pedido (reemplaza la anterior)."""
+    pedido = (
+        Pedido.objects.prefetch_related('items__producto')
+        .only('id', 'email', 'nombre_cliente', 'direccion', 'total', 'metodo_pago', 'creado_en')
+        .get(pk=pedido_id)
+    )
+    ruta = ruta_factura(pedido.id)
+    # Reintentos o regeneración: mismo nombre, no FAC-..._abc123.html
+    if default_storage.exists(ruta):
+        default_storage.delete(ruta)
+    ruta = default_storage.save(ruta, ContentFile(renderizar(pedido).encode('utf-8')))
+    Pedido.objects.filter(pk=pedido.id).update(factura=ruta)
+    return {'factura': ruta}
@@ -0,0 +1,155 @@
+# store/imagenes.py
+#
+# Variantes de las imágenes de producto: miniaturas a varios anchos en
+# WebP y en el formato de respaldo (JPEG, o PNG si hay transparencia).
+#
+# Se generan fuera de la petición: al guardar un producto con imagen
+# nueva (señal post_save) la tarea se encola en un pool de hilos del
+# proceso cuando la transacción confirma. Para las imágenes que ya
+# existían está `manage.py generar_variantes_imagenes`.
+#
+# Producto.imagen_variantes guarda las rutas en el storage:
+#   {"original": "productos/catan.jpg",
+#    "webp": {"160": "productos/variantes/catan-1f2e3d4c-160w.webp", ...},
+#    "jpeg": {"160": "productos/variantes/catan-1f2e3d4c-160w.jpg", ...}}
+# El sufijo es un hash de la ruta completa del original: catan.jpg,
+# catan.png u otra/catan.jpg no comparten (ni se pisan) sus variantes.
+# Si "original" no coincide con la imagen actual, las variantes están
+# desactualizadas y no se publican.
+
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import invalidar_catalogo
+from .models import Producto
+
+logger = logging.getLogger(__name__)
+
+CARPETA = 'productos/variantes'
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def anchos():
+    return tuple(getattr(settings, 'IMAGENES_ANCHOS', (160, 320, 640)))
+
+
+def variantes_vigentes(variantes, nombre):
+    """True si `variantes` corresponde al archivo de imagen `nombre`."""
+    return bool(nombre) and bool(variantes) and variantes.get('original') == nombre
+
+
+def nombre_variantes(nombre):
+    """'productos/catan.jpg' → 'catan-<hash de la ruta>' (prefijo de sus variantes)."""
+    raiz = os.path.splitext(os.path.basename(nombre))[0]
+    return f"{raiz}-{hashlib.md5(nombre.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _guardar(ruta, contenido):
+    # Nombre estable: se reemplaza la variante anterior del mismo archivo
+    if default_storage.exists(ruta):
+        default_storage.delete(ruta)
+    return default_storage.save(ruta, ContentFile(contenido))
+
+
+def generar_variantes(nombre):
+    """
+    Genera las variantes del archivo `nombre` del storage y devuelve el
+    dict para Producto.imagen_variantes. Nunca amplía: un ancho mayor que
+    el original se genera al tamaño original.
+    """
+    with default_storage.open(nombre, 'rb') as f:
+        original = Image.open(f)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    transparente = original.mode in ('RGBA', 'LA') or (
+        original.mode == 'P' and 'transparency' in original.info
+    )
+    if transparente:
+        original = original.convert('RGBA')
+        respaldo, extension, opciones = 'png', 'png', {'optimize': True}
+    else:
+        original = original.convert('RGB')
+        respaldo, extension, opciones = 'jpeg', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}
+
+    base = nombre_variantes(nombre)
+    variantes = {'original': nombre, 'webp': {}, respaldo: {}}
+    for ancho in anchos():
+        copia = original.copy()
+        copia.thumbnail((ancho, ancho * 4), Image.LANCZOS)
+
+        for formato, ext, kwargs in (
+            ('webp', 'webp', {'quality': 80, 'method': 4}),
+            (respaldo, extension, opciones),
+        ):
+            buffer = io.BytesIO()
+            copia.save(buffer, format=formato.upper(), **kwargs)
+            ruta = f"{CARPETA}/{base}-{ancho}w.{ext}"
+            variantes[formato][str(ancho)] = _guardar(ruta, buffer.getvalue())
+    return variantes
+
+
+def procesar_producto(producto_id, forzar=False):
+    """
+    Genera y guarda las variantes de un producto. Devuelve True si se
+    generaron. Si la imagen cambió mientras tanto no se pisa nada.
+    """
+    fila = Producto.objects.filter(pk=producto_id).values('imagen', 'imagen_variantes').first()
+    if not fila or not fila['imagen']:
+        return False
+    if not forzar and variantes_vigentes(fila['imagen_variantes'], fila['imagen']):
+        return False
+
+    variantes = generar_variantes(fila['imagen'])
+    actualizados = Producto.objects.filter(pk=producto_id, imagen=fila['imagen']).update(
+        imagen_variantes=variantes,
+        actualizado=timezone.now(),
+    )
+    if actualizados:
+        invalidar_catalogo()
+    return bool(actualizados)
+
+
+def _tarea(producto_id):
+    try:
+        procesar_producto(producto_id)
+    except Exception:
+        logger.exception("No se pudieron generar las variantes del producto %s", producto_id)
+    finally:
+        # Los hilos del pool no pasan por el ciclo de petición de Django
+        close_old_connections()
+
+
+def obtener_pool():
+    global _pool
+    with _lock_pool:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGENES_WORKERS', 2),
+                thread_name_prefix='imagenes',
+            )
+        return _pool
+
+
+def programar_variantes(producto_id):
+    """
+    Encola la generación de variantes para cuando confirme la
+    transacción. Con IMAGENES_EN_SEGUNDO_PLANO = False se hace en línea.
+    """
+    if getattr(settings, 'IMAGENES_EN_SEGUNDO_PLANO', True):
+        transaction.on_commit(lambda: obtener_pool().submit(_tarea, producto_id))
+    else:
+        transaction.on_commit(lambda: procesar_producto(producto_id))
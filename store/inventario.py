@@ -0,0 +1,210 @@
+# store/inventario.py
+#
+# Operaciones de stock que deben ser atómicas frente a compradores
+# concurrentes. Nada de leer-comprobar-save(): la comprobación va dentro
+# del propio UPDATE (stock >= cantidad) y el decremento con F().
+#
+# Las reservas de los carritos (store/reservas.py) viven en
+# Producto.reservado: lo vendible es stock - reservado. Los productos con
+# stock fragmentado (store/stock_fragmentado.py) descuentan de sus
+# fragmentos.
+
+from collections import OrderedDict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from . import stock_fragmentado
+from .cache import invalidar_catalogo
+from .models import Producto, ReservaStock
+
+
+class StockInsuficiente(Exception):
+    """
+    Alguna línea del lote no pudo descontarse. `lineas` trae el detalle
+    de cada línea (ok / error / stock actual) y el lote entero se revirtió.
+    """
+
+    def __init__(self, lineas):
+        super().__init__("Stock insuficiente.")
+        self.lineas = lineas
+
+
+class ReservasCambiaron(Exception):
+    """Otra transacción liberó reservas que esta iba a usar: se reintenta."""
+
+
+class _LoteIncompleto(Exception):
+    pass
+
+
+def agrupar_lineas(lineas):
+    """
+    [{'slug': 'catan', 'cantidad': 2}, ...] → OrderedDict {slug: cantidad}
+    sumando slugs repetidos y ordenado por slug (respuestas estables).
+
+    Este orden NO es el de los bloqueos: un UPDATE con varias filas las
+    bloquea en el orden en que las recorre el plan. Para eso está
+    bloquear_en_orden().
+    """
+    totales = {}
+    for linea in lineas:
+        totales[linea['slug']] = totales.get(linea['slug'], 0) + linea['cantidad']
+    return OrderedDict(sorted(totales.items()))
+
+
+def bloquear_en_orden(filtro):
+    """
+    SELECT ... FOR UPDATE de los productos del filtro, por id. Dos lotes
+    que comparten productos los bloquean así en el mismo orden y el
+    segundo espera en vez de interbloquearse con el primero; el UPDATE
+    que sigue ya tiene las filas. Solo hace falta con más de una fila y
+    si el motor bloquea por fila (SQLite bloquea la base entera).
+    """
+    if connection.features.has_select_for_update:
+        list(Producto.objects.filter(filtro).select_for_update().order_by('id').values_list('id', flat=True))
+
+
+def caso_por(campo, valores):
+    """CASE campo WHEN clave THEN valor ... (0 para las demás filas)."""
+    return Case(
+        *[When(**{campo: clave}, then=Value(valor)) for clave, valor in valores.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def tomar_reservas(carrito, slugs):
+    """
+    Borra las reservas del carrito sobre esos productos y devuelve
+    {slug: unidades apartadas}. Va dentro de la transacción del
+    descuento; si otro proceso (liberar_reservas) borró alguna entre la
+    lectura y el DELETE, lanza ReservasCambiaron para reintentar.
+    """
+    reservas = list(
+        ReservaStock.objects.filter(carrito=carrito, producto__slug__in=slugs)
+        .values_list('id', 'producto__slug', 'cantidad')
+    )
+    if not reservas:
+        return {}
+    borradas, _ = ReservaStock.objects.filter(id__in=[r[0] for r in reservas]).delete()
+    if borradas != len(reservas):
+        raise ReservasCambiaron
+    apartado = {}
+    for _, slug, cantidad in reservas:
+        apartado[slug] = apartado.get(slug, 0) + cantidad
+    return apartado
+
+
+def disminuir_stock_lote(lineas, carrito=None):
+    """
+    Descuenta el stock de todas las líneas en una sola transacción.
+
+    Todo o nada: si una línea no alcanza (o el producto no existe) no se
+    descuenta ninguna y se lanza StockInsuficiente con el detalle.
+
+    Solo se vende lo que no está reservado (stock - reservado). Con
+    `carrito`, sus reservas sobre esos productos se convierten en venta:
+    se borran y el mismo UPDATE resta sus unidades de `reservado`, sin
+    volver a bloquear ni leer los productos.
+
+    Los productos con stock fragmentado descuentan de sus fragmentos
+    (store/stock_fragmentado.py) sin tocar su fila de store_producto.
+
+    Sin carrito ni fragmentados son dos consultas sin importar el tamaño
+    del lote: un UPDATE condicional con CASE para todas las filas y un
+    SELECT del stock final (con varias líneas, en PostgreSQL/MySQL, antes
+    un SELECT ... FOR UPDATE por id: ver bloquear_en_orden). Si el UPDATE
+    no tocó todas las filas esperadas, se revierte.
+    """
+    cantidades = agrupar_lineas(lineas)
+    apartado = {}
+    fragmentados = _fragmentados_del_lote(cantidades)
+
+    for _ in range(3):
+        normales = {slug: c for slug, c in cantidades.items() if slug not in fragmentados}
+        try:
+            with transaction.atomic():
+                apartado = tomar_reservas(carrito, list(normales)) if carrito and normales else {}
+                stock_actual = {}
+                if normales:
+                    stock_actual = _descontar_normales(normales, apartado)
+                for slug, (producto_id, fragmentos) in fragmentados.items():
+                    if not stock_fragmentado.descontar(producto_id, fragmentos, cantidades[slug]):
+                        raise _LoteIncompleto
+                if fragmentados:
+                    totales = stock_fragmentado.stock_total(p for p, _ in fragmentados.values())
+                    for slug, (producto_id, _) in fragmentados.items():
+                        stock_actual[slug] = totales.get(producto_id, 0)
+                # update() no dispara señales: invalidamos a mano
+                invalidar_catalogo()
+        except ReservasCambiaron:
+            continue
+        except _LoteIncompleto:
+            # ¿Algún producto se fragmentó (o dejó de estarlo) hace poco?
+            vigentes = _fragmentados_del_lote(cantidades, refrescar=True)
+            if vigentes == fragmentados:
+                break
+            fragmentados = vigentes
+        else:
+            return [
+                {'slug': slug, 'cantidad': cantidad, 'ok': True, 'stock': stock_actual[slug]}
+                for slug, cantidad in cantidades.items()
+            ]
+
+    raise StockInsuficiente(detalle_lineas(cantidades, apartado))
+
+
+def _fragmentados_del_lote(cantidades, refrescar=False):
+    todos = stock_fragmentado.productos_fragmentados(refrescar=refrescar)
+    return {slug: todos[slug] for slug in cantidades if slug in todos}
+
+
+def _descontar_normales(cantidades, apartado):
+    """El UPDATE condicional con CASE de todas las líneas + el SELECT del stock final."""
+    condicion = Q()
+    for slug, cantidad in cantidades.items():
+        # Las unidades reservadas por otros carritos no se tocan
+        condicion |= Q(slug=slug, stock_fragmentado=False,
+                       stock__gte=F('reservado') - apartado.get(slug, 0) + cantidad)
+
+    if len(cantidades) > 1:
+        bloquear_en_orden(Q(slug__in=list(cantidades)))
+    cambios = {'stock': F('stock') - caso_por('slug', cantidades), 'actualizado': timezone.now()}
+    if apartado:
+        cambios['reservado'] = F('reservado') - caso_por('slug', apartado)
+    actualizados = Producto.objects.filter(condicion).update(**cambios)
+    if actualizados != len(cantidades):
+        # Alguna línea no alcanzó: se revierte el lote completo
+        raise _LoteIncompleto
+    return dict(Producto.objects.filter(slug__in=list(cantidades)).values_list('slug', 'stock'))
+
+
+def detalle_lineas(cantidades, apartado=None):
+    """
+    Tras el rollback: el stock vendible de cada línea (sin lo reservado
+    por otros carritos) para explicar cuál no alcanzó.
+    """
+    apartado = apartado or {}
+    filas = list(
+        Producto.objects.filter(slug__in=list(cantidades))
+        .values_list('slug', 'id', 'stock', 'reservado', 'stock_fragmentado')
+    )
+    stock_actual = {slug: stock - reservado for slug, _, stock, reservado, _ in filas}
+    fragmentados = {producto_id: slug for slug, producto_id, _, _, fragmentado in filas if fragmentado}
+    if fragmentados:
+        for producto_id, total in stock_fragmentado.stock_total(fragmentados).items():
+            stock_actual[fragmentados[producto_id]] = total
+    resultado = []
+    for slug, cantidad in cantidades.items():
+        stock = stock_actual.get(slug)
+        if stock is not None:
+            stock += apartado.get(slug, 0)
+        linea = {'slug': slug, 'cantidad': cantidad, 'ok': True, 'stock': stock}
+        if stock is None:
+            linea.update(ok=False, error="Producto no encontrado.")
+        elif stock < cantidad:
+            linea.update(ok=False, error="Stock insuficiente.")
+        resultado.append(linea)
+    return resultado
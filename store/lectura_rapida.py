@@ -0,0 +1,116 @@
+# store/lectura_rapida.py
+#
+# Camino rápido (solo lectura) para los listados del catálogo.
+#
+# En vez de instanciar un Producto por fila y pasar cada campo por
+# ProductoSerializer, se leen tuplas con .values() y se arma el dict
+# final a mano, con EXACTAMENTE el mismo esquema. El JSON se genera con
+# orjson si está instalado (si no, con el JSONRenderer de DRF).
+#
+# Se puede desactivar con CATALOGO_LECTURA_RAPIDA = False.
+
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .medios import url_imagenes, urls_variantes
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+# Columnas que se leen de la BD (en el orden de ProductoSerializer)
+CAMPOS_PRODUCTO = (
+    'id',
+    'nombre',
+    'slug',
+    'categoria__nombre',
+    'descripcion',
+    'precio',
+    'stock',
+    'reservado',
+    'imagen',
+    'imagen_variantes',
+    'es_nuevo',
+    'tiene_descuento',
+    'porcentaje_descuento',
+)
+
+CENTAVOS = Decimal('0.01')
+
+
+def lectura_rapida_habilitada():
+    return getattr(settings, 'CATALOGO_LECTURA_RAPIDA', True)
+
+
+def productos_a_dicts(filas, request=None):
+    """
+    Filas de .values(*CAMPOS_PRODUCTO) → dicts con el esquema de
+    ProductoSerializer.
+    """
+    url = url_imagenes(request)
+    return [
+        {
+            'id': fila['id'],
+            'nombre': fila['nombre'],
+            'slug': fila['slug'],
+            'categoria': fila['categoria__nombre'],
+            'descripcion': fila['descripcion'],
+            'precio': f"{fila['precio'].quantize(CENTAVOS):f}",
+            'stock': fila['stock'],
+            'stock_vendible': max(fila['stock'] - fila['reservado'], 0),
+            'imagen': url(fila['imagen']) if fila['imagen'] else None,
+            'imagen_variantes': urls_variantes(fila['imagen_variantes'], fila['imagen'], url),
+            'es_nuevo': fila['es_nuevo'],
+            'tiene_descuento': fila['tiene_descuento'],
+            'porcentaje_descuento': fila['porcentaje_descuento'],
+        }
+        for fila in filas
+    ]
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    Mismo JSON que JSONRenderer (compacto, UTF-8), generado con orjson
+    cuando está disponible. Con indentación o tipos que orjson no maneja
+    se delega en DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            # Las fechas se dejan a DRF (formato ISO con 'Z')
+            ret = orjson.dumps(data, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Igual que DRF: JSON que también es JavaScript válido
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class LecturaRapidaMixin:
+    """
+    Reemplaza `list` por el camino rápido. El ViewSet define
+    `campos_rapidos` (columnas de .values()) y, si hace falta,
+    `convertir_filas(filas)` para darles el esquema del serializer.
+    """
+    campos_rapidos = ()
+
+    def convertir_filas(self, filas):
+        return list(filas)
+
+    def list(self, request, *args, **kwargs):
+        if not lectura_rapida_habilitada():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.campos_rapidos)
+        pagina = self.paginate_queryset(queryset)
+        if pagina is not None:
+            return self.get_paginated_response(self.convertir_filas(pagina))
+        return Response(self.convertir_filas(queryset))
@@ -0,0 +1,263 @@
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from store import ventas
+from store.benchmarks import resumen
+from store.cache import invalidar_catalogo
+from store.models import Categoria, Pedido, Producto, Trabajo
+
+ESCENARIOS = ("catalogo", "detalle", "checkout", "historial")
+# Solo órdenes de ProductoCursorPagination.ordenes_permitidos: otro valor
+# cae en silencio al orden por defecto y se mediría ese
+ORDENES = ("", "", "precio", "-precio", "-id")
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+class Command(BaseCommand):
+    help = (
+        "Recorre la API con escenarios de uso (navegar el catálogo, ver un "
+        "producto, checkout e historial de pedidos) sobre los datos de "
+        "generar_datos_sinteticos y reporta peticiones/s y latencias p50/p95/p99. "
+        "Con --json guarda el resultado para compararlo entre commits (--comparar)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+        parser.add_argument("--operaciones", type=int, default=500,
+                            help="Operaciones medidas por escenario.")
+        parser.add_argument("--concurrencia", type=int, default=1,
+                            help="Clientes simultáneos (un hilo y una conexión cada uno).")
+        parser.add_argument("--calentamiento", type=int, default=20)
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--prefijo", default="sint")
+        parser.add_argument("--con-cache", action="store_true",
+                            help="Deja activa la cache del catálogo (por defecto se mide la BD).")
+        parser.add_argument("--json", dest="salida_json", help="Guarda los resultados en este archivo.")
+        parser.add_argument("--comparar", help="JSON de una corrida anterior para mostrar la diferencia.")
+
+    def handle(self, *args, **options):
+        escenarios = [e.strip() for e in options["escenarios"].split(",") if e.strip()]
+        if set(escenarios) - set(ESCENARIOS):
+            raise CommandError(f"--escenarios admite: {', '.join(ESCENARIOS)}")
+
+        self.preparar(options["prefijo"])
+        resultado = {
+            "commit": commit_actual(),
+            "fecha": timezone.now().isoformat(timespec="seconds"),
+            "base_datos": connection.vendor,
+            "datos": {"productos": len(self.productos), "pedidos": self.total_pedidos},
+            "opciones": {
+                clave: options[clave]
+                for clave in ("operaciones", "concurrencia", "semilla", "con_cache", "prefijo")
+            },
+            "escenarios": {},
+        }
+
+        ajustes = {"ALLOWED_HOSTS": ["testserver"], "CATALOGO_CACHE_HABILITADO": options["con_cache"]}
+        with override_settings(**ajustes):
+            for escenario in escenarios:
+                try:
+                    stats = self.correr(escenario, options)
+                finally:
+                    if escenario == "checkout":
+                        self.deshacer_checkout()
+                resultado["escenarios"][escenario] = stats
+                self.stdout.write(
+                    f"{escenario:<10} {stats['operaciones_por_segundo']:>8} op/s  "
+                    f"p50={stats['p50_ms']:>8} ms  p95={stats['p95_ms']:>8} ms  "
+                    f"p99={stats['p99_ms']:>8} ms  errores={stats['errores']}"
+                )
+
+        if options["comparar"]:
+            self.comparar(resultado, options["comparar"])
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultado, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados en {options['salida_json']}"))
+
+    # ------------------------------
+    # Datos de los escenarios
+    # ------------------------------
+
+    def preparar(self, prefijo):
+        productos = Producto.objects.filter(slug__startswith=f"{prefijo}-producto-", disponible=True)
+        self.productos = list(productos.values_list("slug", flat=True))
+        self.categorias = list(
+            Categoria.objects.filter(slug__startswith=f"{prefijo}-cat-").values_list("slug", flat=True)
+        )
+        # Checkout con productos que aguantan todas las operaciones
+        self.para_checkout = list(productos.filter(stock__gte=50).values_list("id", "slug", "precio")[:500])
+        pedidos = Pedido.objects.filter(email__startswith=f"{prefijo}-cliente-")
+        self.total_pedidos = pedidos.count()
+        self.clientes = list(pedidos.order_by("-creado_en").values_list("user_uid", flat=True)[:2000])
+        if not (self.productos and self.categorias and self.para_checkout and self.clientes):
+            raise CommandError(
+                f"No hay datos sintéticos '{prefijo}': corre antes "
+                f"manage.py generar_datos_sinteticos --prefijo {prefijo}"
+            )
+        self.creados, self.descontados = [], []
+
+    # ------------------------------
+    # Escenarios: cada llamada es una operación medida
+    # ------------------------------
+
+    def catalogo(self, cliente, rnd, estado):
+        """Primera página con filtros al azar o, casi siempre, la siguiente."""
+        siguiente = estado.get("siguiente")
+        if siguiente and rnd.random() < 0.7:
+            respuesta = cliente.get(siguiente, HTTP_ACCEPT="application/json")
+        else:
+            params = {"page_size": rnd.choice((12, 24, 48))}
+            if rnd.random() < 0.5:
+                params["categoria"] = rnd.choice(self.categorias)
+            if rnd.random() < 0.3:
+                params["en_stock"] = "true"
+            if orden := rnd.choice(ORDENES):
+                params["orden"] = orden
+            if rnd.random() < 0.2:
+                params["facetas"] = "1"
+            respuesta = cliente.get("/api/v1/productos/", params, HTTP_ACCEPT="application/json")
+        estado["siguiente"] = respuesta.json().get("next") if respuesta.status_code == 200 else None
+        return respuesta.status_code == 200
+
+    def detalle(self, cliente, rnd, estado):
+        slug = rnd.choice(self.productos)
+        return cliente.get(f"/api/v1/productos/{slug}/", HTTP_ACCEPT="application/json").status_code == 200
+
+    def checkout(self, cliente, rnd, estado):
+        """Lo que hace el frontend: descontar stock y después crear el pedido."""
+        producto_id, slug, precio = rnd.choice(self.para_checkout)
+        cantidad = rnd.randint(1, 2)
+        respuesta = cliente.post(
+            f"/api/v1/productos/{slug}/disminuir_stock/", {"cantidad": cantidad},
+            content_type="application/json",
+        )
+        if respuesta.status_code != 200:
+            return False
+        self.descontados.append((producto_id, cantidad))
+        numero = rnd.randrange(1_000_000)
+        respuesta = cliente.post("/api/v1/pedidos/", {
+            "user_uid": f"bench-api-uid-{numero}",
+            "email": f"bench-api-{numero}@ejemplo.com",
+            "nombre_cliente": "Cliente benchmark",
+            "direccion": "Calle 1",
+            "metodo_pago": "Tarjeta",
+            "total": str(precio * cantidad),
+            "items": [{"producto": producto_id, "cantidad": cantidad, "precio_unitario": str(precio)}],
+        }, content_type="application/json")
+        if respuesta.status_code != 201:
+            return False
+        self.creados.append(respuesta.json()["id"])
+        return True
+
+    def historial(self, cliente, rnd, estado):
+        uid = rnd.choice(self.clientes)
+        respuesta = cliente.get("/api/v1/pedidos/", {"user_uid": uid}, HTTP_ACCEPT="application/json")
+        return respuesta.status_code == 200
+
+    # ------------------------------
+    # Ejecución
+    # ------------------------------
+
+    def correr(self, escenario, options):
+        operacion = getattr(self, escenario)
+        pendientes = itertools.count()
+        candado = threading.Lock()
+        muestras, errores, excepciones = [], [0], Counter()
+
+        def medida(cliente, rnd, estado):
+            try:
+                return operacion(cliente, rnd, estado)
+            except Exception as exc:  # p. ej. "database is locked": se cuenta y se sigue
+                with candado:
+                    excepciones[type(exc).__name__] += 1
+                return False
+
+        def trabajador(numero):
+            cliente = Client(raise_request_exception=False)
+            rnd = random.Random(options["semilla"] * 1000 + numero)
+            estado = {}
+            try:
+                for _ in range(options["calentamiento"] // options["concurrencia"] + 1):
+                    medida(cliente, rnd, estado)
+                while True:
+                    with candado:
+                        n = next(pendientes)
+                    if n >= options["operaciones"]:
+                        return
+                    inicio = time.perf_counter()
+                    ok = medida(cliente, rnd, estado)
+                    muestras.append(time.perf_counter() - inicio)
+                    if not ok:
+                        with candado:
+                            errores[0] += 1
+            finally:
+                connection.close()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrencia"]) as hilos:
+            list(hilos.map(trabajador, range(options["concurrencia"])))
+        duracion = time.perf_counter() - inicio
+
+        stats = resumen(muestras)
+        stats.pop("por_segundo")
+        return {
+            **stats,
+            "operaciones_por_segundo": round(len(muestras) / duracion, 1),
+            "errores": errores[0],
+            "excepciones": dict(excepciones),
+        }
+
+    def deshacer_checkout(self):
+        """Borra los pedidos del escenario checkout y devuelve el stock descontado."""
+        with transaction.atomic():
+            pedidos = Pedido.objects.filter(id__in=self.creados).prefetch_related("items")
+            for pedido in pedidos:
+                ventas.registrar_pedido(pedido, list(pedido.items.all()), signo=-1)
+            Pedido.objects.filter(id__in=self.creados).delete()
+            # Sus facturas pendientes fallarían al no encontrar el pedido
+            Trabajo.objects.filter(tipo="factura_pedido", argumentos__pedido_id__in=self.creados).delete()
+            devolver = Counter()
+            for producto_id, cantidad in self.descontados:
+                devolver[producto_id] += cantidad
+            for producto_id, cantidad in devolver.items():
+                Producto.objects.filter(id=producto_id).update(stock=F("stock") + cantidad)
+        invalidar_catalogo()
+        self.creados, self.descontados = [], []
+
+    def comparar(self, resultado, archivo):
+        with open(archivo, encoding="utf-8") as f:
+            anterior = json.load(f)
+        self.stdout.write(f"\nContra {archivo} (commit {anterior.get('commit')}):")
+        for escenario, stats in resultado["escenarios"].items():
+            previo = anterior.get("escenarios", {}).get(escenario)
+            if not previo:
+                continue
+            cambios = []
+            for clave in ("operaciones_por_segundo", "p50_ms", "p95_ms", "p99_ms"):
+                if previo.get(clave):
+                    cambios.append(f"{clave}={(stats[clave] / previo[clave] - 1) * 100:+.1f}%")
+            self.stdout.write(f"  {escenario:<10} " + "  ".join(cambios))
@@ -0,0 +1,196 @@
+import asyncio
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import include, path
+
+from store.asincrono import con_lectura_asincrona
+from store.benchmarks import catalogo_confirmado, resumen
+from store.models import Categoria, Producto
+from store.urls import router
+
+RUTAS = (
+    "/api/v1/productos/",
+    "/api/v1/productos/?page_size=48&orden=-precio",
+    "/api/v1/productos/?categoria={categoria}&en_stock=true",
+    "/api/v1/productos/{producto}/",
+    "/api/v1/categorias/",
+    "/api/v1/categorias/{categoria}/",
+)
+
+
+class UrlsWSGI:
+    urlpatterns = [path("api/v1/", include(router.urls))]
+
+
+class UrlsASGI:
+    urlpatterns = [path("api/v1/", include(con_lectura_asincrona(router.urls)))]
+
+
+def llamar_wsgi(app, ruta):
+    ruta, _, query = ruta.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": ruta,
+        "QUERY_STRING": query,
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost",
+        "HTTP_ACCEPT": "application/json",
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.url_scheme": "http",
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    estado = []
+    cuerpo = app(environ, lambda status, headers, exc_info=None: estado.append(status))
+    try:
+        for _ in cuerpo:
+            pass
+    finally:
+        cuerpo.close()   # request_finished: cierra la conexión a la BD
+    return int(estado[0].split()[0])
+
+
+async def llamar_asgi(app, ruta):
+    ruta, _, query = ruta.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": ruta,
+        "raw_path": ruta.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"accept", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 80),
+    }
+    leido = False
+    estado = []
+
+    async def receive():
+        nonlocal leido
+        if not leido:
+            leido = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Django escucha una desconexión hasta terminar: el cliente no se va
+        await asyncio.Future()
+
+    async def send(mensaje):
+        if mensaje["type"] == "http.response.start":
+            estado.append(mensaje["status"])
+
+    await app(scope, receive, send)
+    return estado[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara peticiones/s y latencia p99 de la lectura del catálogo servida "
+        "por WSGI (vistas DRF en un pool de hilos, como gunicorn --threads) y por "
+        "ASGI (vistas async de store/asincrono.py) a distintas concurrencias. "
+        "Llama a las aplicaciones en proceso, sin servidor HTTP."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrencia", default="16,64,256",
+                            help="Clientes simultáneos, separados por coma.")
+        parser.add_argument("--peticiones", type=int, default=2000,
+                            help="Peticiones por modo y concurrencia.")
+        parser.add_argument("--hilos", type=int, default=16,
+                            help="Hilos del servidor WSGI simulado.")
+        parser.add_argument("--productos", type=int, default=0,
+                            help="Agrega N productos sintéticos (se borran al terminar).")
+        parser.add_argument("--con-cache", action="store_true",
+                            help="Deja activa la cache del catálogo (por defecto se mide la BD).")
+        parser.add_argument("--modos", default="wsgi,asgi")
+        parser.add_argument("--json", dest="salida_json", help="Guarda los resultados en este archivo.")
+
+    def handle(self, *args, **options):
+        concurrencias = [int(c) for c in options["concurrencia"].split(",")]
+        modos = [m.strip() for m in options["modos"].split(",") if m.strip()]
+        if set(modos) - {"wsgi", "asgi"}:
+            raise CommandError("--modos admite wsgi y asgi")
+
+        resultados = []
+        ajustes = {"ALLOWED_HOSTS": ["localhost"], "CATALOGO_CACHE_HABILITADO": options["con_cache"]}
+        with override_settings(**ajustes), catalogo_confirmado(options["productos"], prefijo="bench-asgi"):
+            rutas = self.rutas()
+            for modo in modos:
+                with override_settings(ROOT_URLCONF=UrlsWSGI if modo == "wsgi" else UrlsASGI):
+                    for concurrencia in concurrencias:
+                        stats = asyncio.run(self.medir(modo, rutas, concurrencia, options))
+                        resultados.append({"modo": modo, "concurrencia": concurrencia, **stats})
+                        self.stdout.write(
+                            f"{modo:<5} c={concurrencia:<4} {stats['peticiones_por_segundo']:>8} req/s  "
+                            f"p50={stats['p50_ms']:>8} ms  p99={stats['p99_ms']:>8} ms  "
+                            f"errores={stats['errores']}"
+                        )
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados en {options['salida_json']}"))
+
+    def rutas(self):
+        producto = Producto.objects.filter(disponible=True).order_by("id").first()
+        if producto is None:
+            raise CommandError("No hay productos; usa --productos N.")
+        ctx = {
+            "producto": producto.slug,
+            "categoria": Categoria.objects.get(pk=producto.categoria_id).slug,
+        }
+        return [ruta.format(**ctx) for ruta in RUTAS]
+
+    async def medir(self, modo, rutas, concurrencia, options):
+        if modo == "wsgi":
+            app = WSGIHandler()
+            hilos = ThreadPoolExecutor(max_workers=options["hilos"])
+            loop = asyncio.get_running_loop()
+
+            async def pedir(ruta):
+                return await loop.run_in_executor(hilos, llamar_wsgi, app, ruta)
+        else:
+            app = get_asgi_application()
+            hilos = None
+
+            async def pedir(ruta):
+                return await llamar_asgi(app, ruta)
+
+        # Calentamiento: URLconf, serializers, conexiones
+        for ruta in rutas:
+            await pedir(ruta)
+
+        pendientes = iter(range(options["peticiones"]))
+        muestras, errores = [], 0
+
+        async def cliente():
+            nonlocal errores
+            for n in pendientes:
+                inicio = time.perf_counter()
+                estado = await pedir(rutas[n % len(rutas)])
+                muestras.append(time.perf_counter() - inicio)
+                if estado != 200:
+                    errores += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(concurrencia)))
+        duracion = time.perf_counter() - inicio
+        if hilos is not None:
+            hilos.shutdown()
+
+        stats = resumen(muestras)
+        stats.pop("por_segundo")
+        return {**stats, "peticiones_por_segundo": round(len(muestras) / duracion, 1), "errores": errores}
@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from store.benchmarks import datos_temporales, generar_catalogo, medir
+from store.views import ProductoViewSet
+
+ESCENARIOS = {
+    "primera_pagina": {},
+    "filtros": {"categoria": "bench-cat-3", "precio_min": "50", "precio_max": "300", "en_stock": "true"},
+    "filtros_facetas": {
+        "categoria": "bench-cat-3", "precio_min": "50", "precio_max": "300",
+        "en_stock": "true", "facetas": "1",
+    },
+    "solo_facetas": {"facetas": "1", "page_size": "1"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia de GET /productos/ con filtros y facetas a medida "
+        "que crece el catálogo, sin la cache del catálogo: cada petición "
+        "recalcula las facetas (el costo de un fallo de cache), que crece con "
+        "el catálogo; al final resume ese crecimiento. Los datos sintéticos "
+        "se revierten al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanos", default="1000,10000,100000",
+                            help="Tamaños del catálogo, separados por coma.")
+        parser.add_argument("--repeticiones", type=int, default=30)
+        parser.add_argument("--json", dest="salida_json", help="Guarda los resultados en este archivo.")
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(t) for t in options["tamanos"].split(","))
+        factory = APIRequestFactory()
+        vista = ProductoViewSet.as_view({"get": "list"})
+
+        def pedir(params):
+            def _pedir():
+                response = vista(factory.get("/api/v1/productos/", params, HTTP_HOST="localhost"))
+                if response.has_header("X-Cache"):
+                    raise CommandError("La cache del catálogo respondió: se mediría un acierto, no las facetas")
+                response.render()
+            return _pedir
+
+        resultados = []
+        # Sin cache del catálogo: se mide el trabajo real de la vista
+        with override_settings(CATALOGO_CACHE_HABILITADO=False), datos_temporales():
+            actual = 0
+            for tamano in tamanos:
+                self.stdout.write(f"Generando catálogo de {tamano} productos...")
+                generar_catalogo(tamano, desde=actual)
+                actual = tamano
+
+                for nombre, params in ESCENARIOS.items():
+                    stats = medir(pedir(params), options["repeticiones"])
+                    resultados.append({"productos": tamano, "escenario": nombre, "cache": "fallo", **stats})
+                    self.stdout.write(
+                        f"  {nombre:<16} fallo de cache  p50={stats['p50_ms']:>8} ms  "
+                        f"p95={stats['p95_ms']:>8} ms  p99={stats['p99_ms']:>8} ms"
+                    )
+
+        self.resumir_crecimiento(resultados, tamanos)
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados en {options['salida_json']}"))
+
+    def resumir_crecimiento(self, resultados, tamanos):
+        """Cuánto crece el fallo de cache del tamaño menor al mayor."""
+        if len(tamanos) < 2:
+            return
+        p50 = {(r["productos"], r["escenario"]): r["p50_ms"] for r in resultados}
+        menor, mayor = tamanos[0], tamanos[-1]
+        self.stdout.write(f"Fallo de cache, p50 con {mayor} productos frente a {menor}:")
+        for nombre in ESCENARIOS:
+            antes, despues = p50[(menor, nombre)], p50[(mayor, nombre)]
+            factor = f"{despues / antes:.1f}x" if antes else "-"
+            self.stdout.write(f"  {nombre:<16} {antes:>8} ms → {despues:>8} ms  ({factor})")
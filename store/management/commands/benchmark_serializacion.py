@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from store.benchmarks import datos_temporales, generar_catalogo, medir
+from store.lectura_rapida import CAMPOS_PRODUCTO, JSONRapidoRenderer, productos_a_dicts
+from store.models import Producto
+from store.serializers import ProductoSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara filas/segundo al serializar el catálogo con ProductoSerializer "
+        "y con el camino rápido (.values() + orjson). Los datos sintéticos se "
+        "revierten al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tamanos", default="1000,10000,100000",
+                            help="Tamaños del catálogo, separados por coma.")
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--json", dest="salida_json", help="Guarda los resultados en este archivo.")
+
+    def handle(self, *args, **options):
+        tamanos = sorted(int(t) for t in options["tamanos"].split(","))
+        request = APIRequestFactory().get("/api/v1/productos/", HTTP_HOST="localhost")
+
+        def serializer():
+            qs = Producto.objects.select_related("categoria").order_by("id")
+            data = ProductoSerializer(qs, many=True, context={"request": request}).data
+            return JSONRenderer().render(data)
+
+        def rapido():
+            filas = Producto.objects.order_by("id").values(*CAMPOS_PRODUCTO)
+            return JSONRapidoRenderer().render(productos_a_dicts(filas, request))
+
+        resultados = []
+        with override_settings(ALLOWED_HOSTS=["localhost"]), datos_temporales():
+            actual = 0
+            for tamano in tamanos:
+                self.stdout.write(f"Generando catálogo de {tamano} productos...")
+                generar_catalogo(tamano, desde=actual)
+                actual = tamano
+                filas = Producto.objects.count()
+
+                if serializer() != rapido():
+                    self.stderr.write(self.style.WARNING("  ⚠ Las dos salidas no coinciden"))
+
+                por_camino = {}
+                for nombre, funcion in (("serializer", serializer), ("rapido", rapido)):
+                    stats = medir(funcion, options["repeticiones"], calentamiento=1)
+                    stats["filas_por_segundo"] = round(filas * stats["por_segundo"])
+                    por_camino[nombre] = stats
+                    resultados.append({"productos": filas, "camino": nombre, **stats})
+                    self.stdout.write(
+                        f"  {nombre:<10} p50={stats['p50_ms']:>10} ms  "
+                        f"{stats['filas_por_segundo']:>10} filas/s"
+                    )
+                self.stdout.write(
+                    f"  aceleración x{por_camino['serializer']['media_ms'] / por_camino['rapido']['media_ms']:.1f}"
+                )
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados en {options['salida_json']}"))
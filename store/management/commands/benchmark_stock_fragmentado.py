@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from store.cache import invalidar_catalogo
+from store.inventario import disminuir_stock_lote
+from store.models import Categoria, Producto
+from store.stock_fragmentado import fragmentar, olvidar_fragmentados, stock_total
+
+SLUG = "bench-flash-producto"
+STOCK = 10_000_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide compras/s de un único producto con N compradores concurrentes, "
+        "con el stock en una sola fila y fragmentado. Cada compra es "
+        "disminuir_stock_lote de 1 unidad en su propia transacción y conexión. "
+        "En SQLite las escrituras de toda la base se serializan, así que la "
+        "diferencia solo se ve en MySQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--trabajadores", default="1,2,4,8,16",
+                            help="Compradores concurrentes, separados por coma.")
+        parser.add_argument("--segundos", type=float, default=5, help="Duración de cada medición.")
+        parser.add_argument("--fragmentos", type=int, help="Por defecto STOCK_FRAGMENTOS.")
+        parser.add_argument("--modos", default="fila,fragmentado")
+        parser.add_argument("--json", dest="salida_json", help="Guarda los resultados en este archivo.")
+
+    def handle(self, *args, **options):
+        trabajadores = [int(t) for t in options["trabajadores"].split(",")]
+        modos = [m.strip() for m in options["modos"].split(",") if m.strip()]
+        if set(modos) - {"fila", "fragmentado"}:
+            raise CommandError("--modos admite fila y fragmentado")
+        if connection.vendor == "sqlite":
+            self.stdout.write(self.style.WARNING("⚠ SQLite: una sola escritura a la vez en toda la base"))
+
+        resultados = []
+        for modo in modos:
+            base = None
+            for n in trabajadores:
+                self.preparar(modo, options["fragmentos"])
+                try:
+                    stats = self.medir(n, options["segundos"])
+                finally:
+                    self.limpiar()
+                base = base or stats["compras_por_segundo"]
+                stats["escala"] = round(stats["compras_por_segundo"] / base, 2) if base else None
+                resultados.append({"modo": modo, "trabajadores": n, **stats})
+                self.stdout.write(
+                    f"{modo:<12} n={n:<3} {stats['compras_por_segundo']:>9} compras/s  "
+                    f"x{stats['escala']}  errores={stats['errores']}"
+                )
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(resultados, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✔ Resultados en {options['salida_json']}"))
+
+    def preparar(self, modo, fragmentos):
+        categoria, _ = Categoria.objects.get_or_create(slug="bench-flash", defaults={"nombre": "Bench flash"})
+        producto = Producto.objects.create(
+            categoria=categoria, nombre="Sobre de expansión (flash)", slug=SLUG,
+            precio=20, stock=STOCK,
+        )
+        if modo == "fragmentado":
+            fragmentar(producto, fragmentos)
+        olvidar_fragmentados()
+
+    def limpiar(self):
+        Producto.objects.filter(slug=SLUG).delete()
+        Categoria.objects.filter(slug="bench-flash").delete()
+        olvidar_fragmentados()
+        invalidar_catalogo()
+
+    def medir(self, trabajadores, segundos):
+        compras, errores = [0], [0]
+        candado = threading.Lock()
+        fin = time.perf_counter() + segundos
+
+        def comprador(_):
+            hechas = fallidas = 0
+            try:
+                while time.perf_counter() < fin:
+                    try:
+                        disminuir_stock_lote([{"slug": SLUG, "cantidad": 1}])
+                        hechas += 1
+                    except Exception:  # p. ej. "database is locked" en SQLite
+                        fallidas += 1
+            finally:
+                connection.close()
+                with candado:
+                    compras[0] += hechas
+                    errores[0] += fallidas
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=trabajadores) as hilos:
+            list(hilos.map(comprador, range(trabajadores)))
+        duracion = time.perf_counter() - inicio
+
+        # Ninguna compra se perdió ni se contó dos veces
+        producto = Producto.objects.get(slug=SLUG)
+        restante = stock_total([producto.pk]).get(producto.pk) if producto.stock_fragmentado else producto.stock
+        if restante != STOCK - compras[0]:
+            raise CommandError(f"Stock inconsistente: quedan {restante}, se esperaban {STOCK - compras[0]}")
+        return {"compras_por_segundo": round(compras[0] / duracion, 1), "errores": errores[0]}
@@ -1,116 +1,135 @@
-
+import csv
+import json
 import os
+import time
 from urllib.parse import quote_plus
 
-import requests
 from django.conf import settings
-from django.core.management.base import BaseCommand
-
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from store.cache import invalidar_catalogo
+from store.descargas import descargar_todas
+from store.imagenes import programar_variantes
 from store.models import Producto
 
-
-# Lista de productos (slug, nombre) – los 50 que ya tienes
-PRODUCTOS = [
-    ("catan", "Catan"),
-    ("risk", "Risk"),
-    ("carcassonne", "Carcassonne"),
-    ("terraforming-mars", "Terraforming Mars"),
-    ("gloomhaven", "Gloomhaven"),
-    ("scythe", "Scythe"),
-    ("7-wonders", "7 Wonders"),
-    ("azul", "Azul"),
-    ("wingspan", "Wingspan"),
-    ("root", "Root"),
-    ("ticket-to-ride", "Ticket to Ride"),
-    ("dixit", "Dixit"),
-    ("monopoly", "Monopoly"),
-    ("clue", "Clue"),
-    ("jenga", "Jenga"),
-    ("uno", "Uno"),
-    ("scrabble", "Scrabble"),
-    ("sequence", "Sequence"),
-    ("king-of-tokyo", "King of Tokyo"),
-    ("dobble", "Dobble"),
-    ("magic-the-gathering-booster", "Magic: The Gathering"),
-    ("pokemon-tcg-booster", "Pokemon TCG"),
-    ("yu-gi-oh-booster", "Yu-Gi-Oh!"),
-    ("exploding-kittens", "Exploding Kittens"),
-    ("unstable-unicorns", "Unstable Unicorns"),
-    ("the-mind", "The Mind"),
-    ("sushi-go-party", "Sushi Go Party!"),
-    ("coup", "Coup"),
-    ("love-letter", "Love Letter"),
-    ("slay-the-spire-juego-de-mesa", "Slay the Spire"),
-    ("dd-players-handbook", "D&D Player's Handbook"),
-    ("dd-monster-manual", "D&D Monster Manual"),
-    ("dd-dungeon-masters-guide", "D&D Dungeon Master's Guide"),
-    ("pathfinder-core-rulebook", "Pathfinder Core Rulebook"),
-    ("call-of-cthulhu-starter-set", "Call of Cthulhu Starter Set"),
-    ("cyberpunk-red-core-rulebook", "Cyberpunk RED"),
-    ("vampire-the-masquerade", "Vampire: The Masquerade"),
-    ("starfinder-core-rulebook", "Starfinder Core Rulebook"),
-    ("fate-core-system", "FATE Core System"),
-    ("blades-in-the-dark", "Blades in the Dark"),
-    ("codenames", "Codenames"),
-    ("cards-against-humanity", "Cards Against Humanity"),
-    ("what-do-you-meme", "What Do You Meme?"),
-    ("secret-hitler", "Secret Hitler"),
-    ("telestrations", "Telestrations"),
-    ("just-one", "Just One"),
-    ("werewolf", "Werewolf"),
-    ("the-quacks-of-quedlinburg", "The Quacks of Quedlinburg"),
-    ("wits-wagers", "Wits & Wagers"),
-    ("taco-gato-cabra-queso-pizza", "Taco Gato Cabra Queso Pizza"),
-]
+URL_POR_DEFECTO = "https://via.placeholder.com/600x600.png?text={nombre}"
 
 
 class Command(BaseCommand):
-    help = "Descarga imágenes dummy y las asigna a los 50 productos."
+    help = (
+        "Descarga en paralelo las imágenes de los productos y las asigna. "
+        "Las URLs salen de una plantilla con {slug}/{nombre} (productos de la BD) "
+        "o de un archivo CSV/JSONL con columnas slug,url. Es reanudable: lo que "
+        "ya está descargado con el mismo checksum se omite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default=URL_POR_DEFECTO,
+                            help="Plantilla de URL; admite {slug} y {nombre}.")
+        parser.add_argument("--archivo", help="CSV (slug,url) o JSONL ({\"slug\", \"url\"}) con las fuentes.")
+        parser.add_argument("--slug", action="append", dest="slugs", help="Solo estos productos (repetible).")
+        parser.add_argument("--sin-imagen", action="store_true", help="Solo productos sin imagen asignada.")
+        parser.add_argument("--workers", type=int, default=8, help="Descargas simultáneas.")
+        parser.add_argument("--reintentos", type=int, default=3)
+        parser.add_argument("--espera", type=float, default=0.5,
+                            help="Factor de espera exponencial entre reintentos (segundos).")
+        parser.add_argument("--timeout", type=float, default=15)
+        parser.add_argument("--forzar", action="store_true", help="Descarga aunque el archivo ya esté.")
 
     def handle(self, *args, **options):
-        media_root = settings.MEDIA_ROOT
-        productos_dir = os.path.join(media_root, "productos")
-        os.makedirs(productos_dir, exist_ok=True)
-
-        self.stdout.write(self.style.WARNING(f"MEDIA_ROOT: {media_root}"))
-        self.stdout.write(self.style.WARNING(f"Guardando imágenes en: {productos_dir}\n"))
-
-        for slug, nombre in PRODUCTOS:
-            try:
-                producto = Producto.objects.get(slug=slug)
-            except Producto.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f"[X] Producto '{slug}' no existe. Se omite."))
-                continue
-
-            texto = quote_plus(nombre)
-            image_url = f"https://via.placeholder.com/600x600.png?text={texto}"
-
-            self.stdout.write(f"Descargando imagen para {nombre} ({slug})...")
-
-            # Descargar imagen
-            try:
-                resp = requests.get(image_url, timeout=15)
-                resp.raise_for_status()
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"  Error al descargar imagen: {e}"))
+        carpeta = os.path.join(settings.MEDIA_ROOT, "productos")
+        self.stdout.write(self.style.WARNING(f"Guardando imágenes en: {carpeta}\n"))
+
+        qs = Producto.objects.only("id", "slug", "nombre", "imagen", "imagen_variantes")
+        if options["slugs"]:
+            qs = qs.filter(slug__in=options["slugs"])
+        if options["sin_imagen"]:
+            qs = qs.filter(Q(imagen="") | Q(imagen__isnull=True))
+        productos = {p.slug: p for p in qs}
+
+        fuentes = self.leer_fuentes(options, productos)
+        if not fuentes:
+            self.stdout.write("No hay imágenes que descargar.")
+            return
+
+        def progreso(slug, resultado):
+            if resultado["estado"] == "error":
+                self.stdout.write(self.style.ERROR(f"  [X] {slug}: {resultado['error']}"))
+            else:
+                self.stdout.write(f"  {resultado['estado']:<10} {slug} -> {resultado['archivo']}")
+
+        inicio = time.perf_counter()
+        resultados = descargar_todas(
+            fuentes,
+            carpeta,
+            workers=options["workers"],
+            reintentos=options["reintentos"],
+            espera=options["espera"],
+            timeout=options["timeout"],
+            forzar=options["forzar"],
+            al_terminar=progreso,
+        )
+
+        # Un solo bulk_update para todos los productos que cambian
+        ahora = timezone.now()
+        cambios = []
+        for slug, resultado in resultados.items():
+            if not resultado["archivo"]:
                 continue
-
-            # Guardar archivo en MEDIA_ROOT/productos/slug.jpg
-            filename = f"{slug}.jpg"
-            relative_path = os.path.join("productos", filename)
-            full_path = os.path.join(media_root, relative_path)
-
-            try:
-                with open(full_path, "wb") as f:
-                    f.write(resp.content)
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"  Error al guardar archivo: {e}"))
+            producto = productos[slug]
+            ruta = f"productos/{resultado['archivo']}"
+            if resultado["estado"] == "descargada" or producto.imagen.name != ruta:
+                producto.imagen = ruta
+                # Archivo nuevo: las miniaturas anteriores ya no sirven
+                producto.imagen_variantes = {}
+                producto.actualizado = ahora
+                cambios.append(producto)
+
+        with transaction.atomic():
+            Producto.objects.bulk_update(cambios, ["imagen", "imagen_variantes", "actualizado"], batch_size=500)
+            if cambios:
+                # bulk_update no dispara señales
+                invalidar_catalogo()
+                for producto in cambios:
+                    programar_variantes(producto.pk)
+
+        conteo = {"descargada": 0, "omitida": 0, "error": 0}
+        for resultado in resultados.values():
+            conteo[resultado["estado"]] += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✔ {conteo['descargada']} descargadas, {conteo['omitida']} omitidas, "
+            f"{conteo['error']} errores, {len(cambios)} productos actualizados "
+            f"en {time.perf_counter() - inicio:.1f} s\n"
+        ))
+
+    def leer_fuentes(self, options, productos):
+        """[(slug, url)] de los productos seleccionados."""
+        if not options["archivo"]:
+            return [
+                (slug, options["url"].format(slug=quote_plus(slug), nombre=quote_plus(p.nombre)))
+                for slug, p in sorted(productos.items())
+            ]
+
+        ruta = options["archivo"]
+        try:
+            with open(ruta, encoding="utf-8", newline="") as f:
+                if ruta.endswith((".jsonl", ".ndjson")):
+                    filas = [json.loads(linea) for linea in f if linea.strip()]
+                else:
+                    filas = list(csv.DictReader(f))
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"No se pudo leer {ruta}: {exc}")
+
+        fuentes = []
+        for fila in filas:
+            slug, url = fila.get("slug"), fila.get("url")
+            if not slug or not url:
+                raise CommandError(f"Fila sin slug/url en {ruta}: {fila}")
+            if slug not in productos:
+                self.stdout.write(self.style.ERROR(f"[X] Producto '{slug}' no existe. Se omite."))
                 continue
-
-            # Asignar al modelo y guardar
-            producto.imagen = relative_path
-            producto.save()
-
-            self.stdout.write(self.style.SUCCESS(f"  OK -> {relative_path}"))
-
-        self.stdout.write(self.style.SUCCESS("\n✔ Proceso completado.\n"))
\ No newline at end of file
+            fuentes.append((slug, url))
+        return fuentes
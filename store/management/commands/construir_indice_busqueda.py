@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store import busqueda
+
+
+class Command(BaseCommand):
+    help = (
+        "Construye el índice de búsqueda de productos y lo guarda en "
+        "BUSQUEDA_INDICE_ARCHIVO para que los procesos lo carguen al arrancar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--archivo",
+            default=settings.BUSQUEDA_INDICE_ARCHIVO,
+            help="Ruta del archivo del índice (por defecto BUSQUEDA_INDICE_ARCHIVO).",
+        )
+        parser.add_argument(
+            "--probar",
+            metavar="CONSULTA",
+            help="Ejecuta una consulta de prueba y muestra el tiempo.",
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        total = busqueda.construir_indice()
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Indexados {total} productos, {len(busqueda.indice.postings)} términos "
+            f"en {duracion:.2f} s."
+        )
+
+        ruta = options["archivo"]
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        busqueda.indice.guardar(ruta)
+        self.stdout.write(self.style.SUCCESS(f"✔ Índice guardado en {ruta}"))
+        # Los de más de BUSQUEDA_RETIRADOS_DIAS días ya no los necesita nadie
+        self.stdout.write(f"🔹 {busqueda.purgar_retirados()} productos retirados purgados")
+
+        if options["probar"]:
+            inicio = time.perf_counter()
+            coincidencias, mejores = busqueda.indice.buscar(options["probar"])
+            duracion = (time.perf_counter() - inicio) * 1000
+            self.stdout.write(
+                f"'{options['probar']}': {coincidencias} coincidencias en {duracion:.3f} ms"
+            )
+            for producto_id, puntaje in mejores[:10]:
+                self.stdout.write(f"  {producto_id:>8}  {puntaje:.3f}")
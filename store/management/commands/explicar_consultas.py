@@ -0,0 +1,275 @@
+import json
+import re
+import tempfile
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from store import busqueda, trabajos
+from store.benchmarks import datos_temporales, generar_catalogo
+from store.models import Categoria, Pedido, Producto
+
+# (nombre, método, ruta, parámetros). Los textos admiten {producto},
+# {categoria}, {pedido}, {user_uid} y {email}; los parámetros también
+# pueden ser una función contexto → dict. Con método "python" no hay
+# petición: se llama a parámetros(contexto) (la cola de trabajos, que
+# corre en `manage.py procesar_trabajos`, no detrás de un endpoint).
+ESCENARIOS = [
+    ("producto-list", "get", "/api/v1/productos/", {}),
+    ("producto-list (todos)", "get", "/api/v1/productos/", {"todos": "1"}),
+    ("producto-list (orden precio)", "get", "/api/v1/productos/", {"orden": "-precio"}),
+    ("producto-list (filtros)", "get", "/api/v1/productos/", {
+        "categoria": "{categoria}", "precio_min": "10", "precio_max": "300", "en_stock": "true",
+    }),
+    ("producto-list (nuevos)", "get", "/api/v1/productos/", {"es_nuevo": "true"}),
+    ("producto-list (descuento)", "get", "/api/v1/productos/", {"tiene_descuento": "true"}),
+    ("producto-list (facetas)", "get", "/api/v1/productos/", {"facetas": "1", "categoria": "{categoria}"}),
+    ("producto-detail", "get", "/api/v1/productos/{producto}/", {}),
+    ("producto-buscar", "get", "/api/v1/productos/buscar/", {"q": "juego"}),
+    ("producto-disminuir-stock", "post", "/api/v1/productos/{producto}/disminuir_stock/", {"cantidad": 1}),
+    ("producto-disminuir-stock-lote", "post", "/api/v1/productos/disminuir_stock_lote/", {
+        "items": [{"slug": "{producto}", "cantidad": 1}],
+    }),
+    ("categoria-list", "get", "/api/v1/categorias/", {}),
+    ("categoria-detail", "get", "/api/v1/categorias/{categoria}/", {}),
+    ("categoria-productos", "get", "/api/v1/categorias/{categoria}/productos/", {}),
+    ("pedido-create", "post", "/api/v1/pedidos/", lambda ctx: {
+        "email": ctx["email"], "user_uid": ctx["user_uid"], "nombre_cliente": "Explain",
+        "metodo_pago": "Tarjeta", "total": str(ctx["precio"]),
+        "items": [{"producto": ctx["producto_id"], "cantidad": 1, "precio_unitario": str(ctx["precio"])}],
+    }),
+    ("pedido-list", "get", "/api/v1/pedidos/", {}),
+    ("pedido-list (user_uid)", "get", "/api/v1/pedidos/", {"user_uid": "{user_uid}"}),
+    ("pedido-list (email)", "get", "/api/v1/pedidos/", {"email": "{email}"}),
+    ("pedido-detail", "get", "/api/v1/pedidos/{pedido}/", {}),
+    ("pedido-exportar", "get", "/api/v1/pedidos/exportar/", lambda ctx: {
+        "desde": (timezone.localdate() - timedelta(days=30)).isoformat(), "formato": "ndjson",
+    }),
+    ("analitica-ventas", "get", "/api/v1/analitica/ventas/", {}),
+    ("reserva-create", "post", "/api/v1/reservas/", {
+        "carrito": "explain", "items": [{"slug": "{producto}", "cantidad": 1}],
+    }),
+    ("reserva-list", "get", "/api/v1/reservas/", {"carrito": "explain"}),
+    ("producto-disminuir-stock-lote (carrito)", "post", "/api/v1/productos/disminuir_stock_lote/", {
+        "carrito": "explain", "items": [{"slug": "{producto}", "cantidad": 1}],
+    }),
+    ("reserva-liberar", "post", "/api/v1/reservas/liberar/", {"carrito": "explain"}),
+    ("pedido-factura", "get", "/api/v1/pedidos/{pedido}/factura/", {}),
+    ("trabajo-reclamar", "python", "trabajos.reclamar", lambda ctx: _reclamar(ctx)),
+    ("trabajo-factura", "python", "trabajos.ejecutar", lambda ctx: _ejecutar(ctx)),
+    ("trabajo-recuperar", "python", "trabajos.recuperar_abandonados",
+     lambda ctx: trabajos.recuperar_abandonados()),
+]
+
+SENTENCIAS = ("SELECT", "UPDATE", "DELETE")
+
+
+def _reclamar(ctx):
+    trabajos.encolar("factura_pedido", pedido_id=ctx["pedido"])
+    ctx["trabajos"] = trabajos.reclamar("explain", 10)
+
+
+def _ejecutar(ctx):
+    # La factura se escribe en una carpeta temporal, no en MEDIA_ROOT
+    with tempfile.TemporaryDirectory() as carpeta, override_settings(MEDIA_ROOT=carpeta):
+        for trabajo in ctx.get("trabajos", []):
+            trabajos.ejecutar(trabajo)
+
+
+def _rellenar(valor, ctx):
+    if isinstance(valor, str):
+        return valor.format(**ctx)
+    if isinstance(valor, dict):
+        return {k: _rellenar(v, ctx) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_rellenar(v, ctx) for v in valor]
+    return valor
+
+
+def explicar(cursor, sql, params):
+    """
+    Plan de una consulta → (líneas del plan, problemas). Problemas:
+    'scan completo' (recorre toda la tabla), 'recorrido de índice'
+    (recorre el índice en orden; normal con LIMIT) y 'orden en memoria'
+    (filesort/temp). Solo 'scan completo' cuenta para --fallar.
+    """
+    vendor = connection.vendor
+    problemas = []
+    if vendor == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        lineas = [fila[-1] for fila in cursor.fetchall()]
+        for linea in lineas:
+            if re.match(r"SCAN \w+$", linea) or re.match(r"SCAN \w+ AS \w+$", linea):
+                problemas.append(("scan completo", linea.split()[1]))
+            elif re.match(r"SCAN \w+ USING (COVERING )?INDEX", linea):
+                problemas.append(("recorrido de índice", linea.split()[1]))
+            elif "TEMP B-TREE" in linea:
+                problemas.append(("orden en memoria", linea))
+    elif vendor == "mysql":
+        cursor.execute("EXPLAIN " + sql, params)
+        columnas = [c[0] for c in cursor.description]
+        filas = [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        lineas = [
+            f"{f['table']}: type={f['type']} key={f['key']} rows={f['rows']} {f.get('Extra') or ''}"
+            for f in filas
+        ]
+        for f in filas:
+            if f["type"] == "ALL":
+                problemas.append(("scan completo", f["table"]))
+            elif f["type"] == "index":
+                problemas.append(("recorrido de índice", f["table"]))
+            if "filesort" in (f.get("Extra") or "") or "temporary" in (f.get("Extra") or ""):
+                problemas.append(("orden en memoria", f["table"]))
+    elif vendor == "postgresql":
+        cursor.execute("EXPLAIN " + sql, params)
+        lineas = [fila[0] for fila in cursor.fetchall()]
+        for linea in lineas:
+            encontrado = re.search(r"Seq Scan on (\w+)", linea)
+            if encontrado:
+                problemas.append(("scan completo", encontrado.group(1)))
+            elif re.search(r"\bSort\b", linea):
+                problemas.append(("orden en memoria", linea.strip()))
+    else:
+        raise CommandError(f"EXPLAIN no soportado para {vendor}")
+    return lineas, problemas
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta cada endpoint de la API (dentro de una transacción que se revierte), "
+        "captura su SQL, corre EXPLAIN y marca los scans completos. Funciona en SQLite, "
+        "MySQL y PostgreSQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=0,
+                            help="Agrega N productos sintéticos antes de medir (planes más realistas).")
+        parser.add_argument("--ignorar-tablas", default="store_categoria",
+                            help="Tablas pequeñas que no se marcan (coma).")
+        parser.add_argument("--endpoint", action="append", dest="endpoints",
+                            help="Solo escenarios cuyo nombre empiece así (repetible).")
+        parser.add_argument("--planes", action="store_true", help="Muestra el plan de cada consulta.")
+        parser.add_argument("--json", dest="salida_json", help="Guarda el informe en este archivo.")
+        parser.add_argument("--fallar", action="store_true",
+                            help="Termina con error si hay scans completos.")
+
+    def handle(self, *args, **options):
+        ignoradas = {t.strip() for t in options["ignorar_tablas"].split(",") if t.strip()}
+        escenarios = [
+            e for e in ESCENARIOS
+            if not options["endpoints"] or e[0].startswith(tuple(options["endpoints"]))
+        ]
+
+        informe = []
+        ajustes = override_settings(ALLOWED_HOSTS=["*"], CATALOGO_CACHE_HABILITADO=False)
+        with ajustes, datos_temporales():
+            if options["productos"]:
+                self.stdout.write(f"Generando {options['productos']} productos...")
+                generar_catalogo(options["productos"], prefijo="explain")
+            ctx = self.contexto()
+            # El índice de búsqueda se construye fuera de la medición
+            busqueda.reiniciar()
+            busqueda.obtener_indice()
+
+            client = Client()
+            for nombre, metodo, ruta, params in escenarios:
+                if metodo == "python":
+                    informe.append(self.medir_llamada(nombre, ruta, lambda: params(ctx), ignoradas))
+                    continue
+                datos = params(ctx) if callable(params) else _rellenar(params, ctx)
+                informe.append(self.medir(client, nombre, metodo, ruta.format(**ctx), datos, ignoradas))
+            busqueda.reiniciar()
+
+        scans = 0
+        for entrada in informe:
+            scans += self.mostrar(entrada, options["planes"])
+
+        if options["salida_json"]:
+            with open(options["salida_json"], "w", encoding="utf-8") as f:
+                json.dump(informe, f, indent=2, ensure_ascii=False)
+            self.stdout.write(self.style.SUCCESS(f"✔ Informe en {options['salida_json']}"))
+
+        resumen = f"{len(informe)} endpoints, {scans} consultas con scan completo ({connection.vendor})"
+        if scans and options["fallar"]:
+            raise CommandError(resumen)
+        self.stdout.write(self.style.SUCCESS(f"✔ {resumen}") if not scans else self.style.WARNING(resumen))
+
+    def contexto(self):
+        producto = Producto.objects.filter(disponible=True, stock__gt=10).order_by("id").first()
+        if producto is None:
+            raise CommandError("No hay productos con stock; usa --productos N.")
+        pedido = Pedido.objects.create(
+            user_uid="explain-uid", email="explain@example.com", nombre_cliente="Explain",
+            total=producto.precio, metodo_pago="Tarjeta",
+        )
+        pedido.items.create(producto=producto, cantidad=1, precio_unitario=producto.precio)
+        return {
+            "producto": producto.slug,
+            "producto_id": producto.id,
+            "precio": producto.precio,
+            "categoria": Categoria.objects.get(pk=producto.categoria_id).slug,
+            "pedido": pedido.id,
+            "user_uid": pedido.user_uid,
+            "email": pedido.email,
+        }
+
+    def medir(self, client, nombre, metodo, ruta, datos, ignoradas):
+        def peticion():
+            if metodo == "get":
+                response = client.get(ruta, datos)
+            else:
+                response = client.post(ruta, datos, content_type="application/json")
+            if response.streaming:
+                b"".join(response.streaming_content)
+            return response
+
+        return self.medir_llamada(nombre, ruta, peticion, ignoradas)
+
+    def medir_llamada(self, nombre, ruta, funcion, ignoradas):
+        """Corre `funcion`, captura su SQL y lo explica. Si devuelve una respuesta, su status."""
+        capturadas = []
+
+        def capturar(execute, sql, params, many, context):
+            if not many and sql.lstrip().upper().startswith(SENTENCIAS):
+                capturadas.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capturar):
+            resultado = funcion()
+        status = getattr(resultado, "status_code", "ok")
+
+        consultas = []
+        with connection.cursor() as cursor:
+            for sql, params in capturadas:
+                plan, problemas = explicar(cursor, sql, params)
+                consultas.append({
+                    "sql": sql,
+                    "plan": plan,
+                    "problemas": [
+                        {"tipo": tipo, "detalle": detalle}
+                        for tipo, detalle in problemas
+                        if detalle not in ignoradas
+                    ],
+                })
+        return {"endpoint": nombre, "ruta": ruta, "status": status, "consultas": consultas}
+
+    def mostrar(self, entrada, planes):
+        scans = sum(
+            any(p["tipo"] == "scan completo" for p in c["problemas"]) for c in entrada["consultas"]
+        )
+        estilo = self.style.ERROR if scans else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{entrada['endpoint']:<32} {entrada['status']}  {len(entrada['consultas'])} consultas"
+        ))
+        for consulta in entrada["consultas"]:
+            if consulta["problemas"] or planes:
+                self.stdout.write(f"    {consulta['sql'][:140]}")
+            for problema in consulta["problemas"]:
+                self.stdout.write(f"      ⚠ {problema['tipo']}: {problema['detalle']}")
+            if planes:
+                for linea in consulta["plan"]:
+                    self.stdout.write(f"      | {linea}")
+        return scans
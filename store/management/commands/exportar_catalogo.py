@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.catalogo_io import abrir, escribir_filas, filas_exportacion, formato_de
+from store.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Exporta los productos a CSV o JSONL en streaming (mismo formato que importar_catalogo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta de salida ('-' para stdout).")
+        parser.add_argument("--formato", choices=("csv", "jsonl"), help="Por defecto según la extensión.")
+        parser.add_argument("--categoria", action="append", dest="categorias",
+                            help="Solo estas categorías (slug, repetible).")
+        parser.add_argument("--solo-disponibles", action="store_true")
+
+    def handle(self, *args, **options):
+        qs = Producto.objects.all()
+        if options["categorias"]:
+            qs = qs.filter(categoria__slug__in=options["categorias"])
+        if options["solo_disponibles"]:
+            qs = qs.filter(disponible=True)
+
+        inicio = time.perf_counter()
+        with abrir(options["archivo"], "w") as f:
+            total = escribir_filas(f, formato_de(options["archivo"], options["formato"]), filas_exportacion(qs))
+
+        if options["archivo"] != "-":
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {total} productos exportados a {options['archivo']} en {duracion:.1f} s"
+            ))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import Producto
+from store.stock_fragmentado import desfragmentar, fragmentar
+
+
+class Command(BaseCommand):
+    help = (
+        "Reparte el stock de los productos indicados en N fragmentos para que "
+        "las compras concurrentes no se encolen en una sola fila (ventas flash). "
+        "Con --quitar vuelven a una sola fila."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("slugs", nargs="+")
+        parser.add_argument("--fragmentos", type=int, help="Por defecto STOCK_FRAGMENTOS.")
+        parser.add_argument("--quitar", action="store_true")
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.in_bulk(options["slugs"], field_name="slug")
+        faltan = set(options["slugs"]) - set(productos)
+        if faltan:
+            raise CommandError(f"No existen: {', '.join(sorted(faltan))}")
+
+        for slug, producto in productos.items():
+            if options["quitar"]:
+                producto = desfragmentar(producto)
+                self.stdout.write(f"  {slug}: una sola fila, stock {producto.stock}")
+            else:
+                producto = fragmentar(producto, options["fragmentos"])
+                self.stdout.write(f"  {slug}: {producto.fragmentos.count()} fragmentos, stock {producto.stock}")
+        self.stdout.write(self.style.SUCCESS(f"✔ {len(productos)} productos actualizados"))
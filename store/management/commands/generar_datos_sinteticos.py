@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from store.benchmarks import generar_catalogo, generar_pedidos
+from store.cache import invalidar_catalogo
+from store.models import Categoria, Pedido, Producto
+from store.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga un catálogo y un histórico de pedidos sintéticos y deterministas "
+        "(misma semilla y --hasta → mismos datos) para los benchmarks de la API. "
+        "Es incremental: si ya hay datos con el prefijo, solo crea los que faltan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--productos", type=int, default=100_000)
+        parser.add_argument("--categorias", type=int, default=20)
+        parser.add_argument("--pedidos", type=int, default=1_000_000)
+        parser.add_argument("--clientes", type=int, default=50_000)
+        parser.add_argument("--dias", type=int, default=365,
+                            help="Los pedidos se reparten en los N días anteriores a --hasta.")
+        parser.add_argument("--hasta", help="Último día con pedidos (YYYY-MM-DD, por defecto hoy).")
+        parser.add_argument("--semilla", type=int, default=42)
+        parser.add_argument("--lote", type=int, default=5000)
+        parser.add_argument("--prefijo", default="sint")
+        parser.add_argument("--borrar", action="store_true",
+                            help="Borra los datos sintéticos del prefijo y termina.")
+        parser.add_argument("--sin-ventas", action="store_true",
+                            help="No reconstruye los resúmenes de ventas al terminar.")
+
+    def handle(self, *args, **options):
+        prefijo = options["prefijo"]
+        if options["borrar"]:
+            self.borrar(prefijo)
+            return
+
+        hasta = None
+        if options["hasta"]:
+            hasta = parse_date(options["hasta"])
+            if hasta is None:
+                raise CommandError(f"--hasta: fecha inválida '{options['hasta']}'")
+
+        inicio = time.perf_counter()
+        existentes = Producto.objects.filter(slug__startswith=f"{prefijo}-producto-").count()
+        if existentes < options["productos"]:
+            generar_catalogo(
+                options["productos"], categorias=options["categorias"], semilla=options["semilla"],
+                lote=options["lote"], prefijo=prefijo, desde=existentes,
+            )
+            invalidar_catalogo()
+        self.stdout.write(
+            f"  productos  {options['productos'] - existentes:>9} nuevos "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        )
+
+        productos = list(
+            Producto.objects.filter(slug__startswith=f"{prefijo}-producto-")
+            .order_by("id").values_list("id", "precio")
+        )
+        existentes = Pedido.objects.filter(email__startswith=f"{prefijo}-cliente-").count()
+        parcial = time.perf_counter()
+        if existentes < options["pedidos"]:
+            desde, hasta = generar_pedidos(
+                options["pedidos"], productos, semilla=options["semilla"], lote=options["lote"],
+                prefijo=prefijo, desde=existentes, clientes=options["clientes"],
+                dias=options["dias"], hasta=hasta,
+            )
+            self.stdout.write(
+                f"  pedidos    {options['pedidos'] - existentes:>9} nuevos "
+                f"({time.perf_counter() - parcial:.1f} s)"
+            )
+            if not options["sin_ventas"]:
+                parcial = time.perf_counter()
+                reconstruir_ventas(desde, hasta, lote=options["lote"])
+                self.stdout.write(f"  ventas     {desde} → {hasta} ({time.perf_counter() - parcial:.1f} s)")
+        else:
+            self.stdout.write(f"  pedidos    {0:>9} nuevos")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ Datos '{prefijo}' listos en {time.perf_counter() - inicio:.1f} s "
+            f"(el índice de búsqueda se regenera con construir_indice_busqueda)"
+        ))
+
+    def borrar(self, prefijo):
+        with transaction.atomic():
+            # Primero los pedidos: PedidoItem protege a sus productos
+            pedidos, _ = Pedido.objects.filter(email__startswith=f"{prefijo}-cliente-").delete()
+            productos, _ = Producto.objects.filter(slug__startswith=f"{prefijo}-producto-").delete()
+            Categoria.objects.filter(slug__startswith=f"{prefijo}-cat-").delete()
+            reconstruir_ventas()
+        invalidar_catalogo()
+        self.stdout.write(self.style.SUCCESS(f"✔ Borrados datos '{prefijo}' ({pedidos + productos} filas)"))
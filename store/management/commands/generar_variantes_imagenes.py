@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.imagenes import procesar_producto, variantes_vigentes
+from store.models import Producto
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera las miniaturas y versiones WebP de las imágenes de producto "
+        "que aún no las tienen (o de todas con --forzar)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Hilos en paralelo.")
+        parser.add_argument("--forzar", action="store_true", help="Regenera aunque ya existan.")
+        parser.add_argument("--slug", action="append", dest="slugs", help="Solo estos productos (repetible).")
+
+    def handle(self, *args, **options):
+        qs = Producto.objects.exclude(imagen="").exclude(imagen__isnull=True)
+        if options["slugs"]:
+            qs = qs.filter(slug__in=options["slugs"])
+
+        pendientes = [
+            (fila["id"], fila["slug"])
+            for fila in qs.values("id", "slug", "imagen", "imagen_variantes").iterator()
+            if options["forzar"] or not variantes_vigentes(fila["imagen_variantes"], fila["imagen"])
+        ]
+        if not pendientes:
+            self.stdout.write("No hay imágenes pendientes.")
+            return
+
+        self.stdout.write(f"Procesando {len(pendientes)} imágenes con {options['workers']} hilos...")
+        inicio = time.perf_counter()
+        generadas = errores = 0
+
+        def tarea(producto_id):
+            try:
+                return procesar_producto(producto_id, forzar=options["forzar"])
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            futuros = {pool.submit(tarea, producto_id): slug for producto_id, slug in pendientes}
+            for futuro in as_completed(futuros):
+                slug = futuros[futuro]
+                try:
+                    if futuro.result():
+                        generadas += 1
+                except Exception as exc:
+                    errores += 1
+                    self.stderr.write(self.style.ERROR(f"✖ {slug}: {exc}"))
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {generadas} imágenes procesadas en {duracion:.1f} s ({errores} errores)"
+        ))
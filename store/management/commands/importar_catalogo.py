@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalogo_io import ImportadorCatalogo, abrir, formato_de, leer_filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa productos desde CSV o JSONL (columnas de store/catalogo_io.COLUMNAS). "
+        "Los productos se identifican por slug: se actualizan si existen y se crean si no. "
+        "Se lee en streaming y se guarda por lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta del archivo ('-' para stdin).")
+        parser.add_argument("--formato", choices=("csv", "jsonl"), help="Por defecto según la extensión.")
+        parser.add_argument("--lote", type=int, default=2000, help="Productos por lote.")
+        parser.add_argument("--sin-crear-categorias", action="store_true",
+                            help="Rechaza filas con categorías que no existen.")
+        parser.add_argument("--estricto", action="store_true", help="Falla si alguna fila es inválida.")
+
+    def handle(self, *args, **options):
+        if options["lote"] < 1:
+            raise CommandError("--lote debe ser mayor que 0")
+        formato = formato_de(options["archivo"], options["formato"])
+
+        def progreso(numero, filas, segundos):
+            self.stdout.write(
+                f"  lote {numero:>5}: {filas} productos en {segundos:.2f} s "
+                f"({filas / segundos if segundos else 0:,.0f} productos/s)"
+            )
+
+        importador = ImportadorCatalogo(
+            lote=options["lote"],
+            crear_categorias=not options["sin_crear_categorias"],
+            al_terminar_lote=progreso,
+        )
+
+        inicio = time.perf_counter()
+        try:
+            with abrir(options["archivo"], "r") as f:
+                total = importador.importar(leer_filas(f, formato))
+        except OSError as exc:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {exc}")
+        duracion = time.perf_counter() - inicio
+
+        for linea, mensaje in importador.errores[:20]:
+            self.stderr.write(self.style.ERROR(f"  línea {linea}: {mensaje}"))
+        if len(importador.errores) > 20:
+            self.stderr.write(self.style.ERROR(f"  ... y {len(importador.errores) - 20} errores más"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {total} productos importados en {duracion:.1f} s "
+            f"({total / duracion if duracion else 0:,.0f} productos/s), "
+            f"{len(importador.errores)} filas inválidas"
+        ))
+        if options["estricto"] and importador.errores:
+            raise CommandError(f"{len(importador.errores)} filas inválidas")
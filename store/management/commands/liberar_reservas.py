@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.reservas import liberar_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Libera en bloque las reservas de stock vencidas (devuelve sus unidades "
+        "al stock vendible). Con --cada N queda corriendo y barre cada N segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000, help="Reservas por transacción.")
+        parser.add_argument("--cada", type=float, default=0,
+                            help="Segundos entre barridos (0 = una sola vez).")
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.perf_counter()
+            liberadas = liberar_vencidas(lote=options["lote"])
+            if liberadas or not options["cada"]:
+                self.stdout.write(
+                    f"✔ {liberadas} reservas vencidas liberadas en "
+                    f"{(time.perf_counter() - inicio) * 1000:.0f} ms"
+                )
+            if not options["cada"]:
+                return
+            try:
+                time.sleep(options["cada"])
+            except KeyboardInterrupt:
+                return
+            # Como entre peticiones: no retener una conexión caída o vieja
+            close_old_connections()
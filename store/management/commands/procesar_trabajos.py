@@ -0,0 +1,189 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from store import trabajos
+
+# Cada cuánto se devuelven a la cola los trabajos de trabajadores caídos
+RECUPERAR_CADA = 60
+
+logger = logging.getLogger("store.trabajos")
+
+
+class Command(BaseCommand):
+    help = (
+        "Ejecuta los trabajos de la cola (store/trabajos.py) en un pool de "
+        "hilos y, con --procesos N, en N procesos. Queda corriendo hasta "
+        "SIGTERM/Ctrl+C (termina los trabajos en curso); con --una-vez "
+        "procesa lo pendiente y sale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, help="Hilos por proceso (por defecto TRABAJOS_HILOS).")
+        parser.add_argument("--procesos", type=int, default=1, help="Procesos trabajadores (fork).")
+        parser.add_argument("--tipos", help="Solo estos tipos de trabajo, separados por coma.")
+        parser.add_argument("--lote", type=int, help="Trabajos reclamados por consulta (por defecto = hilos).")
+        parser.add_argument("--espera", type=float,
+                            help="Segundos entre consultas con la cola vacía (por defecto TRABAJOS_ESPERA).")
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo disponible y termina.")
+        parser.add_argument("--purgar", type=int, metavar="DIAS",
+                            help="Antes de empezar, borra los trabajos hechos hace más de DIAS días.")
+
+    def handle(self, *args, **options):
+        hilos = options["hilos"] or settings.TRABAJOS_HILOS
+        if hilos < 1 or options["procesos"] < 1:
+            raise CommandError("--hilos y --procesos deben ser al menos 1")
+        tipos = [t.strip() for t in (options["tipos"] or "").split(",") if t.strip()]
+        desconocidos = set(tipos) - set(trabajos.TAREAS)
+        if desconocidos:
+            raise CommandError(f"Tipos de trabajo desconocidos: {', '.join(sorted(desconocidos))}")
+        config = {
+            "hilos": hilos,
+            "tipos": tipos or None,
+            "lote": options["lote"] or hilos,
+            "espera": options["espera"] if options["espera"] is not None else settings.TRABAJOS_ESPERA,
+            "una_vez": options["una_vez"],
+        }
+
+        if options["purgar"] is not None:
+            self.stdout.write(f"🔹 {trabajos.purgar(options['purgar'])} trabajos viejos borrados")
+
+        if options["procesos"] == 1:
+            hechos, fallidos = self.trabajar(**config)
+            self.stdout.write(self.style.SUCCESS(
+                f"✔ {hechos + fallidos} trabajos procesados ({fallidos} con error)"
+            ))
+        else:
+            self.en_procesos(options["procesos"], config)
+
+    # ==============================
+    # Procesos
+    # ==============================
+
+    def en_procesos(self, procesos, config):
+        if not hasattr(os, "fork"):
+            raise CommandError("--procesos necesita fork (Linux/macOS); use solo --hilos")
+        # Cada hijo abre sus propias conexiones
+        connections.close_all()
+        hijos = []
+        for _ in range(procesos):
+            pid = os.fork()
+            if pid == 0:
+                codigo = 0
+                try:
+                    self.trabajar(**config)
+                except BaseException:
+                    codigo = 1
+                finally:
+                    os._exit(codigo)
+            hijos.append(pid)
+
+        def reenviar(signum, frame):
+            for pid in hijos:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        signal.signal(signal.SIGTERM, reenviar)
+        signal.signal(signal.SIGINT, reenviar)
+        fallaron = 0
+        for pid in hijos:
+            _, estado = os.waitpid(pid, 0)
+            fallaron += os.waitstatus_to_exitcode(estado) != 0
+        if fallaron:
+            raise CommandError(f"{fallaron} de {procesos} procesos terminaron con error")
+        self.stdout.write(self.style.SUCCESS(f"✔ {procesos} procesos terminados"))
+
+    # ==============================
+    # Un proceso: pool de hilos
+    # ==============================
+
+    def trabajar(self, hilos, tipos, lote, espera, una_vez):
+        """Bucle de un proceso. Devuelve (hechos, con error)."""
+        nombre = f"{socket.gethostname()}:{os.getpid()}"
+        parar = threading.Event()
+        anteriores = {sig: signal.signal(sig, lambda *_: parar.set()) for sig in (signal.SIGTERM, signal.SIGINT)}
+
+        # Con un solo hilo se ejecuta aquí mismo, sin pool
+        pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="trabajo") if hilos > 1 else None
+        en_vuelo = set()
+        resultados = [0, 0]
+        proxima_recuperacion = 0.0
+
+        def anotar(terminados):
+            for futuro in terminados:
+                try:
+                    ok = futuro.result()
+                except Exception:
+                    # Igual que en ejecutar_seguro(): se cuenta y el bucle sigue
+                    logger.exception("Error no controlado en un trabajo")
+                    ok = False
+                resultados[0 if ok else 1] += 1
+
+        try:
+            while not parar.is_set():
+                if time.monotonic() >= proxima_recuperacion:
+                    trabajos.recuperar_abandonados()
+                    proxima_recuperacion = time.monotonic() + RECUPERAR_CADA
+
+                libres = hilos - len(en_vuelo)
+                tomados = trabajos.reclamar(nombre, min(libres, lote), tipos) if libres else []
+                for trabajo in tomados:
+                    if pool:
+                        en_vuelo.add(pool.submit(self.ejecutar_en_hilo, trabajo))
+                    else:
+                        resultados[0 if self.ejecutar_seguro(trabajo) else 1] += 1
+
+                if en_vuelo:
+                    # Pool lleno o cola vacía: esperar a que se libere un hilo
+                    lleno = len(en_vuelo) >= hilos
+                    terminados, en_vuelo = wait(
+                        en_vuelo, timeout=espera if lleno or not tomados else 0,
+                        return_when=FIRST_COMPLETED,
+                    )
+                    anotar(terminados)
+                elif not tomados:
+                    if una_vez:
+                        break
+                    parar.wait(espera)
+                    # Como entre peticiones: no retener una conexión caída o vieja
+                    close_old_connections()
+        finally:
+            if pool:
+                # Los trabajos ya tomados terminan antes de salir
+                pool.shutdown(wait=True)
+                anotar(en_vuelo)
+            for sig, manejador in anteriores.items():
+                signal.signal(sig, manejador)
+        return tuple(resultados)
+
+    @staticmethod
+    def ejecutar_seguro(trabajo):
+        """
+        ejecutar() ya guarda los errores de la tarea; esto es lo que se le
+        escapa (p. ej. la base caída al guardar el resultado). Se cuenta
+        como error y el bucle sigue; el trabajo queda en curso hasta que
+        lo devuelva recuperar_abandonados().
+        """
+        try:
+            return trabajos.ejecutar(trabajo)
+        except Exception:
+            logger.exception("Error no controlado en el trabajo %s (%s)", trabajo.pk, trabajo.tipo)
+            return False
+
+    @staticmethod
+    def ejecutar_en_hilo(trabajo):
+        close_old_connections()
+        try:
+            return trabajos.ejecutar(trabajo)
+        finally:
+            close_old_connections()
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from store.stock_fragmentado import rebalancear_todos
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebalancea los fragmentos de stock que se están vaciando y refresca el "
+        "stock total que muestra el catálogo. Con --cada N queda corriendo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cada", type=float, default=0,
+                            help="Segundos entre pasadas (0 = una sola vez).")
+
+    def handle(self, *args, **options):
+        while True:
+            inicio = time.perf_counter()
+            rebalanceados = rebalancear_todos()
+            if rebalanceados or not options["cada"]:
+                self.stdout.write(
+                    f"✔ {rebalanceados} productos rebalanceados en "
+                    f"{(time.perf_counter() - inicio) * 1000:.0f} ms"
+                )
+            if not options["cada"]:
+                return
+            try:
+                time.sleep(options["cada"])
+            except KeyboardInterrupt:
+                return
+            close_old_connections()
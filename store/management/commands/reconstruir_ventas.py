@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from store.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes diarios de ventas (VentaDiaria*) desde los pedidos. "
+        "Sin fechas reconstruye todo el histórico."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", help="Primer día inclusive (YYYY-MM-DD).")
+        parser.add_argument("--hasta", help="Último día inclusive (YYYY-MM-DD).")
+        parser.add_argument("--lote", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for nombre in ("desde", "hasta"):
+            if options[nombre]:
+                fechas[nombre] = parse_date(options[nombre])
+                if fechas[nombre] is None:
+                    raise CommandError(f"--{nombre}: fecha inválida '{options[nombre]}'")
+
+        inicio = time.perf_counter()
+        creadas = reconstruir_ventas(lote=options["lote"], **fechas)
+        for modelo, total in creadas.items():
+            self.stdout.write(f"  {modelo:<22} {total} filas")
+        self.stdout.write(self.style.SUCCESS(f"✔ Resúmenes reconstruidos en {time.perf_counter() - inicio:.1f} s"))
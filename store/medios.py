@@ -0,0 +1,80 @@
+# store/medios.py
+#
+# URLs de las imágenes de producto.
+#
+# Con MEDIA_BASE_URL (p. ej. un CDN: "https://cdn.ejemplo.com/media/")
+# la URL es base + ruta del archivo, sin mirar la petición. Sin él se
+# mantiene lo de siempre: URL del storage hecha absoluta con el host que
+# atendió la petición, pero calculando esquema+host una sola vez.
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import filepath_to_uri
+
+
+@lru_cache(maxsize=None)
+def base_media():
+    """MEDIA_BASE_URL terminada en '/', o None. Se resuelve una vez por proceso."""
+    base = getattr(settings, 'MEDIA_BASE_URL', None)
+    if not base:
+        return None
+    return base if base.endswith('/') else base + '/'
+
+
+@receiver(setting_changed)
+def _limpiar_base(*, setting, **kwargs):
+    if setting in ('MEDIA_BASE_URL', 'MEDIA_URL'):
+        base_media.cache_clear()
+
+
+def url_imagenes(request=None):
+    """
+    Devuelve una función nombre_de_archivo → URL de la imagen. Pensada
+    para crearse una vez por petición y usarse en todas las filas.
+    """
+    base = base_media()
+    if base is not None:
+        return lambda nombre: base + filepath_to_uri(nombre)
+
+    storage_url = default_storage.url
+    if request is None:
+        return storage_url
+
+    raiz = request.build_absolute_uri('/')[:-1]
+
+    # Storage local con MEDIA_URL absoluta en el sitio ('/media/'): es la
+    # misma URL que daría storage.url(), sin urljoin por fila
+    media_url = getattr(default_storage, 'base_url', None)
+    if (isinstance(default_storage, FileSystemStorage) and media_url
+            and media_url.startswith('/') and not media_url.startswith('//')
+            and media_url.endswith('/')):
+        prefijo = raiz + media_url
+        return lambda nombre: prefijo + filepath_to_uri(nombre).lstrip('/')
+
+    def url(nombre):
+        relativa = storage_url(nombre)
+        if relativa.startswith(('http://', 'https://')):
+            return relativa
+        if relativa.startswith('/') and not relativa.startswith('//'):
+            return raiz + relativa
+        return request.build_absolute_uri(relativa)
+
+    return url
+
+
+def urls_variantes(variantes, imagen, url):
+    """
+    Producto.imagen_variantes → {"webp": {"160": URL, ...}, "jpeg": {...}}
+    listo para armar un srcset. Vacío si no corresponden a `imagen`.
+    """
+    if not imagen or not variantes or variantes.get('original') != imagen:
+        return {}
+    return {
+        formato: {ancho: url(ruta) for ancho, ruta in rutas.items()}
+        for formato, rutas in variantes.items()
+        if formato != 'original'
+    }
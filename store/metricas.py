@@ -0,0 +1,369 @@
+# store/metricas.py
+#
+# Métricas por ruta de la API y endpoint /metrics en formato texto de
+# Prometheus.
+#
+# MetricasMiddleware mide cada petición y la acumula bajo el nombre de su
+# ruta + acción de DRF ('producto-list', 'producto-disminuir-stock',
+# 'pedido-create'...):
+#   - histograma de latencia y de consultas SQL por petición
+#   - tiempo total en SQL y bytes de respuesta
+#   - peticiones por código de estado
+#
+# El SQL se cuenta con un execute_wrapper que se instala una vez por
+# conexión (señal connection_created) y apunta a la medición de la
+# petición en curso a través de una ContextVar, así que también cuenta
+# las consultas que las vistas async hacen en hilos de sync_to_async.
+#
+# Con METRICAS_LENTAS_MS se registra en el logger 'store.lentas' cada
+# petición más lenta que el umbral, con las sentencias SQL que ejecutó.
+#
+# Las métricas son del proceso: con varios workers, Prometheus ve las del
+# worker que atiende cada scrape (usar una etiqueta de instancia por
+# worker o un solo worker por contenedor).
+#
+# /metrics solo responde con METRICAS_TOKEN (Authorization: Bearer) o con
+# METRICAS_SIN_TOKEN=1 si el puerto no es accesible desde fuera; si no,
+# da 404. Lo mismo vale para /api/v1/catalogo/cache/ y /api/v1/sistema/db/
+# (permiso AccesoMetricas).
+#
+# Costo: ~10 µs por petición (dos perf_counter, un lock y unos cuantos
+# sumandos) y dos perf_counter más por consulta SQL.
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import BasePermission
+
+from backend.db.pool import metricas_pools
+from .cache import estadisticas
+
+logger = logging.getLogger('store.lentas')
+
+# Límites de los histogramas (Prometheus: "le")
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+MAX_SQL_REGISTRADO = 100   # sentencias guardadas por petición para el log de lentas
+RUTA_SIN_NOMBRE = 'sin-ruta'
+RUTAS_EXCLUIDAS = {'metricas'}
+
+
+def metricas_habilitadas():
+    return getattr(settings, 'METRICAS_HABILITADAS', True)
+
+
+def umbral_lentas():
+    """Segundos a partir de los cuales una petición va al log (None: apagado)."""
+    umbral = getattr(settings, 'METRICAS_LENTAS_MS', None)
+    return None if umbral is None else umbral / 1000
+
+
+# ==============================
+# Medición de una petición
+# ==============================
+
+class Medicion:
+    __slots__ = ('consultas', 'sql_segundos', 'sentencias')
+
+    def __init__(self, registrar_sql=False):
+        self.consultas = 0
+        self.sql_segundos = 0.0
+        self.sentencias = [] if registrar_sql else None
+
+
+_actual = ContextVar('medicion_peticion', default=None)
+
+
+def contar_sql(execute, sql, params, many, context):
+    medicion = _actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.sql_segundos += duracion
+        if medicion.sentencias is not None and len(medicion.sentencias) < MAX_SQL_REGISTRADO:
+            medicion.sentencias.append((sql, duracion))
+
+
+def instalar_contador_sql(conexion):
+    if contar_sql not in conexion.execute_wrappers:
+        conexion.execute_wrappers.insert(0, contar_sql)
+
+
+# ==============================
+# Registro
+# ==============================
+
+class _Serie:
+    __slots__ = ('latencias', 'latencia_suma', 'consultas', 'consultas_suma',
+                 'sql_segundos', 'bytes', 'estados')
+
+    def __init__(self):
+        self.latencias = [0] * (len(BUCKETS_SEGUNDOS) + 1)
+        self.latencia_suma = 0.0
+        self.consultas = [0] * (len(BUCKETS_CONSULTAS) + 1)
+        self.consultas_suma = 0
+        self.sql_segundos = 0.0
+        self.bytes = 0
+        self.estados = {}
+
+
+class RegistroMetricas:
+    """Series por (ruta, método). Thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def registrar(self, ruta, metodo, estado, segundos, medicion, bytes_respuesta):
+        with self._lock:
+            serie = self._series.get((ruta, metodo))
+            if serie is None:
+                serie = self._series[(ruta, metodo)] = _Serie()
+            serie.latencias[bisect_left(BUCKETS_SEGUNDOS, segundos)] += 1
+            serie.latencia_suma += segundos
+            serie.consultas[bisect_left(BUCKETS_CONSULTAS, medicion.consultas)] += 1
+            serie.consultas_suma += medicion.consultas
+            serie.sql_segundos += medicion.sql_segundos
+            serie.bytes += bytes_respuesta
+            serie.estados[estado] = serie.estados.get(estado, 0) + 1
+
+    def sumar_bytes(self, ruta, metodo, cantidad):
+        with self._lock:
+            serie = self._series.get((ruta, metodo))
+            if serie is not None:
+                serie.bytes += cantidad
+
+    def copia(self):
+        with self._lock:
+            return {
+                clave: (list(s.latencias), s.latencia_suma, list(s.consultas), s.consultas_suma,
+                        s.sql_segundos, s.bytes, dict(s.estados))
+                for clave, s in self._series.items()
+            }
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+
+registro = RegistroMetricas()
+
+
+# ==============================
+# Middleware
+# ==============================
+
+def nombre_ruta(request):
+    """'basename-accion' para los ViewSets; url_name para el resto."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return RUTA_SIN_NOMBRE
+    acciones = getattr(match.func, 'actions', None)
+    basename = (getattr(match.func, 'initkwargs', None) or {}).get('basename')
+    if acciones and basename:
+        metodo = request.method.lower()
+        accion = acciones.get(metodo) or (acciones.get('get') if metodo == 'head' else None)
+        if accion:
+            return f"{basename}-{accion.replace('_', '-')}"
+    return match.url_name or RUTA_SIN_NOMBRE
+
+
+def _contar_bytes(contenido, ruta, metodo):
+    total = 0
+    try:
+        for bloque in contenido:
+            total += len(bloque)
+            yield bloque
+    finally:
+        registro.sumar_bytes(ruta, metodo, total)
+
+
+def _empezar():
+    medicion = Medicion(registrar_sql=umbral_lentas() is not None)
+    return medicion, _actual.set(medicion), time.perf_counter()
+
+
+def _terminar(request, response, medicion, token, inicio):
+    segundos = time.perf_counter() - inicio
+    _actual.reset(token)
+    ruta = nombre_ruta(request)
+    if ruta in RUTAS_EXCLUIDAS:
+        return response
+
+    if isinstance(response, FileResponse):
+        # Envolver el archivo impediría que el servidor use sendfile
+        # (wsgi.file_wrapper): se toma el tamaño que ya trae la cabecera
+        bytes_respuesta = int(response.get('Content-Length') or 0)
+    elif response.streaming:
+        # Los bytes se suman cuando el servidor termina de enviar
+        bytes_respuesta = 0
+        if not response.is_async:
+            response.streaming_content = _contar_bytes(response.streaming_content, ruta, request.method)
+    else:
+        bytes_respuesta = len(response.content)
+    registro.registrar(ruta, request.method, response.status_code, segundos, medicion, bytes_respuesta)
+
+    umbral = umbral_lentas()
+    if umbral is not None and segundos >= umbral:
+        logger.warning(
+            "%s %s %s (%s) %.1f ms, %d consultas SQL en %.1f ms%s",
+            request.method, request.get_full_path(), response.status_code, ruta,
+            segundos * 1000, medicion.consultas, medicion.sql_segundos * 1000,
+            ''.join(f"\n  [{d * 1000:.1f} ms] {sql}" for sql, d in medicion.sentencias or ()),
+        )
+    return response
+
+
+@sync_and_async_middleware
+def MetricasMiddleware(get_response):
+    """Va primero en MIDDLEWARE para medir la petición completa."""
+    if not metricas_habilitadas():
+        return get_response
+    # Las conexiones nuevas lo reciben con la señal connection_created
+    for conexion in connections.all(initialized_only=True):
+        instalar_contador_sql(conexion)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            medicion, token, inicio = _empezar()
+            response = await get_response(request)
+            return _terminar(request, response, medicion, token, inicio)
+    else:
+        def middleware(request):
+            medicion, token, inicio = _empezar()
+            response = get_response(request)
+            return _terminar(request, response, medicion, token, inicio)
+    return middleware
+
+
+# ==============================
+# Exposición (formato texto de Prometheus 0.0.4)
+# ==============================
+
+def _etiquetas(**valores):
+    partes = []
+    for nombre, valor in valores.items():
+        texto = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{nombre}="{texto}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return repr(round(valor, 6))
+    return str(valor)
+
+
+def _histograma(lineas, nombre, ayuda, limites, series):
+    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} histogram"]
+    for etiquetas, cuentas, suma in series:
+        acumulado = 0
+        for limite, cuenta in zip(limites + ('+Inf',), cuentas):
+            acumulado += cuenta
+            lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+        lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {_numero(suma)}")
+        lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {acumulado}")
+
+
+def _simple(lineas, nombre, tipo, ayuda, valores):
+    lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+    for etiquetas, valor in valores:
+        if valor is not None:
+            lineas.append(f"{nombre}{_etiquetas(**etiquetas)} {_numero(valor)}")
+
+
+def exponer():
+    series = sorted(registro.copia().items())
+    lineas = []
+
+    def por_ruta(indice):
+        return [({'ruta': r, 'metodo': m}, datos[indice]) for (r, m), datos in series]
+
+    _simple(lineas, 'ludoteka_peticiones_total', 'counter',
+            'Peticiones atendidas por ruta, método y código de estado.',
+            [({'ruta': r, 'metodo': m, 'estado': e}, n)
+             for (r, m), datos in series for e, n in sorted(datos[6].items())])
+    _histograma(lineas, 'ludoteka_peticion_segundos', 'Latencia de las peticiones por ruta.',
+                BUCKETS_SEGUNDOS,
+                [({'ruta': r, 'metodo': m}, datos[0], datos[1]) for (r, m), datos in series])
+    _histograma(lineas, 'ludoteka_peticion_consultas_sql', 'Consultas SQL por petición.',
+                BUCKETS_CONSULTAS,
+                [({'ruta': r, 'metodo': m}, datos[2], datos[3]) for (r, m), datos in series])
+    _simple(lineas, 'ludoteka_sql_segundos_total', 'counter',
+            'Tiempo acumulado en SQL por ruta.', por_ruta(4))
+    _simple(lineas, 'ludoteka_respuesta_bytes_total', 'counter',
+            'Bytes de respuesta enviados por ruta.', por_ruta(5))
+
+    cache = estadisticas()
+    _simple(lineas, 'ludoteka_cache_catalogo_total', 'counter',
+            'Aciertos y fallos de la cache del catálogo.',
+            [({'resultado': 'hit'}, cache['hits']), ({'resultado': 'miss'}, cache['misses'])])
+
+    pools = sorted(metricas_pools().items())
+    for clave, nombre, tipo, ayuda in (
+        ('en_uso', 'ludoteka_db_pool_en_uso', 'gauge', 'Conexiones prestadas del pool.'),
+        ('libres', 'ludoteka_db_pool_libres', 'gauge', 'Conexiones ociosas en el pool.'),
+        ('esperas', 'ludoteka_db_pool_esperas_total', 'counter',
+         'Veces que hubo que esperar una conexión libre.'),
+        ('agotado', 'ludoteka_db_pool_agotado_total', 'counter', 'Esperas que terminaron en PoolAgotado.'),
+        ('conexiones_creadas', 'ludoteka_db_pool_conexiones_creadas_total', 'counter',
+         'Conexiones abiertas por el pool.'),
+        ('conexion_total_s', 'ludoteka_db_pool_conexion_segundos_total', 'counter',
+         'Tiempo total abriendo conexiones (latencia de conexión).'),
+    ):
+        _simple(lineas, nombre, tipo, ayuda, [({'alias': alias}, m[clave]) for alias, m in pools])
+
+    return '\n'.join(lineas) + '\n'
+
+
+def rechazo_metricas(request):
+    """
+    None si la petición puede ver las métricas; si no, el código con que
+    se rechaza: 404 sin METRICAS_TOKEN (salvo METRICAS_SIN_TOKEN) o 403
+    con un token incorrecto.
+    """
+    token = getattr(settings, 'METRICAS_TOKEN', '')
+    if not token:
+        return None if getattr(settings, 'METRICAS_SIN_TOKEN', False) else 404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return 403
+    return None
+
+
+class AccesoMetricas(BasePermission):
+    """La misma regla que /metrics, para las vistas de DRF con datos internos."""
+
+    def has_permission(self, request, view):
+        rechazo = rechazo_metricas(request)
+        if rechazo == 404:
+            raise NotFound()
+        return rechazo is None
+
+
+def vista_metricas(request):
+    """
+    GET /metrics. Con METRICAS_TOKEN se exige 'Authorization: Bearer
+    <token>'; sin token solo responde si METRICAS_SIN_TOKEN lo permite.
+    """
+    rechazo = rechazo_metricas(request)
+    if rechazo == 404:
+        return HttpResponseNotFound()
+    if rechazo == 403:
+        return HttpResponseForbidden()
+    return HttpResponse(exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_pedido_alter_producto_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['user_uid', 'creado_en'], name='pedido_uid_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['email', 'creado_en'], name='pedido_email_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['creado_en', 'id'], name='pedido_creado_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_producto_actualizado'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'categoria', 'precio'], name='producto_disp_cat_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'precio'], name='producto_disp_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'es_nuevo'], name='producto_disp_nuevo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'tiene_descuento'], name='producto_disp_desc_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_producto_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name': 'Venta diaria',
+                'verbose_name_plural': 'Ventas diarias',
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='store.categoria')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por categoría',
+                'verbose_name_plural': 'Ventas diarias por categoría',
+                'indexes': [models.Index(fields=['categoria', 'fecha'], name='venta_categoria_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'categoria'), name='venta_categoria_fecha_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='store.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta diaria por producto',
+                'verbose_name_plural': 'Ventas diarias por producto',
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='venta_producto_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='venta_producto_fecha_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['disponible', 'id'], name='producto_disp_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['id'], name='producto_visible_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('disponible', True)), fields=['precio', 'id'], name='producto_visible_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('disponible', True), ('es_nuevo', True)), fields=['id'], name='producto_visible_nuevo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('disponible', True), ('tiene_descuento', True)), fields=['id'], name='producto_visible_desc_idx'),
+        ),
+    ]
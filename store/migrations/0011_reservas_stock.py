@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_indices_auditoria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('carrito', models.CharField(max_length=64)),
+                ('cantidad', models.PositiveIntegerField()),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='store.producto')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock',
+                'verbose_name_plural': 'Reservas de stock',
+                'indexes': [models.Index(fields=['carrito', 'producto'], name='reserva_carrito_idx'), models.Index(fields=['expira_en'], name='reserva_expira_idx')],
+            },
+        ),
+    ]
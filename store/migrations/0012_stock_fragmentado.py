@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0011_reservas_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockFragmento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('stock', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Fragmento de stock',
+                'verbose_name_plural': 'Fragmentos de stock',
+            },
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='stock_fragmentado',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['stock_fragmentado'], name='producto_fragmentado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('stock_fragmentado', True)), fields=['id'], name='producto_fragmentado_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockfragmento',
+            name='producto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='store.producto'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockfragmento',
+            constraint=models.UniqueConstraint(fields=('producto', 'indice'), name='fragmento_producto_indice_uniq'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_stock_fragmentado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='factura',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='Trabajo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('hecho', 'Hecho'), ('fallido', 'Fallido')], default='pendiente', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('disponible_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bloqueado_por', models.CharField(blank=True, max_length=100)),
+                ('bloqueado_en', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Trabajo',
+                'verbose_name_plural': 'Trabajos',
+                'indexes': [models.Index(fields=['estado', 'disponible_en'], name='trabajo_estado_disp_idx'), models.Index(fields=['estado', 'bloqueado_en'], name='trabajo_estado_bloq_idx'), models.Index(fields=['bloqueado_por'], name='trabajo_bloqueado_por_idx')],
+            },
+        ),
+    ]
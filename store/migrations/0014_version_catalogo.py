@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+import time
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    VersionCatalogo = apps.get_model('store', 'VersionCatalogo')
+    VersionCatalogo.objects.get_or_create(pk=1, defaults={'version': time.time_ns()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0013_cola_trabajos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'Versión del catálogo',
+                'verbose_name_plural': 'Versión del catálogo',
+            },
+        ),
+        migrations.RunPython(crear_version, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_categoria(apps, schema_editor):
+    # Los ítems existentes toman la categoría actual de su producto: es el
+    # mejor dato disponible para ventas ya hechas
+    PedidoItem = apps.get_model('store', 'PedidoItem')
+    Producto = apps.get_model('store', 'Producto')
+    PedidoItem.objects.filter(categoria__isnull=True).update(
+        categoria_id=Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).values('categoria_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_version_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedidoitem',
+            name='categoria',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.categoria'),
+        ),
+        migrations.RunPython(copiar_categoria, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0015_pedidoitem_categoria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductoRetirado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('producto_id', models.BigIntegerField()),
+                ('retirado_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Producto retirado',
+                'verbose_name_plural': 'Productos retirados',
+            },
+        ),
+    ]
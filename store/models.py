@@ -1,6 +1,7 @@
 # store/models.py
 
 from django.db import models
+from django.utils import timezone
 
 
 class Categoria(models.Model):
@@ -26,8 +27,16 @@ class Producto(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
+    # Unidades apartadas por carritos (ReservaStock, store/reservas.py).
+    # Se vende como máximo stock - reservado.
+    reservado = models.PositiveIntegerField(default=0, editable=False)
+    # Stock repartido en filas StockFragmento (store/stock_fragmentado.py).
+    # Entonces `stock` es la suma que refresca el rebalanceo.
+    stock_fragmentado = models.BooleanField(default=False, editable=False)
     # 🔹 Campo de imagen ya correcto
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True)
+    # Miniaturas/WebP generadas en segundo plano (store/imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
     disponible = models.BooleanField(default=True)
 
     # Campos extra que ya manejas
@@ -35,13 +44,57 @@ class Producto(models.Model):
     tiene_descuento = models.BooleanField(default=False)
     porcentaje_descuento = models.PositiveIntegerField(default=0)
 
+    # Última modificación (save() o cambios de stock)
+    actualizado = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
+        indexes = [
+            # Filtros del listado (store/facetas.py)
+            models.Index(fields=['disponible', 'categoria', 'precio'], name='producto_disp_cat_precio_idx'),
+            models.Index(fields=['disponible', 'precio'], name='producto_disp_precio_idx'),
+            models.Index(fields=['disponible', 'es_nuevo'], name='producto_disp_nuevo_idx'),
+            models.Index(fields=['disponible', 'tiene_descuento'], name='producto_disp_desc_idx'),
+            # Listado por defecto (disponible=True ORDER BY id) en MySQL
+            models.Index(fields=['disponible', 'id'], name='producto_disp_id_idx'),
+            # SQLite escribe `WHERE disponible` sin "= 1" y así no usa los
+            # índices compuestos de arriba; estos parciales sí le sirven
+            # (también a PostgreSQL). MySQL no los crea (ver settings).
+            models.Index(fields=['id'], condition=models.Q(disponible=True), name='producto_visible_id_idx'),
+            models.Index(fields=['precio', 'id'], condition=models.Q(disponible=True),
+                         name='producto_visible_precio_idx'),
+            models.Index(fields=['id'], condition=models.Q(disponible=True, es_nuevo=True),
+                         name='producto_visible_nuevo_idx'),
+            models.Index(fields=['id'], condition=models.Q(disponible=True, tiene_descuento=True),
+                         name='producto_visible_desc_idx'),
+            # Productos con stock fragmentado (pocos): uno para MySQL y el
+            # parcial para SQLite, por lo mismo que arriba
+            models.Index(fields=['stock_fragmentado'], name='producto_fragmentado_idx'),
+            models.Index(fields=['id'], condition=models.Q(stock_fragmentado=True),
+                         name='producto_fragmentado_id_idx'),
+        ]
+
+    # Solo cambian con UPDATE atómicos (store/reservas.py,
+    # store/stock_fragmentado.py): save() no debe pisarlas con lo que leyó
+    CAMPOS_ATOMICOS = ('reservado', 'stock_fragmentado')
 
     def __str__(self):
         return self.nombre
 
+    @property
+    def stock_vendible(self):
+        """Lo que otro carrito todavía puede comprar o reservar."""
+        return max(self.stock - self.reservado, 0)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_ATOMICOS
+            ]
+        super().save(*args, **kwargs)
+
 
 # ==============================
 # NUEVOS MODELOS DE PEDIDOS
@@ -59,9 +112,17 @@ class Pedido(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     metodo_pago = models.CharField(max_length=50)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # Factura HTML en el storage; la genera un Trabajo tras crear el pedido
+    factura = models.CharField(max_length=255, blank=True, editable=False)
 
     class Meta:
         ordering = ['-creado_en']
+        indexes = [
+            # Historial "mis pedidos" y listado general, más recientes primero
+            models.Index(fields=['user_uid', 'creado_en'], name='pedido_uid_creado_idx'),
+            models.Index(fields=['email', 'creado_en'], name='pedido_email_creado_idx'),
+            models.Index(fields=['creado_en', 'id'], name='pedido_creado_id_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido {self.id} - {self.email}"
@@ -82,9 +143,220 @@ class PedidoItem(models.Model):
     )
     cantidad = models.PositiveIntegerField()
     precio_unitario = models.DecimalField(max_digits=10, decimal_places=2)
+    # Categoría del producto al venderlo: los resúmenes de ventas
+    # (store/ventas.py) restan el pedido de ella aunque el producto se
+    # recategorice después. Nula en ítems sin ese dato: se usa la actual.
+    categoria = models.ForeignKey(
+        Categoria,
+        related_name='+',
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL
+    )
 
     def subtotal(self):
         return self.cantidad * self.precio_unitario
 
     def __str__(self):
         return f"{self.producto.nombre} x {self.cantidad}"
+
+
+# ==============================
+# RESÚMENES DE VENTAS (store/ventas.py)
+# ==============================
+
+class VentaDiaria(models.Model):
+    """Totales de ventas de un día (zona horaria del sitio)."""
+    fecha = models.DateField(unique=True)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venta diaria"
+        verbose_name_plural = "Ventas diarias"
+
+    def __str__(self):
+        return f"{self.fecha}: {self.ingresos}"
+
+
+class VentaDiariaCategoria(models.Model):
+    """Ventas de una categoría en un día."""
+    fecha = models.DateField()
+    categoria = models.ForeignKey(Categoria, related_name='ventas_diarias', on_delete=models.CASCADE)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venta diaria por categoría"
+        verbose_name_plural = "Ventas diarias por categoría"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'categoria'], name='venta_categoria_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['categoria', 'fecha'], name='venta_categoria_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.categoria_id}: {self.ingresos}"
+
+
+class VentaDiariaProducto(models.Model):
+    """Ventas de un producto en un día."""
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, related_name='ventas_diarias', on_delete=models.CASCADE)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "Venta diaria por producto"
+        verbose_name_plural = "Ventas diarias por producto"
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='venta_producto_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['producto', 'fecha'], name='venta_producto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.producto_id}: {self.ingresos}"
+
+
+# ==============================
+# RESERVAS DE STOCK (store/reservas.py)
+# ==============================
+
+class ReservaStock(models.Model):
+    """
+    Unidades de un producto apartadas por un carrito hasta `expira_en`.
+    Cada fila activa está sumada en Producto.reservado; al liberarla o
+    convertirla en venta se borra y se resta.
+    """
+    carrito = models.CharField(max_length=64)
+    producto = models.ForeignKey(Producto, related_name='reservas', on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField()
+    creada_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Reserva de stock"
+        verbose_name_plural = "Reservas de stock"
+        indexes = [
+            models.Index(fields=['carrito', 'producto'], name='reserva_carrito_idx'),
+            # Barrido de vencidas (liberar_reservas)
+            models.Index(fields=['expira_en'], name='reserva_expira_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.carrito}: {self.producto_id} x {self.cantidad}"
+
+
+# ==============================
+# STOCK FRAGMENTADO (store/stock_fragmentado.py)
+# ==============================
+
+class StockFragmento(models.Model):
+    """Una parte del stock de un producto con stock_fragmentado."""
+    producto = models.ForeignKey(Producto, related_name='fragmentos', on_delete=models.CASCADE)
+    indice = models.PositiveSmallIntegerField()
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Fragmento de stock"
+        verbose_name_plural = "Fragmentos de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'indice'], name='fragmento_producto_indice_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id}[{self.indice}]: {self.stock}"
+
+
+# ==============================
+# COLA DE TRABAJOS (store/trabajos.py)
+# ==============================
+
+class Trabajo(models.Model):
+    """Tarea diferida; la ejecuta `manage.py procesar_trabajos`."""
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    HECHO = 'hecho'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (HECHO, 'Hecho'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=50)
+    argumentos = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    # No se ejecuta antes (reintentos con espera creciente)
+    disponible_en = models.DateTimeField(default=timezone.now)
+    # Quién lo tomó y cuándo; si el trabajador muere, vuelve a la cola
+    bloqueado_por = models.CharField(max_length=100, blank=True)
+    bloqueado_en = models.DateTimeField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Trabajo"
+        verbose_name_plural = "Trabajos"
+        indexes = [
+            # Siguiente pendiente (y trabajos en curso vencidos)
+            models.Index(fields=['estado', 'disponible_en'], name='trabajo_estado_disp_idx'),
+            models.Index(fields=['estado', 'bloqueado_en'], name='trabajo_estado_bloq_idx'),
+            models.Index(fields=['bloqueado_por'], name='trabajo_bloqueado_por_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.estado})"
+
+
+# ==============================
+# VERSIÓN DEL CATÁLOGO (store/cache.py)
+# ==============================
+
+class VersionCatalogo(models.Model):
+    """
+    Versión del catálogo compartida entre procesos cuando la cache del
+    catálogo es local a cada uno (CATALOGO_CACHE_BACKEND='memoria').
+    Una sola fila (pk=1).
+    """
+    version = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = "Versión del catálogo"
+        verbose_name_plural = "Versión del catálogo"
+
+    def __str__(self):
+        return str(self.version)
+
+
+# ==============================
+# BÚSQUEDA (store/busqueda.py)
+# ==============================
+
+class ProductoRetirado(models.Model):
+    """
+    Producto borrado: la puesta al día de los índices de búsqueda de cada
+    proceso lo quita sin comparar todos los ids. Se purgan a los
+    BUSQUEDA_RETIRADOS_DIAS días.
+    """
+    producto_id = models.BigIntegerField()
+    retirado_en = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = "Producto retirado"
+        verbose_name_plural = "Productos retirados"
+
+    def __str__(self):
+        return f"{self.producto_id} ({self.retirado_en})"
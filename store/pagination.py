@@ -0,0 +1,179 @@
+# store/pagination.py
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+# Separa los valores de la posición en órdenes compuestos ("12.50|42")
+SEPARADOR_POSICION = '|'
+
+
+class CursorAsincronoMixin:
+    """
+    Añade `apaginate_queryset` (ORM asíncrono) a una CursorPagination.
+    Es la misma lógica que CursorPagination.paginate_queryset de DRF,
+    partida en dos para que la consulta de la página sea lo único que
+    cambia entre la versión síncrona y la asíncrona.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        consulta = self._consulta_pagina(queryset, request, view)
+        if consulta is None:
+            return None
+        return self._armar_pagina(list(consulta))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        consulta = self._consulta_pagina(queryset, request, view)
+        if consulta is None:
+            return None
+        return self._armar_pagina([fila async for fila in consulta])
+
+    def _consulta_pagina(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, posicion = 0, False, None
+        else:
+            offset, reverse, posicion = self.cursor
+        self._offset, self._reverse, self._posicion = offset, reverse, posicion
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if posicion is not None:
+            queryset = queryset.filter(self._despues_de(posicion))
+
+        # Una fila de más para saber si hay página siguiente
+        return queryset[offset:offset + self.page_size + 1]
+
+    def _despues_de(self, posicion):
+        """
+        Filas que siguen a `posicion` en el orden de la página. Con un
+        orden compuesto (precio, id) la posición trae los dos valores y
+        la condición es (precio > p) OR (precio = p AND id > i), más
+        precio >= p para que el índice (precio, id) acote el rango: los
+        empates de precio se saltan por índice, nunca con OFFSET.
+        """
+        campos = [orden.lstrip('-') for orden in self.ordering]
+        valores = posicion.split(SEPARADOR_POSICION)
+        if len(valores) != len(campos):
+            raise NotFound(self.invalid_cursor_message)
+        # (cursor invertido) XOR (orden descendente)
+        operador = 'lt' if self.cursor.reverse != self.ordering[0].startswith('-') else 'gt'
+
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(campos, valores):
+            condicion |= Q(**iguales, **{f'{campo}__{operador}': valor})
+            iguales[campo] = valor
+        if len(campos) > 1:
+            condicion &= Q(**{f'{campos[0]}__{operador}e': valores[0]})
+        return condicion
+
+    def _get_position_from_instance(self, instance, ordering):
+        # Todos los campos del orden, no solo el primero como en DRF
+        valores = (
+            instance[orden.lstrip('-')] if isinstance(instance, dict) else getattr(instance, orden.lstrip('-'))
+            for orden in ordering
+        )
+        return SEPARADOR_POSICION.join(str(valor) for valor in valores)
+
+    def _armar_pagina(self, resultados):
+        offset, reverse, posicion = self._offset, self._reverse, self._posicion
+        self.page = resultados[:self.page_size]
+
+        if len(resultados) > len(self.page):
+            hay_siguiente = True
+            siguiente = self._get_position_from_instance(resultados[-1], self.ordering)
+        else:
+            hay_siguiente = False
+            siguiente = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (posicion is not None) or (offset > 0)
+            self.has_previous = hay_siguiente
+            if self.has_next:
+                self.next_position = posicion
+            if self.has_previous:
+                self.previous_position = siguiente
+        else:
+            self.has_next = hay_siguiente
+            self.has_previous = (posicion is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = siguiente
+            if self.has_previous:
+                self.previous_position = posicion
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class ProductoCursorPagination(CursorAsincronoMixin, CursorPagination):
+    """
+    Paginación por cursor (keyset) para el catálogo.
+
+    No ejecuta COUNT(*) y el cursor es opaco, así que pedir la página
+    1000 cuesta lo mismo que pedir la primera: siempre es un
+    WHERE id > <último visto> ORDER BY id LIMIT n. Ordenando por precio
+    el cursor lleva (precio, id) del último visto y tampoco hay OFFSET,
+    aunque muchos productos compartan precio.
+
+    GET /api/v1/productos/?orden=-precio&page_size=48
+    """
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    # 🔹 Orden por defecto y órdenes permitidos (?orden=...).
+    #    Siempre terminan en 'id' para que el orden sea estable.
+    ordering = ('id',)
+    orden_query_param = 'orden'
+    ordenes_permitidos = {
+        'id': ('id',),
+        '-id': ('-id',),
+        'precio': ('precio', 'id'),
+        '-precio': ('-precio', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        orden = request.query_params.get(self.orden_query_param)
+        return self.ordenes_permitidos.get(orden, self.ordering)
+
+
+class PedidoCursorPagination(CursorPagination):
+    """
+    Paginación por cursor para el historial de pedidos, del más reciente
+    al más antiguo. Con el índice (user_uid, creado_en) la página de
+    "mis pedidos" es un recorrido de índice acotado.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-creado_en', '-id')
+
+
+class PaginacionOpcionalMixin:
+    """
+    Para ViewSets paginados: ?todos=1 devuelve la lista completa sin
+    paginar, con el formato de antes.
+    """
+    todos_query_param = 'todos'
+
+    def sin_paginar(self):
+        return self.request.query_params.get(self.todos_query_param) in ('1', 'true', 'True')
+
+    def paginate_queryset(self, queryset):
+        if self.sin_paginar():
+            return None
+        return super().paginate_queryset(queryset)
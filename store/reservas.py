@@ -0,0 +1,179 @@
+# store/reservas.py
+#
+# Reservas de stock con vencimiento para los carritos.
+#
+# Al agregar un producto al carrito se aparta la cantidad por
+# RESERVAS_TTL segundos: una fila ReservaStock por línea y la misma
+# cantidad sumada en Producto.reservado con un UPDATE condicional
+# (reservado + cantidad <= stock), así que el stock vendible nunca se
+# recalcula sumando reservas por petición.
+#
+# En el checkout, disminuir_stock_lote(..., carrito=...) convierte las
+# reservas del carrito en venta (store/inventario.py). Las que vencen
+# las libera en bloque `manage.py liberar_reservas`. Los productos con
+# stock fragmentado no se reservan (store/stock_fragmentado.py).
+#
+# Cambiar Producto.reservado cambia el stock_vendible que publica el
+# catálogo: cada reserva o liberación invalida su cache.
+
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .inventario import (
+    ReservasCambiaron,
+    StockInsuficiente,
+    agrupar_lineas,
+    bloquear_en_orden,
+    caso_por,
+    detalle_lineas,
+)
+from .models import Producto, ReservaStock
+from .stock_fragmentado import productos_fragmentados
+
+
+class _SinStock(Exception):
+    pass
+
+
+def ttl_reservas():
+    return timedelta(seconds=settings.RESERVAS_TTL)
+
+
+def reservar(carrito, lineas, ttl=None):
+    """
+    Aparta las líneas [{'slug', 'cantidad'}, ...] para el carrito y
+    renueva el vencimiento de sus demás reservas. Devuelve la nueva
+    fecha de vencimiento.
+
+    Todo o nada como disminuir_stock_lote: si una línea no alcanza no se
+    reserva ninguna y se lanza StockInsuficiente con el detalle.
+    """
+    todas = agrupar_lineas(lineas)
+    expira_en = timezone.now() + (ttl or ttl_reservas())
+
+    for refrescar in (False, True):
+        # Los productos con stock fragmentado se venden por orden de llegada
+        fragmentados = productos_fragmentados(refrescar=refrescar)
+        cantidades = {slug: c for slug, c in todas.items() if slug not in fragmentados}
+        condicion = Q()
+        for slug, cantidad in cantidades.items():
+            condicion |= Q(slug=slug, stock_fragmentado=False, stock__gte=F('reservado') + cantidad)
+        try:
+            with transaction.atomic():
+                if cantidades:
+                    if len(cantidades) > 1:
+                        bloquear_en_orden(Q(slug__in=list(cantidades)))
+                    actualizados = (
+                        Producto.objects.filter(condicion)
+                        .update(reservado=F('reservado') + caso_por('slug', cantidades))
+                    )
+                    if actualizados != len(cantidades):
+                        raise _SinStock
+                    ids = dict(Producto.objects.filter(slug__in=list(cantidades)).values_list('slug', 'id'))
+                    ReservaStock.objects.bulk_create([
+                        ReservaStock(carrito=carrito, producto_id=ids[slug], cantidad=cantidad,
+                                     expira_en=expira_en)
+                        for slug, cantidad in cantidades.items()
+                    ])
+                    # update() no dispara señales: invalidamos a mano
+                    invalidar_catalogo()
+                ReservaStock.objects.filter(carrito=carrito).update(expira_en=expira_en)
+        except _SinStock:
+            continue
+        return expira_en
+    raise StockInsuficiente(detalle_lineas(todas))
+
+
+def _liberar(reservas):
+    """
+    Borra las reservas [(id, producto_id, cantidad), ...] y resta sus
+    unidades de Producto.reservado (un DELETE y un UPDATE con CASE). Va
+    dentro de una transacción; si otro proceso ya borró alguna (checkout
+    o barrido concurrente), ReservasCambiaron.
+    """
+    if not reservas:
+        return 0
+    borradas, _ = ReservaStock.objects.filter(id__in=[r[0] for r in reservas]).delete()
+    if borradas != len(reservas):
+        raise ReservasCambiaron
+    por_producto = Counter()
+    for _, producto_id, cantidad in reservas:
+        por_producto[producto_id] += cantidad
+    if len(por_producto) > 1:
+        bloquear_en_orden(Q(id__in=list(por_producto)))
+    Producto.objects.filter(id__in=list(por_producto)).update(
+        reservado=F('reservado') - caso_por('id', por_producto)
+    )
+    invalidar_catalogo()
+    return borradas
+
+
+def _leer(queryset):
+    # Con SKIP LOCKED (MySQL 8, PostgreSQL) dos barridos o un barrido y
+    # un checkout no se esperan ni se pisan; SQLite serializa las
+    # escrituras y los choques se resuelven reintentando.
+    if connection.features.has_select_for_update_skip_locked:
+        queryset = queryset.select_for_update(skip_locked=True)
+    return list(queryset.values_list('id', 'producto_id', 'cantidad'))
+
+
+def liberar(carrito, ids=None):
+    """Libera las reservas del carrito (todas o las de `ids`). Devuelve cuántas."""
+    reservas = ReservaStock.objects.filter(carrito=carrito)
+    if ids is not None:
+        reservas = reservas.filter(id__in=ids)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                return _liberar(_leer(reservas))
+        except ReservasCambiaron:
+            continue
+    return 0
+
+
+def fijar(carrito, slug, cantidad, ttl=None):
+    """
+    Deja apartadas exactamente `cantidad` unidades del producto para el
+    carrito (0 = liberar las suyas): el carrito las sube o baja sin
+    acumular reservas de más. Libera y vuelve a reservar en la misma
+    transacción, así que si la nueva cantidad no alcanza se lanza
+    StockInsuficiente y la reserva anterior queda como estaba.
+    """
+    reservas = ReservaStock.objects.filter(carrito=carrito, producto__slug=slug)
+    for _ in range(3):
+        try:
+            with transaction.atomic():
+                _liberar(_leer(reservas))
+                if cantidad:
+                    reservar(carrito, [{'slug': slug, 'cantidad': cantidad}], ttl)
+            return
+        except ReservasCambiaron:
+            continue
+
+
+def liberar_vencidas(lote=1000, ahora=None):
+    """
+    Libera en bloques de `lote` las reservas vencidas (cada bloque en su
+    transacción). Devuelve cuántas se liberaron.
+    """
+    ahora = ahora or timezone.now()
+    vencidas = ReservaStock.objects.filter(expira_en__lte=ahora).order_by('expira_en')
+    total = 0
+    choques = 0
+    while choques < 3:
+        try:
+            with transaction.atomic():
+                liberadas = _liberar(_leer(vencidas[:lote]))
+        except ReservasCambiaron:
+            choques += 1
+            continue
+        if not liberadas:
+            break
+        total += liberadas
+    return total
@@ -1,7 +1,43 @@
 # store/serializers.py
 
+from django.db import transaction
 from rest_framework import serializers
-from .models import Categoria, Producto, Pedido, PedidoItem
+
+from . import trabajos, ventas
+from .medios import url_imagenes, urls_variantes
+from .models import Categoria, Producto, Pedido, PedidoItem, ReservaStock
+
+
+class UrlImagenMixin:
+    """URL de un archivo de imagen, sin build_absolute_uri por fila (store/medios.py)."""
+
+    def url_imagen(self, nombre):
+        request = self.context.get('request')
+        if getattr(self, '_request', False) is not request:
+            # En many=True el campo es uno solo para todas las filas
+            self._request = request
+            self._url = url_imagenes(request)
+        return self._url(nombre)
+
+
+class ImagenField(UrlImagenMixin, serializers.ImageField):
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        return self.url_imagen(value.name)
+
+
+class VariantesImagenField(UrlImagenMixin, serializers.Field):
+    """Miniaturas por formato y ancho: {"webp": {"160": url, ...}, ...}."""
+
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, producto):
+        imagen = producto.imagen.name if producto.imagen else None
+        return urls_variantes(producto.imagen_variantes, imagen, self.url_imagen)
 
 
 class ProductoSerializer(serializers.ModelSerializer):
@@ -15,8 +51,12 @@ class ProductoSerializer(serializers.ModelSerializer):
         write_only=True
     )
 
-    # 🔹 ImageField normal (lectura/escritura)
-    imagen = serializers.ImageField(required=False, allow_null=True)
+    # 🔹 ImageField (lectura/escritura); la URL sale de MEDIA_BASE_URL o del host
+    imagen = ImagenField(required=False, allow_null=True)
+    imagen_variantes = VariantesImagenField()
+
+    # 🔹 stock - reservado: el tope real para el carrito
+    stock_vendible = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Producto
@@ -29,27 +69,14 @@ class ProductoSerializer(serializers.ModelSerializer):
             "descripcion",
             "precio",
             "stock",
+            "stock_vendible",
             "imagen",
+            "imagen_variantes",
             "es_nuevo",
             "tiene_descuento",
             "porcentaje_descuento",
         )
 
-    def to_representation(self, instance):
-        """
-        Sobrescribimos para devolver la URL absoluta de la imagen.
-        """
-        data = super().to_representation(instance)
-        request = self.context.get('request')
-
-        imagen = data.get('imagen')
-        if imagen and request:
-            # Si es una ruta relativa, la convertimos en absoluta
-            if not imagen.startswith('http://') and not imagen.startswith('https://'):
-                data['imagen'] = request.build_absolute_uri(imagen)
-
-        return data
-
 
 class CategoriaSerializer(serializers.ModelSerializer):
     productos = ProductoSerializer(many=True, read_only=True)
@@ -64,13 +91,70 @@ class CategoriaSerializer(serializers.ModelSerializer):
         )
 
 
+class CategoriaResumenSerializer(serializers.ModelSerializer):
+    """
+    Categoría sin productos, para menús y listados.
+    `total_productos` viene anotado en el queryset (productos disponibles).
+    """
+    total_productos = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Categoria
+        fields = (
+            "id",
+            "nombre",
+            "slug",
+            "total_productos",
+        )
+
+
+# ==============================
+# DESCUENTO DE STOCK EN LOTE
+# ==============================
+
+class LineaStockSerializer(serializers.Serializer):
+    slug = serializers.SlugField()
+    cantidad = serializers.IntegerField(min_value=1)
+
+
+class LoteStockSerializer(serializers.Serializer):
+    items = LineaStockSerializer(many=True, allow_empty=False)
+    # Si el carrito tiene reservas (store/reservas.py) se convierten en venta
+    carrito = serializers.CharField(max_length=64, required=False)
+
+
+# ==============================
+# RESERVAS DE STOCK
+# ==============================
+
+class ReservaSerializer(serializers.Serializer):
+    carrito = serializers.CharField(max_length=64)
+    items = LineaStockSerializer(many=True, allow_empty=False)
+
+
+class AjusteReservaSerializer(serializers.Serializer):
+    carrito = serializers.CharField(max_length=64)
+    slug = serializers.SlugField()
+    # Total que debe quedar apartado del producto (0 = liberar)
+    cantidad = serializers.IntegerField(min_value=0)
+
+
+class ReservaStockSerializer(serializers.ModelSerializer):
+    slug = serializers.CharField(source='producto.slug', read_only=True)
+
+    class Meta:
+        model = ReservaStock
+        fields = ("id", "slug", "cantidad", "expira_en")
+
+
 # ==============================
 # NUEVOS SERIALIZERS DE PEDIDOS
 # ==============================
 
 class PedidoItemSerializer(serializers.ModelSerializer):
-    # En el request esperamos el ID de producto
-    producto = serializers.PrimaryKeyRelatedField(queryset=Producto.objects.all())
+    # En el request esperamos el ID de producto. Se valida en bloque desde
+    # PedidoSerializer.validate (una sola consulta para todos los ítems).
+    producto = serializers.IntegerField(source='producto_id', min_value=1)
 
     class Meta:
         model = PedidoItem
@@ -95,9 +179,73 @@ class PedidoSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "creado_en")
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # PUT sin ítems: se conservan los del pedido
+            fields["items"].required = False
+        return fields
+
+    def validate(self, attrs):
+        """
+        Comprueba productos y precios contra la base de datos.
+        Todos los productos del pedido se leen en una sola consulta.
+
+        Un pedido ya creado no cambia ítems ni total: están sumados en los
+        resúmenes de ventas (store/ventas.py). PUT/PATCH solo tocan los
+        datos del cliente y el método de pago.
+        """
+        if self.instance is not None:
+            errores = {}
+            if "items" in attrs:
+                errores["items"] = "No se puede modificar en un pedido creado."
+            if "total" in attrs and attrs["total"] != self.instance.total:
+                errores["total"] = "No se puede modificar en un pedido creado."
+            if errores:
+                raise serializers.ValidationError(errores)
+            return attrs
+
+        items = attrs["items"]
+        if not items:
+            raise serializers.ValidationError({"items": "El pedido no tiene ítems."})
+
+        ids = {item["producto_id"] for item in items}
+        productos = Producto.objects.only("id", "precio", "categoria_id").in_bulk(ids)
+        # Categoría de cada ítem al venderlo (create), sin volver a consultar
+        self._categorias = {pid: p.categoria_id for pid, p in productos.items()}
+
+        errores = []
+        total = 0
+        for item in items:
+            producto = productos.get(item["producto_id"])
+            if producto is None:
+                errores.append({"producto": "Producto no encontrado."})
+            elif item["precio_unitario"] != producto.precio:
+                errores.append({"precio_unitario": f"El precio actual es {producto.precio}."})
+            else:
+                errores.append({})
+            total += item["cantidad"] * item["precio_unitario"]
+
+        if any(errores):
+            raise serializers.ValidationError({"items": errores})
+
+        if "total" in attrs and attrs["total"] != total:
+            raise serializers.ValidationError({"total": f"El total debería ser {total}."})
+
+        return attrs
+
     def create(self, validated_data):
         items_data = validated_data.pop("items")
-        pedido = Pedido.objects.create(**validated_data)
-        for item_data in items_data:
-            PedidoItem.objects.create(pedido=pedido, **item_data)
+        with transaction.atomic():
+            pedido = Pedido.objects.create(**validated_data)
+            categorias = getattr(self, "_categorias", {})
+            items = PedidoItem.objects.bulk_create([
+                PedidoItem(pedido=pedido, categoria_id=categorias.get(item_data["producto_id"]), **item_data)
+                for item_data in items_data
+            ])
+            ventas.registrar_pedido(pedido, items)
+            # La factura se genera fuera de la petición (store/facturas.py)
+            trabajos.encolar("factura_pedido", pedido_id=pedido.id)
+        # La respuesta usa estos mismos ítems (sin volver a consultarlos)
+        pedido._prefetched_objects_cache = {"items": items}
         return pedido
@@ -0,0 +1,52 @@
+# store/signals.py
+
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import busqueda
+from .imagenes import programar_variantes, variantes_vigentes
+from .cache import invalidar_catalogo
+from .metricas import instalar_contador_sql
+from .models import Categoria, Producto, ProductoRetirado
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def catalogo_modificado(sender, **kwargs):
+    # Cualquier cambio en el catálogo invalida las respuestas cacheadas
+    invalidar_catalogo()
+
+
+@receiver(post_save, sender=Producto)
+def reindexar_producto(sender, instance, **kwargs):
+    # Si el índice aún no existe se construirá completo en el primer uso
+    if busqueda.indice_construido():
+        transaction.on_commit(lambda: busqueda.indexar_producto(instance))
+
+
+@receiver(post_delete, sender=Producto)
+def desindexar_producto(sender, instance, **kwargs):
+    # Para los índices de los demás procesos (store/busqueda.py)
+    ProductoRetirado.objects.create(producto_id=instance.pk)
+    if busqueda.indice_construido():
+        producto_id = instance.pk
+        transaction.on_commit(lambda: busqueda.indice.eliminar(producto_id))
+
+
+@receiver(post_save, sender=Producto)
+def variantes_imagen(sender, instance, raw=False, **kwargs):
+    # Imagen nueva o cambiada: las miniaturas se generan en segundo plano
+    if raw or not instance.imagen:
+        return
+    if not variantes_vigentes(instance.imagen_variantes, instance.imagen.name):
+        programar_variantes(instance.pk)
+
+
+@receiver(connection_created)
+def medir_sql(sender, connection, **kwargs):
+    # Cada conexión nueva cuenta sus consultas para store/metricas.py
+    instalar_contador_sql(connection)
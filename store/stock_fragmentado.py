@@ -0,0 +1,209 @@
+# store/stock_fragmentado.py
+#
+# Stock fragmentado para productos muy disputados (ventas flash).
+#
+# Con el stock en una sola fila de store_producto, todas las compras de
+# un mismo producto se encolan en el bloqueo de esa fila. Un producto
+# marcado con `stock_fragmentado` reparte su stock en N filas
+# StockFragmento: cada compra descuenta de un fragmento al azar con un
+# UPDATE condicional, así que N compras pueden avanzar a la vez.
+#
+# Producto.stock pasa a ser la suma que refresca rebalancear() (desde
+# `manage.py rebalancear_stock --cada N`): ProductoSerializer la sigue
+# leyendo de la misma columna sin consultas extra, con unos segundos de
+# retraso como mucho. Las reservas de carritos no aplican a estos
+# productos (se venden por orden de llegada).
+
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .models import Producto, ReservaStock, StockFragmento
+
+_fragmentados = (0.0, {})
+_candado = threading.Lock()
+
+
+# ==============================
+# Qué productos están fragmentados
+# ==============================
+
+def productos_fragmentados(refrescar=False):
+    """
+    {slug: (id, nº de fragmentos)} de los productos fragmentados,
+    cacheado por proceso STOCK_FRAGMENTOS_REFRESCO segundos. Si está
+    desactualizado el descuento lo nota (su UPDATE no toca la fila) y
+    refresca.
+    """
+    global _fragmentados
+    vence, slugs = _fragmentados
+    if refrescar or time.monotonic() >= vence:
+        with _candado:
+            slugs = {
+                slug: (producto_id, fragmentos)
+                for slug, producto_id, fragmentos in Producto.objects.filter(stock_fragmentado=True)
+                .annotate(n=Count('fragmentos')).values_list('slug', 'id', 'n')
+            }
+            _fragmentados = (time.monotonic() + settings.STOCK_FRAGMENTOS_REFRESCO, slugs)
+    return slugs
+
+
+def olvidar_fragmentados():
+    global _fragmentados
+    _fragmentados = (0.0, {})
+
+
+# ==============================
+# Descuento y lectura (dentro de la transacción del lote)
+# ==============================
+
+def descontar(producto_id, fragmentos, cantidad, intentos=3):
+    """
+    Descuenta `cantidad` de los fragmentos del producto. Devuelve False
+    si no alcanza (lo ya descontado se revierte con la transacción).
+
+    Primero prueba un fragmento al azar a ciegas (una sola consulta); si
+    no alcanza, lee los fragmentos con stock y toma de varios.
+    """
+    if not fragmentos:
+        return False
+    intento = StockFragmento.objects.filter(
+        producto_id=producto_id,
+        indice=random.randrange(fragmentos),
+        stock__gte=cantidad,
+    ).update(stock=F('stock') - cantidad)
+    if intento:
+        return True
+
+    restante = cantidad
+    for _ in range(intentos):
+        con_stock = list(
+            StockFragmento.objects.filter(producto_id=producto_id, stock__gt=0)
+            .order_by('indice').values_list('id', 'stock')
+        )
+        if sum(stock for _, stock in con_stock) < restante:
+            return False
+        for fragmento_id, stock in con_stock:
+            tomar = min(restante, stock)
+            if StockFragmento.objects.filter(id=fragmento_id, stock__gte=tomar).update(stock=F('stock') - tomar):
+                restante -= tomar
+                if not restante:
+                    return True
+    return False
+
+
+def stock_total(producto_ids):
+    """{producto_id: suma de sus fragmentos} en una consulta."""
+    return dict(
+        StockFragmento.objects.filter(producto_id__in=list(producto_ids))
+        .values('producto_id').annotate(total=Sum('stock')).order_by()
+        .values_list('producto_id', 'total')
+    )
+
+
+# ==============================
+# Administración y rebalanceo
+# ==============================
+
+def fragmentar(producto, fragmentos=None):
+    """
+    Pasa el producto a stock fragmentado: libera sus reservas y reparte
+    su stock en `fragmentos` filas (STOCK_FRAGMENTOS por defecto).
+    """
+    fragmentos = fragmentos or settings.STOCK_FRAGMENTOS
+    with transaction.atomic():
+        producto = Producto.objects.select_for_update().get(pk=producto.pk)
+        if producto.stock_fragmentado:
+            return producto
+        ReservaStock.objects.filter(producto=producto).delete()
+        StockFragmento.objects.bulk_create([
+            StockFragmento(producto=producto, indice=i, stock=stock)
+            for i, stock in enumerate(_repartir(producto.stock, fragmentos))
+        ])
+        Producto.objects.filter(pk=producto.pk).update(stock_fragmentado=True, reservado=0)
+    olvidar_fragmentados()
+    invalidar_catalogo()
+    producto.stock_fragmentado, producto.reservado = True, 0
+    return producto
+
+
+def desfragmentar(producto):
+    """Vuelve a una sola fila: Producto.stock = suma de los fragmentos."""
+    with transaction.atomic():
+        producto = Producto.objects.select_for_update().get(pk=producto.pk)
+        if not producto.stock_fragmentado:
+            return producto
+        filas = StockFragmento.objects.select_for_update().filter(producto=producto)
+        producto.stock = sum(filas.values_list('stock', flat=True))
+        filas.delete()
+        Producto.objects.filter(pk=producto.pk).update(
+            stock=producto.stock, stock_fragmentado=False, actualizado=timezone.now()
+        )
+    olvidar_fragmentados()
+    invalidar_catalogo()
+    producto.stock_fragmentado = False
+    return producto
+
+
+def rebalancear(producto_id, total=None):
+    """
+    Reparte por igual el stock entre los fragmentos del producto
+    (`total` = nuevo stock, p. ej. al reponer; None = el que hay) y
+    guarda la suma en Producto.stock. Bloquea los fragmentos mientras.
+    """
+    with transaction.atomic():
+        fragmentos = list(
+            StockFragmento.objects.select_for_update().filter(producto_id=producto_id).order_by('indice')
+        )
+        if not fragmentos:
+            return None
+        if total is None:
+            total = sum(f.stock for f in fragmentos)
+        for fragmento, stock in zip(fragmentos, _repartir(total, len(fragmentos))):
+            fragmento.stock = stock
+        StockFragmento.objects.bulk_update(fragmentos, ['stock'])
+        Producto.objects.filter(id=producto_id).exclude(stock=total).update(
+            stock=total, actualizado=timezone.now()
+        )
+    return total
+
+
+def rebalancear_todos():
+    """
+    Recorre los productos fragmentados: rebalancea los que tienen algún
+    fragmento por debajo de la mitad de su parte y refresca Producto.stock
+    de todos. Devuelve cuántos se rebalancearon.
+    """
+    fragmentos = {}
+    for producto_id, stock in (
+        StockFragmento.objects.filter(producto__stock_fragmentado=True)
+        .values_list('producto_id', 'stock')
+    ):
+        fragmentos.setdefault(producto_id, []).append(stock)
+    sumas = dict(Producto.objects.filter(id__in=list(fragmentos)).values_list('id', 'stock'))
+
+    rebalanceados = 0
+    refrescados = []
+    for producto_id, stocks in fragmentos.items():
+        total = sum(stocks)
+        if min(stocks) * 2 * len(stocks) < total:
+            rebalancear(producto_id)
+            rebalanceados += 1
+        elif sumas.get(producto_id) != total:
+            refrescados.append((producto_id, total))
+    for producto_id, total in refrescados:
+        Producto.objects.filter(id=producto_id).update(stock=total, actualizado=timezone.now())
+    if rebalanceados or refrescados:
+        invalidar_catalogo()
+    return rebalanceados
+
+
+def _repartir(total, partes):
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
@@ -1,3 +1,1662 @@
-from django.test import TestCase
+# store/tests.py
+#
+# Correr con:  DJANGO_DB_ENGINE=sqlite python manage.py test store
 
-# Create your tests here.
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from asyncio import iscoroutinefunction
+from datetime import datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache as django_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.db.utils import ConnectionHandler
+from django.http import FileResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.test import APITestCase as BaseAPITestCase
+from rest_framework.throttling import AnonRateThrottle
+
+from backend.db import pool as pool_db
+from . import busqueda, exportacion, imagenes, metricas, reservas, stock_fragmentado, trabajos
+from . import urls as store_urls
+from .asincrono import con_lectura_asincrona
+from .views import ProductoViewSet
+from . import cache as cache_catalogo
+from .models import (
+    Categoria,
+    Pedido,
+    PedidoItem,
+    Producto,
+    ProductoRetirado,
+    ReservaStock,
+    StockFragmento,
+    Trabajo,
+    VentaDiaria,
+    VentaDiariaCategoria,
+    VentaDiariaProducto,
+    VersionCatalogo,
+)
+
+
+class APITestCase(BaseAPITestCase):
+    """
+    La cache del catálogo vive fuera de la transacción de cada test:
+    se vacía al empezar para que un test no vea datos de otro.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache_catalogo.get_cache().clear()
+        cache_catalogo.reiniciar_estadisticas()
+        # Con la cache en memoria la versión se relee de la base como mucho
+        # una vez por CATALOGO_VERSION_REFRESCO: no cuenta en las consultas
+        # de cada petición
+        cache_catalogo.olvidar_version()
+        cache_catalogo.version_catalogo()
+        stock_fragmentado.olvidar_fragmentados()
+
+
+def crear_productos(categoria, cantidad, prefijo='extra'):
+    """Crea `cantidad` productos disponibles en la categoría dada."""
+    return Producto.objects.bulk_create([
+        Producto(
+            categoria=categoria,
+            nombre=f"{prefijo} {i}",
+            slug=f"{prefijo}-{i}",
+            precio=Decimal('10.00') + i,
+            stock=10,
+        )
+        for i in range(cantidad)
+    ])
+
+
+@override_settings(CATALOGO_CACHE_HABILITADO=False, CATALOGO_VERSION_REFRESCO=60)
+class PresupuestoConsultasTests(APITestCase):
+    """
+    Cada endpoint del catálogo debe ejecutar un número fijo de consultas,
+    sin importar cuántos productos devuelva (sin N+1).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.categoria = Categoria.objects.create(nombre="Pruebas", slug="pruebas")
+        self.otra = Categoria.objects.create(nombre="Otra", slug="otra")
+
+    def assertConsultasConstantes(self, url, esperado):
+        # Se mide dos veces, antes y después de duplicar el catálogo
+        with self.assertNumQueries(esperado):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        crear_productos(self.categoria, 40, prefijo='a')
+        crear_productos(self.otra, 40, prefijo='b')
+        with self.assertNumQueries(esperado):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_lista_productos_paginada(self):
+        self.assertConsultasConstantes('/api/v1/productos/', 1)
+
+    def test_lista_productos_sin_paginar(self):
+        self.assertConsultasConstantes('/api/v1/productos/?todos=1', 1)
+
+    def test_detalle_producto(self):
+        self.assertConsultasConstantes('/api/v1/productos/catan/', 1)
+
+    def test_lista_categorias(self):
+        self.assertConsultasConstantes('/api/v1/categorias/', 1)
+
+    def test_detalle_categoria(self):
+        self.assertConsultasConstantes('/api/v1/categorias/pruebas/', 2)
+
+    def test_productos_de_categoria(self):
+        self.assertConsultasConstantes('/api/v1/categorias/pruebas/productos/', 2)
+
+
+class PaginacionProductosTests(APITestCase):
+
+    def test_cursor_recorre_todo_sin_count(self):
+        vistos = []
+        url = '/api/v1/productos/?page_size=7&orden=-precio'
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                data = self.client.get(url).json()
+                vistos.extend(p['id'] for p in data['results'])
+                url = data['next']
+
+        esperados = list(
+            Producto.objects.filter(disponible=True)
+            .order_by('-precio', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+        self.assertFalse(any('COUNT(' in q['sql'] for q in ctx.captured_queries))
+
+    def test_empates_de_precio_sin_offset(self):
+        categoria = Categoria.objects.first()
+        crear_productos(categoria, 30, prefijo='empate')
+        Producto.objects.filter(slug__startswith='empate-').update(precio=Decimal('77.00'))
+        esperados = list(
+            Producto.objects.filter(disponible=True)
+            .order_by('precio', 'id')
+            .values_list('id', flat=True)
+        )
+
+        vistos, paginas = [], []
+        url = '/api/v1/productos/?page_size=4&orden=precio'
+        with CaptureQueriesContext(connection) as ctx:
+            while url:
+                data = self.client.get(url).json()
+                paginas.append(data)
+                vistos.extend(p['id'] for p in data['results'])
+                url = data['next']
+        self.assertEqual(vistos, esperados)
+        self.assertFalse(any('OFFSET' in q['sql'].upper() for q in ctx.captured_queries))
+
+        # Hacia atrás desde la mitad del tramo empatado
+        mitad = paginas[len(paginas) // 2]
+        anterior = self.client.get(mitad['previous']).json()
+        indice = esperados.index(mitad['results'][0]['id'])
+        self.assertEqual([p['id'] for p in anterior['results']], esperados[indice - 4:indice])
+
+    def test_todos_devuelve_lista_plana(self):
+        data = self.client.get('/api/v1/productos/?todos=1').json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), Producto.objects.filter(disponible=True).count())
+
+
+class DisminuirStockLoteTests(APITestCase):
+    url = '/api/v1/productos/disminuir_stock_lote/'
+
+    def stock(self, slug):
+        return Producto.objects.get(slug=slug).stock
+
+    def test_descuenta_todas_las_lineas(self):
+        catan, risk = self.stock('catan'), self.stock('risk')
+        # Qué productos tienen stock fragmentado se cachea por proceso
+        stock_fragmentado.productos_fragmentados()
+        # UPDATE + SELECT (+ SAVEPOINT/RELEASE porque el test ya corre en
+        # una transacción), independiente del número de líneas
+        with self.assertNumQueries(4):
+            resp = self.client.post(self.url, {'items': [
+                {'slug': 'risk', 'cantidad': 2},
+                {'slug': 'catan', 'cantidad': 1},
+                {'slug': 'catan', 'cantidad': 3},
+            ]}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(self.stock('catan'), catan - 4)
+        self.assertEqual(self.stock('risk'), risk - 2)
+        # Slugs repetidos se agrupan y la respuesta va ordenada por slug
+        self.assertEqual(
+            [(l['slug'], l['cantidad'], l['stock']) for l in resp.json()['items']],
+            [('catan', 4, catan - 4), ('risk', 2, risk - 2)],
+        )
+
+    def test_todo_o_nada(self):
+        catan, gloomhaven = self.stock('catan'), self.stock('gloomhaven')
+        resp = self.client.post(self.url, {'items': [
+            {'slug': 'catan', 'cantidad': 1},
+            {'slug': 'gloomhaven', 'cantidad': gloomhaven + 1},
+            {'slug': 'no-existe', 'cantidad': 1},
+        ]}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        lineas = {l['slug']: l for l in resp.json()['items']}
+        self.assertTrue(lineas['catan']['ok'])
+        self.assertEqual(lineas['gloomhaven']['error'], "Stock insuficiente.")
+        self.assertEqual(lineas['no-existe']['error'], "Producto no encontrado.")
+        # Nada se descontó
+        self.assertEqual(self.stock('catan'), catan)
+        self.assertEqual(self.stock('gloomhaven'), gloomhaven)
+
+    def test_valida_cantidades(self):
+        resp = self.client.post(self.url, {'items': [{'slug': 'catan', 'cantidad': 0}]}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.post(self.url, {'items': []}, format='json')
+        self.assertEqual(resp.status_code, 400)
+
+    def test_disminuir_stock_individual(self):
+        catan = self.stock('catan')
+        resp = self.client.post('/api/v1/productos/catan/disminuir_stock/', {'cantidad': 2}, format='json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['stock'], catan - 2)
+        resp = self.client.post('/api/v1/productos/catan/disminuir_stock/', {'cantidad': catan}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.stock('catan'), catan - 2)
+
+
+class ReservasStockTests(APITestCase):
+    url = '/api/v1/reservas/'
+
+    def setUp(self):
+        super().setUp()
+        Producto.objects.filter(slug='catan').update(stock=5)
+
+    def reservar(self, carrito, cantidad, slug='catan'):
+        return self.client.post(self.url, {
+            'carrito': carrito, 'items': [{'slug': slug, 'cantidad': cantidad}],
+        }, format='json')
+
+    def catan(self):
+        return Producto.objects.values_list('stock', 'reservado').get(slug='catan')
+
+    def test_reserva_aparta_stock_para_otros_carritos(self):
+        resp = self.reservar('a', 3)
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual([(r['slug'], r['cantidad']) for r in resp.json()['items']], [('catan', 3)])
+        self.assertEqual(self.catan(), (5, 3))
+
+        # Solo quedan 2 vendibles: ni otra reserva ni una compra sin carrito pasan de ahí
+        resp = self.reservar('b', 3)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['items'][0]['stock'], 2)
+        resp = self.client.post('/api/v1/productos/disminuir_stock_lote/', {
+            'items': [{'slug': 'catan', 'cantidad': 3}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(self.reservar('b', 2).status_code, 201)
+        self.assertEqual(self.catan(), (5, 5))
+
+    def test_reservar_y_liberar_invalidan_el_catalogo(self):
+        url = '/api/v1/productos/catan/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reservar('a', 2)
+        resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual(resp.json()['stock_vendible'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{self.url}liberar/', {'carrito': 'a'}, format='json')
+        resp = self.client.get(url)
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual(resp.json()['stock_vendible'], 5)
+
+    def test_checkout_convierte_las_reservas(self):
+        self.reservar('a', 3)
+        self.reservar('b', 2)
+        resp = self.client.post('/api/v1/productos/disminuir_stock_lote/', {
+            'carrito': 'a', 'items': [{'slug': 'catan', 'cantidad': 3}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(self.catan(), (2, 2))
+        self.assertFalse(ReservaStock.objects.filter(carrito='a').exists())
+        # Las reservas de 'b' siguen cubiertas
+        self.assertEqual(self.client.get(self.url, {'carrito': 'b'}).json()['items'][0]['cantidad'], 2)
+
+    def test_liberar_y_barrer_vencidas(self):
+        self.reservar('a', 1)
+        self.reservar('a', 1, slug='risk')
+        self.reservar('b', 2)
+        reserva = ReservaStock.objects.get(carrito='a', producto__slug='catan')
+        self.assertEqual(self.client.delete(f'{self.url}{reserva.pk}/?carrito=b').status_code, 404)
+        self.assertEqual(self.client.delete(f'{self.url}{reserva.pk}/?carrito=a').status_code, 204)
+        self.assertEqual(self.catan(), (5, 2))
+
+        ReservaStock.objects.filter(carrito='b').update(expira_en=timezone.now())
+        salida = io.StringIO()
+        call_command('liberar_reservas', stdout=salida)
+        self.assertIn('1 reservas vencidas', salida.getvalue())
+        self.assertEqual(self.catan(), (5, 0))
+
+        resp = self.client.post(f'{self.url}liberar/', {'carrito': 'a'}, format='json')
+        self.assertEqual(resp.json(), {'liberadas': 1})
+        self.assertEqual(Producto.objects.get(slug='risk').reservado, 0)
+        self.assertEqual(reservas.liberar_vencidas(), 0)
+
+    def test_ajustar_sube_baja_y_expone_stock_vendible(self):
+        def ajustar(carrito, cantidad):
+            return self.client.post(f'{self.url}ajustar/', {
+                'carrito': carrito, 'slug': 'catan', 'cantidad': cantidad,
+            }, format='json')
+
+        self.reservar('b', 1)
+        self.assertEqual(ajustar('a', 3).status_code, 200)
+        self.assertEqual(ajustar('a', 2).status_code, 200)
+        self.assertEqual(self.catan(), (5, 3))
+        self.assertEqual(ReservaStock.objects.get(carrito='a').cantidad, 2)
+
+        # Subir de más no pasa y deja la reserva anterior
+        resp = ajustar('a', 5)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['items'][0]['stock'], 4)
+        self.assertEqual(self.catan(), (5, 3))
+        self.assertEqual(self.client.get('/api/v1/productos/catan/').json()['stock_vendible'], 2)
+
+        self.assertEqual(ajustar('a', 0).status_code, 200)
+        self.assertEqual(self.catan(), (5, 1))
+        self.assertFalse(ReservaStock.objects.filter(carrito='a').exists())
+
+
+class StockFragmentadoTests(APITestCase):
+    url = '/api/v1/productos/disminuir_stock_lote/'
+
+    def setUp(self):
+        super().setUp()
+        Producto.objects.filter(slug='catan').update(stock=20)
+        self.catan = stock_fragmentado.fragmentar(Producto.objects.get(slug='catan'), fragmentos=4)
+
+    def fragmentos(self):
+        return list(StockFragmento.objects.filter(producto=self.catan).order_by('indice').values_list('stock', flat=True))
+
+    def comprar(self, cantidad):
+        return self.client.post(self.url, {'items': [
+            {'slug': 'catan', 'cantidad': cantidad}, {'slug': 'risk', 'cantidad': 1},
+        ]}, format='json')
+
+    def test_compra_descuenta_de_los_fragmentos(self):
+        self.assertEqual(self.fragmentos(), [5, 5, 5, 5])
+        resp = self.comprar(2)
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(resp.json()['items'][0]['stock'], 18)
+        self.assertEqual(sum(self.fragmentos()), 18)
+
+        # Más de lo que tiene cualquier fragmento: se toma de varios
+        self.assertEqual(self.comprar(12).status_code, 200)
+        self.assertEqual(sum(self.fragmentos()), 6)
+        resp = self.comprar(7)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()['items'][0]['stock'], 6)
+
+        # La fila del producto no se tocó: el total lo refresca el rebalanceo
+        self.assertEqual(Producto.objects.get(slug='catan').stock, 20)
+        call_command('rebalancear_stock', stdout=io.StringIO())
+        self.assertEqual(Producto.objects.get(slug='catan').stock, 6)
+        self.assertEqual(self.fragmentos(), [2, 2, 1, 1])
+        self.assertEqual(self.client.get('/api/v1/productos/catan/').json()['stock'], 6)
+
+    def test_reponer_y_quitar_fragmentos(self):
+        resp = self.client.patch('/api/v1/productos/catan/', {'stock': 41}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(self.fragmentos(), [11, 10, 10, 10])
+
+        # No se reservan: se venden por orden de llegada
+        resp = self.client.post('/api/v1/reservas/', {
+            'carrito': 'a', 'items': [{'slug': 'catan', 'cantidad': 2}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()['items'], [])
+
+        call_command('fragmentar_stock', 'catan', quitar=True, stdout=io.StringIO())
+        self.assertEqual(Producto.objects.get(slug='catan').stock, 41)
+        self.assertEqual(self.fragmentos(), [])
+        self.assertEqual(self.comprar(1).status_code, 200)
+
+
+class CrearPedidoTests(APITestCase):
+    url = '/api/v1/pedidos/'
+
+    def payload(self, productos, cantidad=2):
+        items = [
+            {'producto': p.id, 'cantidad': cantidad, 'precio_unitario': str(p.precio)}
+            for p in productos
+        ]
+        total = sum(p.precio * cantidad for p in productos)
+        return {
+            'user_uid': 'uid-1',
+            'email': 'cliente@example.com',
+            'nombre_cliente': 'Cliente',
+            'direccion': 'Av. Siempre Viva 123',
+            'total': str(total),
+            'metodo_pago': 'Tarjeta de crédito',
+            'items': items,
+        }
+
+    def test_consultas_constantes(self):
+        productos = list(Producto.objects.order_by('id')[:50])
+        # SELECT productos + INSERT pedido + INSERT ítems en bloque
+        # + INSERT/UPDATE de cada resumen de ventas (3 tablas)
+        # + INSERT del trabajo de la factura
+        # (+ SAVEPOINT/RELEASE del atomic dentro del TestCase)
+        with self.assertNumQueries(12):
+            resp = self.client.post(self.url, self.payload(productos), format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual(len(resp.json()['items']), 50)
+        self.assertEqual(Pedido.objects.get().items.count(), 50)
+
+    def test_rechaza_precio_distinto(self):
+        catan = Producto.objects.get(slug='catan')
+        data = self.payload([catan])
+        data['items'][0]['precio_unitario'] = '1.00'
+        data['total'] = '2.00'
+        resp = self.client.post(self.url, data, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('precio_unitario', resp.json()['items'][0])
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_rechaza_total_incorrecto(self):
+        data = self.payload([Producto.objects.get(slug='catan')])
+        data['total'] = '0.01'
+        resp = self.client.post(self.url, data, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('total', resp.json())
+
+    def test_rechaza_producto_inexistente(self):
+        data = self.payload([Producto.objects.get(slug='catan')])
+        data['items'][0]['producto'] = 999999
+        resp = self.client.post(self.url, data, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(PedidoItem.objects.exists())
+
+
+class ColaTrabajosTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def tarea_que_falla(self):
+        def falla():
+            raise RuntimeError("servicio caído")
+        trabajos.tarea('prueba_falla')(falla)
+        self.addCleanup(trabajos.TAREAS.pop, 'prueba_falla')
+
+    def test_pedido_encola_factura_y_el_trabajador_la_genera(self):
+        catan = Producto.objects.get(slug='catan')
+        resp = self.client.post('/api/v1/pedidos/', {
+            'email': 'cliente@example.com',
+            'nombre_cliente': 'Cliente',
+            'total': str(catan.precio),
+            'metodo_pago': 'Efectivo',
+            'items': [{'producto': catan.id, 'cantidad': 1, 'precio_unitario': str(catan.precio)}],
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        pedido_id = resp.json()['id']
+        trabajo = Trabajo.objects.get()
+        self.assertEqual((trabajo.tipo, trabajo.argumentos), ('factura_pedido', {'pedido_id': pedido_id}))
+
+        url = f'/api/v1/pedidos/{pedido_id}/factura/'
+        self.assertEqual(self.client.get(url).status_code, 202)
+
+        salida = io.StringIO()
+        call_command('procesar_trabajos', una_vez=True, hilos=1, stdout=salida)
+        self.assertIn('1 trabajos procesados (0 con error)', salida.getvalue())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, Trabajo.HECHO)
+        self.assertEqual(trabajo.resultado, {'factura': f'facturas/FAC-{pedido_id:08d}.html'})
+
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        html = b''.join(resp.streaming_content).decode()
+        self.assertIn(f'FAC-{pedido_id:08d}', html)
+        self.assertIn(catan.nombre, html)
+
+    def test_reintenta_con_espera_y_marca_fallido(self):
+        self.tarea_que_falla()
+        trabajo = trabajos.encolar('prueba_falla', max_intentos=2)
+
+        with self.assertLogs('store.trabajos', 'WARNING'):
+            self.assertEqual(trabajos.procesar_pendientes(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), (Trabajo.PENDIENTE, 1))
+        self.assertIn('servicio caído', trabajo.ultimo_error)
+        self.assertGreater(trabajo.disponible_en, timezone.now())
+        # Todavía no toca
+        self.assertEqual(trabajos.procesar_pendientes(), 0)
+
+        Trabajo.objects.update(disponible_en=timezone.now())
+        with self.assertLogs('store.trabajos', 'ERROR'):
+            self.assertEqual(trabajos.procesar_pendientes(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), (Trabajo.FALLIDO, 2))
+        self.assertEqual(trabajos.estadisticas()[Trabajo.FALLIDO], 1)
+
+    def test_error_fuera_de_la_tarea_no_detiene_al_trabajador(self):
+        for i in range(2):
+            trabajos.encolar('factura_pedido', pedido_id=i)
+        salida = io.StringIO()
+        with mock.patch.object(trabajos, 'ejecutar', side_effect=RuntimeError("base caída")), \
+                self.assertLogs('store.trabajos', 'ERROR'):
+            call_command('procesar_trabajos', una_vez=True, hilos=1, stdout=salida)
+        self.assertIn('2 trabajos procesados (2 con error)', salida.getvalue())
+        # Quedan en curso hasta que los devuelva recuperar_abandonados()
+        self.assertEqual(trabajos.estadisticas()[Trabajo.EN_CURSO], 2)
+
+    def test_reclamar_no_repite_y_recupera_abandonados(self):
+        for i in range(3):
+            trabajos.encolar('factura_pedido', pedido_id=i)
+        primeros = trabajos.reclamar('a', 2)
+        resto = trabajos.reclamar('b', 5)
+        self.assertEqual(len(primeros), 2)
+        self.assertEqual(len(resto), 1)
+        self.assertFalse({t.pk for t in primeros} & {t.pk for t in resto})
+        self.assertEqual(trabajos.reclamar('c', 5), [])
+
+        # El trabajador 'a' murió: sus trabajos vuelven a la cola...
+        Trabajo.objects.filter(pk__in=[t.pk for t in primeros]).update(
+            bloqueado_en=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(trabajos.recuperar_abandonados(), 2)
+        retomado = trabajos.reclamar('c', 1)[0]
+        # ...y si revive, ya no escribe sobre lo que tomó otro
+        viejo = next(t for t in primeros if t.pk == retomado.pk)
+        with self.assertLogs('store.trabajos', 'WARNING'):
+            self.assertFalse(trabajos.ejecutar(viejo))
+        retomado.refresh_from_db()
+        self.assertEqual((retomado.estado, retomado.intentos), (Trabajo.EN_CURSO, 2))
+
+
+class ListaPedidosTests(APITestCase):
+    url = '/api/v1/pedidos/'
+
+    def crear_pedidos(self, cantidad, user_uid='uid-1', email='a@example.com'):
+        catan = Producto.objects.get(slug='catan')
+        for _ in range(cantidad):
+            pedido = Pedido.objects.create(
+                user_uid=user_uid, email=email, nombre_cliente='Cliente',
+                total=catan.precio * 2, metodo_pago='Tarjeta',
+            )
+            PedidoItem.objects.bulk_create([
+                PedidoItem(pedido=pedido, producto=catan, cantidad=1, precio_unitario=catan.precio),
+                PedidoItem(pedido=pedido, producto=catan, cantidad=1, precio_unitario=catan.precio),
+            ])
+
+    def test_consultas_constantes(self):
+        self.crear_pedidos(3)
+        # pedidos de la página + ítems prefetcheados
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        self.crear_pedidos(15)
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url).json()
+        self.assertEqual(len(data['results']), 18)
+        self.assertEqual(len(data['results'][0]['items']), 2)
+
+    def test_filtra_por_cliente_y_pagina(self):
+        self.crear_pedidos(5, user_uid='uid-1')
+        self.crear_pedidos(3, user_uid='uid-2', email='b@example.com')
+
+        vistos = []
+        url = self.url + '?user_uid=uid-1&page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            vistos.extend(p['id'] for p in data['results'])
+            url = data['next']
+        esperados = list(
+            Pedido.objects.filter(user_uid='uid-1')
+            .order_by('-creado_en', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(vistos, esperados)
+
+        data = self.client.get(self.url + '?email=b@example.com').json()
+        self.assertEqual(len(data['results']), 3)
+
+
+class CacheCatalogoTests(APITestCase):
+
+    def test_segunda_peticion_sin_consultas(self):
+        resp = self.client.get('/api/v1/productos/')
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/v1/productos/')
+        self.assertEqual(resp['X-Cache'], 'HIT')
+        # Otros parámetros → otra entrada
+        self.assertEqual(self.client.get('/api/v1/productos/?orden=-id')['X-Cache'], 'MISS')
+
+        self.assertEqual(self.client.get('/api/v1/catalogo/cache/').status_code, 404)
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(self.client.get('/api/v1/catalogo/cache/').status_code, 403)
+            stats = self.client.get('/api/v1/catalogo/cache/', HTTP_AUTHORIZATION='Bearer secreto').json()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_guardar_producto_invalida(self):
+        self.client.get('/api/v1/productos/catan/')
+        catan = Producto.objects.get(slug='catan')
+        catan.nombre = 'Catan (edición 2025)'
+        with self.captureOnCommitCallbacks(execute=True):
+            catan.save()
+        resp = self.client.get('/api/v1/productos/catan/')
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual(resp.json()['nombre'], 'Catan (edición 2025)')
+
+    def test_crear_categoria_invalida(self):
+        self.client.get('/api/v1/categorias/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Nueva', slug='nueva')
+        slugs = [c['slug'] for c in self.client.get('/api/v1/categorias/').json()]
+        self.assertIn('nueva', slugs)
+
+    def test_disminuir_stock_invalida(self):
+        stock = self.client.get('/api/v1/productos/catan/').json()['stock']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/productos/disminuir_stock_lote/',
+                             {'items': [{'slug': 'catan', 'cantidad': 1}]}, format='json')
+        self.assertEqual(self.client.get('/api/v1/productos/catan/').json()['stock'], stock - 1)
+
+    def test_cambio_en_otro_proceso_llega_por_la_base(self):
+        # La cache en memoria es de este proceso; la versión no
+        self.assertTrue(cache_catalogo.version_en_base())
+        primera = self.client.get('/api/v1/productos/catan/')
+        self.assertEqual(self.client.get('/api/v1/productos/catan/')['X-Cache'], 'HIT')
+
+        # Otro trabajador guarda un producto: solo sube la fila compartida
+        Producto.objects.filter(slug='catan').update(nombre='Catan (otro proceso)')
+        VersionCatalogo.objects.filter(pk=1).update(version=F('version') + 1)
+        # Hasta CATALOGO_VERSION_REFRESCO este proceso sigue con la suya
+        self.assertEqual(self.client.get('/api/v1/productos/catan/')['X-Cache'], 'HIT')
+
+        cache_catalogo.olvidar_version()  # pasa CATALOGO_VERSION_REFRESCO
+        resp = self.client.get('/api/v1/productos/catan/')
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual(resp.json()['nombre'], 'Catan (otro proceso)')
+        self.assertNotEqual(resp['ETag'], primera['ETag'])
+
+        # Y lo que cambia este proceso se ve aquí sin esperar
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Nueva', slug='nueva')
+        self.assertEqual(self.client.get('/api/v1/productos/catan/')['X-Cache'], 'MISS')
+
+
+class GetCondicionalTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Un cambio de hace unos segundos: su Last-Modified ya es estable
+        VersionCatalogo.objects.filter(pk=1).update(version=time.time_ns() - 5_000_000_000)
+        cache_catalogo.olvidar_version()
+
+    def test_if_none_match_devuelve_304_sin_consultas(self):
+        resp = self.client.get('/api/v1/productos/?todos=1')
+        etag = resp['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertIn('Last-Modified', resp)
+
+        with self.assertNumQueries(0):
+            resp = self.client.get('/api/v1/productos/?todos=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertEqual(resp['ETag'], etag)
+        self.assertEqual(resp.content, b'')
+
+    def test_etag_distinto_por_parametros(self):
+        a = self.client.get('/api/v1/categorias/')['ETag']
+        b = self.client.get('/api/v1/categorias/estrategia/')['ETag']
+        self.assertNotEqual(a, b)
+
+    def test_cambio_en_catalogo_cambia_etag(self):
+        etag = self.client.get('/api/v1/productos/catan/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/v1/productos/disminuir_stock_lote/',
+                             {'items': [{'slug': 'catan', 'cantidad': 1}]}, format='json')
+        resp = self.client.get('/api/v1/productos/catan/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp['ETag'], etag)
+
+    def test_if_modified_since(self):
+        resp = self.client.get('/api/v1/categorias/')
+        resp = self.client.get('/api/v1/categorias/', HTTP_IF_MODIFIED_SINCE=resp['Last-Modified'])
+        self.assertEqual(resp.status_code, 304)
+
+    def test_if_modified_since_no_confunde_cambios_del_mismo_segundo(self):
+        anterior = self.client.get('/api/v1/categorias/')['Last-Modified']
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(nombre='Nueva', slug='nueva')
+        # Recién cambiado: otro cambio en este segundo tendría la misma
+        # fecha, así que no se ofrece Last-Modified, solo el ETag
+        resp = self.client.get('/api/v1/categorias/', HTTP_IF_MODIFIED_SINCE=anterior)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('Last-Modified', resp)
+        # Un If-Modified-Since del mismo segundo que la versión no da 304
+        version = cache_catalogo.version_catalogo()
+        mismo_segundo = http_date(version // 1_000_000_000)
+        resp = self.client.get('/api/v1/categorias/', HTTP_IF_MODIFIED_SINCE=mismo_segundo)
+        self.assertEqual(resp.status_code, 200)
+
+    def test_stock_actualiza_marca_de_tiempo(self):
+        antes = Producto.objects.get(slug='catan').actualizado
+        self.client.post('/api/v1/productos/disminuir_stock_lote/',
+                         {'items': [{'slug': 'catan', 'cantidad': 1}]}, format='json')
+        self.assertGreater(Producto.objects.get(slug='catan').actualizado, antes)
+
+
+@override_settings(BUSQUEDA_INDICE_ARCHIVO=None)
+class BusquedaTests(APITestCase):
+    url = '/api/v1/productos/buscar/'
+
+    def setUp(self):
+        super().setUp()
+        busqueda.reiniciar()
+
+    def buscar(self, q):
+        return [p['slug'] for p in self.client.get(self.url, {'q': q}).json()['results']]
+
+    def test_tokenizacion(self):
+        self.assertEqual(busqueda.tokenizar("Pokémon TCG (Booster)"), ['pokemon', 'tcg', 'booster'])
+        self.assertEqual(busqueda.tokenizar("Juegos de los Jugadores"), ['juego', 'jugador'])
+
+    def test_sin_tildes_ni_mayusculas(self):
+        self.assertEqual(self.buscar('POKEMON')[0], 'pokemon-tcg-booster')
+        self.assertEqual(self.buscar('pokémon')[0], 'pokemon-tcg-booster')
+
+    def test_prefijo_y_ranking(self):
+        self.assertEqual(self.buscar('terra')[0], 'terraforming-mars')
+        resultados = self.buscar('D&D manual')
+        self.assertEqual(resultados[0], 'dd-monster-manual')
+        self.assertIn('dd-players-handbook', resultados)
+
+    def test_busqueda_no_consulta_la_bd_para_rankear(self):
+        self.buscar('catan')   # construye el índice
+        with self.assertNumQueries(1):  # solo traer los productos
+            self.buscar('catan')
+
+    def test_actualizacion_incremental(self):
+        self.buscar('catan')
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(
+                categoria=Categoria.objects.get(slug='estrategia'),
+                nombre='Ñandú Exprés', slug='nandu-expres', precio=Decimal('10.00'),
+            )
+        self.assertEqual(self.buscar('nandu'), ['nandu-expres'])
+
+        catan = Producto.objects.get(slug='catan')
+        catan.disponible = False
+        with self.captureOnCommitCallbacks(execute=True):
+            catan.save()
+        self.assertEqual(self.buscar('catan'), [])
+        self.assertNotIn('catan', busqueda.indice.terminos_doc.get(catan.pk, {}))
+
+    @override_settings(BUSQUEDA_SINCRONIZAR_CADA=0)
+    def test_puesta_al_dia_quita_borrados_de_otros_procesos(self):
+        self.buscar('catan')
+        # Sin ejecutar los on_commit, como si lo hiciera otro proceso
+        risk = Producto.objects.get(slug='risk').pk
+        Producto.objects.filter(pk=risk).delete()
+        Producto.objects.filter(slug='catan').update(disponible=False, actualizado=timezone.now())
+        self.assertIn(risk, busqueda.indice.ids())
+
+        # Solo lo cambiado: retirados + modificados, sin recorrer todos los ids
+        with self.assertNumQueries(2):
+            busqueda.obtener_indice()
+        self.assertNotIn(risk, busqueda.indice.ids())
+        self.assertEqual(self.buscar('catan'), [])
+        self.assertEqual(self.buscar('risk'), [])
+
+    def test_indice_de_archivo_viejo_se_reconstruye(self):
+        with override_settings(BUSQUEDA_RETIRADOS_DIAS=1):
+            self.assertTrue(busqueda._retirados_desde(timezone.now() - timedelta(hours=1)))
+            self.assertFalse(busqueda._retirados_desde(timezone.now() - timedelta(days=2)))
+            ProductoRetirado.objects.create(producto_id=1, retirado_en=timezone.now() - timedelta(days=2))
+            ProductoRetirado.objects.create(producto_id=2)
+            self.assertEqual(busqueda.purgar_retirados(), 1)
+
+    def test_q_obligatorio(self):
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+
+@override_settings(CATALOGO_CACHE_HABILITADO=False)
+class FiltrosFacetasTests(APITestCase):
+    url = '/api/v1/productos/'
+
+    def setUp(self):
+        super().setUp()
+        Producto.objects.filter(slug__in=['catan', 'risk']).update(es_nuevo=True)
+        Producto.objects.filter(slug='azul').update(stock=0, tiene_descuento=True)
+
+    def slugs(self, params):
+        data = self.client.get(self.url, {'page_size': 100, **params}).json()
+        return {p['slug'] for p in data['results']}
+
+    def test_filtros(self):
+        self.assertEqual(self.slugs({'es_nuevo': 'true'}), {'catan', 'risk'})
+        self.assertEqual(self.slugs({'en_stock': 'false'}), {'azul'})
+        self.assertEqual(
+            self.slugs({'categoria': 'estrategia', 'precio_min': '250', 'precio_max': '320'}),
+            {'terraforming-mars', 'scythe', 'root'},
+        )
+        self.assertEqual(len(self.slugs({'categoria': 'estrategia,familiares'})), 20)
+        self.assertEqual(self.client.get(self.url, {'precio_min': 'abc'}).status_code, 400)
+
+    def test_facetas_en_una_consulta(self):
+        params = {'categoria': 'estrategia', 'es_nuevo': 'true', 'facetas': '1'}
+        # listado + facetas
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url, params).json()
+        facetas = data['facetas']
+
+        # Disyuntivas: la faceta categoría ignora su propio filtro...
+        por_categoria = {c['slug']: c['count'] for c in facetas['categoria']}
+        self.assertEqual(por_categoria, {'estrategia': 2})
+        # ...y es_nuevo ignora el suyo pero respeta la categoría
+        self.assertEqual(facetas['es_nuevo'], {'true': 2, 'false': 8})
+        self.assertEqual(facetas['tiene_descuento'], {'true': 0, 'false': 2})
+        self.assertEqual(sum(r['count'] for r in facetas['precio']['rangos']), 2)
+        self.assertEqual((facetas['precio']['min'], facetas['precio']['max']), ('150.00', '180.00'))
+
+    def test_facetas_coinciden_con_filtrar(self):
+        facetas = self.client.get(self.url, {'facetas': '1', 'en_stock': 'true'}).json()['facetas']
+        for categoria in facetas['categoria']:
+            self.assertEqual(
+                categoria['count'],
+                len(self.slugs({'categoria': categoria['slug'], 'en_stock': 'true'})),
+            )
+        self.assertEqual(facetas['en_stock']['false'], 1)
+
+    @override_settings(CATALOGO_CACHE_HABILITADO=True)
+    def test_facetas_se_reutilizan_al_paginar(self):
+        data = self.client.get(self.url, {'facetas': '1', 'page_size': 5}).json()
+        # Siguiente página: solo la consulta del listado
+        with self.assertNumQueries(1):
+            siguiente = self.client.get(data['next']).json()
+        self.assertEqual(siguiente['facetas'], data['facetas'])
+
+
+class IndiceCategoriasTests(APITestCase):
+
+    def test_lista_liviana_con_conteo(self):
+        Producto.objects.filter(slug='catan').update(disponible=False)
+        data = self.client.get('/api/v1/categorias/').json()
+        estrategia = next(c for c in data if c['slug'] == 'estrategia')
+        self.assertEqual(set(estrategia), {'id', 'nombre', 'slug', 'total_productos'})
+        self.assertEqual(estrategia['total_productos'], 9)
+
+    def test_productos_paginados_de_categoria(self):
+        Producto.objects.filter(slug='catan').update(disponible=False)
+        vistos = []
+        url = '/api/v1/categorias/estrategia/productos/?page_size=4'
+        while url:
+            data = self.client.get(url).json()
+            vistos.extend(p['slug'] for p in data['results'])
+            url = data['next']
+        self.assertEqual(len(vistos), 9)
+        self.assertNotIn('catan', vistos)
+        self.assertEqual(self.client.get('/api/v1/categorias/no-existe/productos/').status_code, 404)
+
+
+class LecturaRapidaTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        Producto.objects.filter(slug='catan').update(imagen='productos/catan.jpg')
+        Producto.objects.filter(slug='risk').update(imagen='')
+
+    def obtener(self, url, rapida):
+        with override_settings(CATALOGO_LECTURA_RAPIDA=rapida):
+            return self.client.get(url).json()
+
+    def test_mismo_json_que_el_serializer(self):
+        for url in (
+            '/api/v1/productos/?todos=1',
+            '/api/v1/productos/?page_size=7&orden=-precio',
+            '/api/v1/categorias/',
+            '/api/v1/categorias/estrategia/productos/',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.obtener(url, True), self.obtener(url, False))
+
+    def test_imagen_absoluta_o_nula(self):
+        data = {p['slug']: p for p in self.obtener('/api/v1/productos/?todos=1', True)}
+        self.assertEqual(data['catan']['imagen'], 'http://testserver/media/productos/catan.jpg')
+        self.assertIsNone(data['risk']['imagen'])
+
+    @override_settings(MEDIA_BASE_URL='https://cdn.ejemplo.com/media')
+    def test_base_de_medios_configurable(self):
+        for rapida in (True, False):
+            data = {p['slug']: p for p in self.obtener('/api/v1/productos/?todos=1', rapida)}
+            self.assertEqual(data['catan']['imagen'], 'https://cdn.ejemplo.com/media/productos/catan.jpg')
+            self.assertIsNone(data['risk']['imagen'])
+        detalle = self.client.get('/api/v1/productos/catan/').json()
+        self.assertEqual(detalle['imagen'], 'https://cdn.ejemplo.com/media/productos/catan.jpg')
+
+
+class DosPorMinuto(AnonRateThrottle):
+    rate = '2/min'
+
+
+class UrlsAsincronas:
+    """urlconf con las vistas async del catálogo (como bajo backend/asgi.py)."""
+    urlpatterns = [path('api/v1/', include(con_lectura_asincrona(store_urls.router.urls)))]
+
+
+class LecturaAsincronaTests(APITestCase):
+
+    def obtener(self, url, asincrona, **extra):
+        urlconf = UrlsAsincronas if asincrona else 'backend.urls'
+        with override_settings(ROOT_URLCONF=urlconf):
+            return self.client.get(url, **extra)
+
+    def test_rutas_del_catalogo_son_async(self):
+        with override_settings(ROOT_URLCONF=UrlsAsincronas):
+            self.assertTrue(iscoroutinefunction(resolve('/api/v1/productos/').func))
+            self.assertTrue(iscoroutinefunction(resolve('/api/v1/categorias/estrategia/').func))
+            self.assertFalse(iscoroutinefunction(resolve('/api/v1/productos/buscar/').func))
+
+    @override_settings(CATALOGO_CACHE_HABILITADO=False)
+    def test_mismas_respuestas_que_drf(self):
+        for url in (
+            '/api/v1/productos/',
+            '/api/v1/productos/?todos=1',
+            '/api/v1/productos/?page_size=7&orden=-precio',
+            '/api/v1/productos/?categoria=estrategia&facetas=1',
+            '/api/v1/productos/catan/',
+            '/api/v1/categorias/',
+            '/api/v1/categorias/estrategia/',
+            # Errores y API navegable: los resuelve DRF
+            '/api/v1/productos/no-existe/',
+            '/api/v1/productos/?precio_min=abc',
+            '/api/v1/productos/?cursor=invalido',
+        ):
+            with self.subTest(url=url):
+                sincrona, asincrona = self.obtener(url, False), self.obtener(url, True)
+                self.assertEqual(asincrona.status_code, sincrona.status_code)
+                self.assertEqual(asincrona.json(), sincrona.json())
+                self.assertEqual(asincrona['Allow'], sincrona['Allow'])
+
+        html = self.obtener('/api/v1/productos/', True, HTTP_ACCEPT='text/html')
+        self.assertEqual(html['Content-Type'], 'text/html; charset=utf-8')
+
+    @override_settings(CATALOGO_CACHE_HABILITADO=False)
+    def test_paginas_siguientes(self):
+        url = '/api/v1/productos/?page_size=20&orden=precio'
+        slugs = []
+        while url:
+            data = self.obtener(url, True).json()
+            self.assertEqual(data, self.obtener(url, False).json())
+            slugs += [p['slug'] for p in data['results']]
+            url = data['next']
+        self.assertEqual(len(slugs), Producto.objects.filter(disponible=True).count())
+
+    def test_comparte_cache_y_etag_con_drf(self):
+        primera = self.obtener('/api/v1/productos/', True)
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        sincrona = self.obtener('/api/v1/productos/', False)
+        self.assertEqual(sincrona['X-Cache'], 'HIT')
+        self.assertEqual(sincrona['ETag'], primera['ETag'])
+
+        with self.assertNumQueries(0):
+            segunda = self.obtener('/api/v1/productos/', True)
+            condicional = self.obtener('/api/v1/productos/', True, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(condicional.status_code, 304)
+
+    def test_aplica_permisos_y_throttles_de_drf(self):
+        with mock.patch.object(ProductoViewSet, 'permission_classes', [IsAuthenticated]):
+            for url in ('/api/v1/productos/', '/api/v1/productos/catan/'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.obtener(url, True).status_code, self.obtener(url, False).status_code)
+                    self.assertEqual(self.obtener(url, True).status_code, 403)
+
+        django_cache.clear()
+        with mock.patch.object(ProductoViewSet, 'throttle_classes', [DosPorMinuto]):
+            # La segunda sale de la cache del catálogo y aun así cuenta
+            self.assertEqual(self.obtener('/api/v1/productos/', True).status_code, 200)
+            self.assertEqual(self.obtener('/api/v1/productos/', True)['X-Cache'], 'HIT')
+            self.assertEqual(self.obtener('/api/v1/productos/', True).status_code, 429)
+
+    @override_settings(CATALOGO_CACHE_HABILITADO=False)
+    def test_solo_delega_lo_previsto(self):
+        with override_settings(CATALOGO_LECTURA_RAPIDA=False):
+            self.assertEqual(self.obtener('/api/v1/productos/', True).json(),
+                             self.obtener('/api/v1/productos/', False).json())
+        # Un error de programación no se esconde detrás de la vista de DRF
+        with mock.patch.object(ProductoViewSet, 'convertir_filas', side_effect=TypeError("bug")):
+            with self.assertRaisesMessage(TypeError, "bug"):
+                self.obtener('/api/v1/productos/', True)
+
+    def test_escrituras_siguen_por_drf(self):
+        with override_settings(ROOT_URLCONF=UrlsAsincronas):
+            response = self.client.patch('/api/v1/productos/catan/', {'stock': 3}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get('/api/v1/productos/catan/').json()['stock'], 3)
+
+
+@override_settings(IMAGENES_EN_SEGUNDO_PLANO=False, IMAGENES_ANCHOS=(160, 320, 640))
+class VariantesImagenTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def subir(self, slug, tamano=(800, 600), modo='RGB'):
+        buffer = io.BytesIO()
+        Image.new(modo, tamano, 'teal').save(buffer, format='PNG')
+        archivo = SimpleUploadedFile('foto.png', buffer.getvalue(), content_type='image/png')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/v1/productos/{slug}/', {'imagen': archivo}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return self.client.get(f'/api/v1/productos/{slug}/').json()
+
+    def test_subida_genera_miniaturas_y_webp(self):
+        data = self.subir('catan')
+        variantes = data['imagen_variantes']
+        self.assertEqual(set(variantes), {'webp', 'jpeg'})
+        self.assertEqual(set(variantes['webp']), {'160', '320', '640'})
+        self.assertTrue(variantes['webp']['320'].startswith('http://testserver/media/productos/variantes/'))
+
+        rutas = Producto.objects.get(slug='catan').imagen_variantes
+        with Image.open(os.path.join(self.media, rutas['webp']['640'])) as img:
+            self.assertEqual((img.format, img.size), ('WEBP', (640, 480)))
+
+    def test_no_amplia_y_respeta_transparencia(self):
+        variantes = self.subir('azul', tamano=(200, 100), modo='RGBA')['imagen_variantes']
+        self.assertEqual(set(variantes), {'webp', 'png'})
+        rutas = Producto.objects.get(slug='azul').imagen_variantes
+        with Image.open(os.path.join(self.media, rutas['png']['640'])) as img:
+            self.assertEqual(img.size, (200, 100))
+
+    def test_originales_con_el_mismo_nombre_no_comparten_variantes(self):
+        rutas = []
+        for nombre in ('productos/catan.jpg', 'productos/catan.png', 'productos/otra/catan.jpg'):
+            buffer = io.BytesIO()
+            Image.new('RGB', (300, 200), 'teal').save(buffer, format='PNG')
+            default_storage.save(nombre, ContentFile(buffer.getvalue()))
+            rutas.append(imagenes.generar_variantes(nombre)['webp']['160'])
+        self.assertEqual(len(set(rutas)), 3)
+        self.assertTrue(all(default_storage.exists(ruta) for ruta in rutas))
+
+    def test_variantes_desactualizadas_no_se_publican(self):
+        self.subir('catan')
+        Producto.objects.filter(slug='catan').update(imagen='productos/otra.jpg')
+        for rapida in (True, False):
+            with override_settings(CATALOGO_LECTURA_RAPIDA=rapida):
+                data = {p['slug']: p for p in self.client.get('/api/v1/productos/?todos=1').json()}
+            self.assertEqual(data['catan']['imagen_variantes'], {})
+
+
+class _ServidorImagenes(BaseHTTPRequestHandler):
+    """Sirve /<slug>.png; /fallo-* responde 503 la primera vez."""
+    pedidos = []
+
+    def do_GET(self):
+        self.pedidos.append(self.path)
+        if self.path.startswith('/fallo-') and self.pedidos.count(self.path) == 1:
+            self.send_response(503)
+            self.end_headers()
+            return
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 40), 'navy').save(buffer, format='PNG')
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(buffer.getvalue())))
+        self.end_headers()
+        self.wfile.write(buffer.getvalue())
+
+    def log_message(self, *args):
+        pass
+
+
+class CargarImagenesTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajuste = override_settings(MEDIA_ROOT=self.media)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        _ServidorImagenes.pedidos = []
+        servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServidorImagenes)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        self.base = f'http://127.0.0.1:{servidor.server_port}'
+
+    def cargar(self, *slugs, **opciones):
+        call_command(
+            'cargar_imagenes_productos', slugs=list(slugs), url=self.base + '/{slug}.png',
+            espera=0, stdout=io.StringIO(), **opciones,
+        )
+
+    def test_descarga_asigna_y_reanuda(self):
+        slugs = ('catan', 'risk', 'azul')
+        with self.assertNumQueries(4):  # lectura + SAVEPOINT + UPDATE + RELEASE
+            self.cargar(*slugs)
+        self.assertEqual(len(_ServidorImagenes.pedidos), 3)
+        for slug in slugs:
+            self.assertEqual(Producto.objects.get(slug=slug).imagen.name, f'productos/{slug}.png')
+            self.assertTrue(os.path.exists(os.path.join(self.media, 'productos', f'{slug}.png')))
+
+        # Segunda pasada: nada que bajar
+        self.cargar(*slugs)
+        self.assertEqual(len(_ServidorImagenes.pedidos), 3)
+
+        # Un archivo dañado se vuelve a descargar
+        with open(os.path.join(self.media, 'productos', 'risk.png'), 'wb') as f:
+            f.write(b'roto')
+        self.cargar(*slugs)
+        self.assertEqual(_ServidorImagenes.pedidos[3:], ['/risk.png'])
+
+    def test_reintenta_y_lee_fuentes_de_archivo(self):
+        fuentes = os.path.join(self.media, 'fuentes.csv')
+        with open(fuentes, 'w') as f:
+            f.write(f'slug,url\nscythe,{self.base}/fallo-scythe.png\nno-existe,{self.base}/x.png\n')
+        call_command('cargar_imagenes_productos', archivo=fuentes, espera=0, stdout=io.StringIO())
+        self.assertEqual(_ServidorImagenes.pedidos, ['/fallo-scythe.png', '/fallo-scythe.png'])
+        self.assertEqual(Producto.objects.get(slug='scythe').imagen.name, 'productos/scythe.png')
+
+
+class ImportarExportarCatalogoTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.carpeta, ignore_errors=True)
+
+    def ruta(self, nombre):
+        return os.path.join(self.carpeta, nombre)
+
+    def test_exportar_e_importar_ida_y_vuelta(self):
+        for formato in ('csv', 'jsonl'):
+            with self.subTest(formato=formato):
+                ruta = self.ruta(f'catalogo.{formato}')
+                call_command('exportar_catalogo', ruta, stdout=io.StringIO())
+                antes = list(Producto.objects.order_by('id').values_list('slug', 'precio', 'stock', 'categoria_id'))
+                Producto.objects.update(stock=0)
+                call_command('importar_catalogo', ruta, stdout=io.StringIO(), stderr=io.StringIO())
+                despues = list(Producto.objects.order_by('id').values_list('slug', 'precio', 'stock', 'categoria_id'))
+                self.assertEqual(despues, antes)
+
+    def test_upsert_por_slug_en_lotes(self):
+        ruta = self.ruta('nuevos.jsonl')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('{"slug": "catan", "nombre": "Catan 2", "categoria": "estrategia", "precio": "99.5", "stock": 7}\n')
+            for i in range(5):
+                f.write(f'{{"slug": "nuevo-{i}", "nombre": "Nuevo {i}", "categoria": "novedades", '
+                        f'"categoria_nombre": "Novedades", "precio": 10, "es_nuevo": true}}\n')
+            f.write('{"slug": "malo", "nombre": "Malo", "categoria": "estrategia", "precio": "abc"}\n')
+        errores = io.StringIO()
+        call_command('importar_catalogo', ruta, lote=2, stdout=io.StringIO(), stderr=errores)
+
+        catan = Producto.objects.get(slug='catan')
+        self.assertEqual((catan.nombre, catan.precio, catan.stock), ('Catan 2', Decimal('99.50'), 7))
+        novedades = Categoria.objects.get(slug='novedades')
+        self.assertEqual(novedades.nombre, 'Novedades')
+        self.assertEqual(novedades.productos.filter(es_nuevo=True).count(), 5)
+        self.assertFalse(Producto.objects.filter(slug='malo').exists())
+        self.assertIn('línea 7: precio', errores.getvalue())
+
+    def test_respeta_reservas_y_reparte_stock_fragmentado(self):
+        Producto.objects.filter(slug__in=['catan', 'risk']).update(stock=10)
+        reservas.reservar('a', [{'slug': 'catan', 'cantidad': 4}])
+        stock_fragmentado.fragmentar(Producto.objects.get(slug='risk'), 4)
+
+        ruta = self.ruta('reposicion.jsonl')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('{"slug": "catan", "nombre": "Catan", "categoria": "estrategia", "precio": 10, "stock": 3}\n')
+            f.write('{"slug": "risk", "nombre": "Risk", "categoria": "estrategia", "precio": 10, "stock": 42}\n')
+        errores = io.StringIO()
+        call_command('importar_catalogo', ruta, stdout=io.StringIO(), stderr=errores)
+
+        # No se puede dejar menos stock que lo reservado
+        self.assertIn('línea 1: stock: 3 es menor que lo reservado', errores.getvalue())
+        self.assertEqual(Producto.objects.values_list('stock', 'reservado').get(slug='catan'), (10, 4))
+        # La reposición llega a los fragmentos y el rebalanceo no la pisa
+        risk = Producto.objects.get(slug='risk')
+        self.assertEqual(stock_fragmentado.stock_total([risk.pk]), {risk.pk: 42})
+        stock_fragmentado.rebalancear_todos()
+        self.assertEqual(Producto.objects.get(slug='risk').stock, 42)
+
+
+class ExportarPedidosTests(APITestCase):
+    url = '/api/v1/pedidos/exportar/'
+
+    def setUp(self):
+        super().setUp()
+        catan, risk = Producto.objects.get(slug='catan'), Producto.objects.get(slug='risk')
+        # Un pedido por día del 1 al 5 de marzo (hora de Lima)
+        for dia in range(1, 6):
+            pedido = Pedido.objects.create(
+                email=f'c{dia}@example.com', nombre_cliente='Cliente, "Uno"',
+                total=catan.precio + risk.precio * 2, metodo_pago='Tarjeta',
+            )
+            PedidoItem.objects.bulk_create([
+                PedidoItem(pedido=pedido, producto=catan, cantidad=1, precio_unitario=catan.precio),
+                PedidoItem(pedido=pedido, producto=risk, cantidad=2, precio_unitario=risk.precio),
+            ])
+            Pedido.objects.filter(pk=pedido.pk).update(
+                creado_en=timezone.make_aware(datetime(2026, 3, dia, 23, 30))
+            )
+
+    def leer(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_por_item_en_el_rango(self):
+        response = self.client.get(self.url, {'desde': '2026-03-02', 'hasta': '2026-03-04'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('pedidos_2026-03-02_2026-03-04.csv', response['Content-Disposition'])
+        filas = list(csv.DictReader(io.StringIO(self.leer(response))))
+        self.assertEqual(len(filas), 6)
+        self.assertEqual({f['email'] for f in filas}, {'c2@example.com', 'c3@example.com', 'c4@example.com'})
+        self.assertEqual(filas[0]['nombre_cliente'], 'Cliente, "Uno"')
+        risk = next(f for f in filas if f['producto_slug'] == 'risk')
+        self.assertEqual(Decimal(risk['subtotal']), Decimal(risk['precio_unitario']) * 2)
+
+    def test_ndjson_por_bloques_con_consultas_acotadas(self):
+        with self.assertNumQueries(6):  # 3 bloques de 2 pedidos: pedidos + ítems
+            lineas = list(exportacion.exportar('ndjson', lote=2))
+        pedidos = [json.loads(l) for l in ''.join(lineas).splitlines()]
+        self.assertEqual([p['email'] for p in pedidos], [f'c{d}@example.com' for d in range(1, 6)])
+        self.assertEqual(len(pedidos[0]['items']), 2)
+        self.assertTrue(pedidos[0]['creado_en'].startswith('2026-03-01T23:30:00'))
+
+    async def test_bajo_asgi_el_streaming_es_asincrono(self):
+        # Un iterador síncrono se consumiría entero antes de enviar nada
+        response = await self.async_client.get(self.url, {'formato': 'ndjson'})
+        self.assertTrue(response.is_async)
+        cuerpo = b''.join([bloque async for bloque in response.streaming_content]).decode('utf-8')
+        self.assertEqual(len(cuerpo.splitlines()), 5)
+
+    def test_rango_invalido(self):
+        response = self.client.get(self.url, {'desde': '2026-03-05', 'hasta': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'formato': 'xml'}).status_code, 400)
+
+    def test_comando(self):
+        salida = os.path.join(tempfile.mkdtemp(), 'pedidos.ndjson')
+        self.addCleanup(shutil.rmtree, os.path.dirname(salida))
+        call_command('exportar_pedidos', desde='2026-03-05', formato='ndjson', salida=salida, stdout=io.StringIO())
+        with open(salida, encoding='utf-8') as f:
+            self.assertEqual([json.loads(l)['email'] for l in f], ['c5@example.com'])
+
+
+class ResumenVentasTests(APITestCase):
+    url = '/api/v1/analitica/ventas/'
+
+    def comprar(self, *lineas):
+        items = [
+            {'producto': p.id, 'cantidad': cantidad, 'precio_unitario': str(p.precio)}
+            for p, cantidad in lineas
+        ]
+        total = sum(p.precio * cantidad for p, cantidad in lineas)
+        resp = self.client.post('/api/v1/pedidos/', {
+            'email': 'c@example.com', 'nombre_cliente': 'Cliente', 'total': str(total),
+            'metodo_pago': 'Tarjeta', 'items': items,
+        }, format='json')
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.json()['id']
+
+    def resumenes(self):
+        return [
+            sorted(modelo.objects.values_list(*campos, 'pedidos', 'unidades', 'ingresos'))
+            for modelo, campos in (
+                (VentaDiaria, ('fecha',)),
+                (VentaDiariaCategoria, ('fecha', 'categoria_id')),
+                (VentaDiariaProducto, ('fecha', 'producto_id')),
+            )
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.catan = Producto.objects.get(slug='catan')
+        self.risk = Producto.objects.get(slug='risk')
+        self.uno = Producto.objects.get(slug='uno')
+        self.comprar((self.catan, 2), (self.uno, 1))
+        self.comprar((self.catan, 1), (self.risk, 3))
+        self.ultimo = self.comprar((self.uno, 4))
+
+    def test_analitica_lee_los_resumenes(self):
+        with self.assertNumQueries(4):
+            data = self.client.get(self.url).json()
+        ingresos = self.catan.precio * 3 + self.risk.precio * 3 + self.uno.precio * 5
+        self.assertEqual(data['totales'], {'pedidos': 3, 'unidades': 11, 'ingresos': f'{ingresos:.2f}'})
+        self.assertEqual(len(data['serie']), 1)
+
+        productos = {p['slug']: p for p in data['productos']}
+        self.assertEqual((productos['catan']['pedidos'], productos['catan']['unidades']), (2, 3))
+        estrategia = next(c for c in data['categorias'] if c['slug'] == self.catan.categoria.slug)
+        self.assertEqual(estrategia['pedidos'], 2)
+
+    def test_borrar_pedido_resta_y_reconstruir_coincide(self):
+        self.client.delete(f'/api/v1/pedidos/{self.ultimo}/')
+        self.assertEqual(self.client.get(self.url).json()['totales']['pedidos'], 2)
+
+        incremental = self.resumenes()
+        call_command('reconstruir_ventas', stdout=io.StringIO())
+        reconstruido = self.resumenes()
+        # El borrado deja filas en cero que la reconstrucción no crea
+        incremental = [[fila for fila in tabla if fila[-3]] for tabla in incremental]
+        self.assertEqual(reconstruido, incremental)
+
+    def test_recategorizar_y_borrar_resta_de_la_categoria_de_la_venta(self):
+        original = self.uno.categoria_id
+        otra = Categoria.objects.exclude(pk=original).first()
+        antes = VentaDiariaCategoria.objects.get(categoria=original).unidades
+        self.uno.categoria = otra
+        self.uno.save()
+
+        self.client.delete(f'/api/v1/pedidos/{self.ultimo}/')
+        # Las 4 unidades salen de donde se sumaron; la otra categoría no
+        # queda en negativo
+        self.assertEqual(
+            VentaDiariaCategoria.objects.get(categoria=original).unidades, antes - 4
+        )
+        self.assertFalse(VentaDiariaCategoria.objects.filter(categoria=otra, unidades__lt=0).exists())
+
+        incremental = [[fila for fila in tabla if fila[-3]] for tabla in self.resumenes()]
+        call_command('reconstruir_ventas', stdout=io.StringIO())
+        self.assertEqual(self.resumenes(), incremental)
+
+    def test_pedido_creado_no_cambia_items_ni_total(self):
+        url = f'/api/v1/pedidos/{self.ultimo}/'
+        resp = self.client.patch(url, {'total': '1.00'}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn('total', resp.json())
+        resp = self.client.patch(url, {'items': [{'producto': self.catan.id, 'cantidad': 9,
+                                                   'precio_unitario': str(self.catan.precio)}]}, format='json')
+        self.assertEqual(resp.status_code, 400)
+        # Los datos del cliente sí
+        resp = self.client.patch(url, {'direccion': 'Otra calle 2'}, format='json')
+        self.assertEqual(resp.status_code, 200, resp.content)
+        self.assertEqual(Pedido.objects.get(pk=self.ultimo).direccion, 'Otra calle 2')
+
+    def test_borrar_desde_el_admin_resta_de_los_resumenes(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'a@example.com', 'clave'))
+        pedidos = list(Pedido.objects.order_by('id').values_list('id', flat=True))
+        # Los ítems se ven pero no se editan
+        resp = self.client.get(f'/admin/store/pedido/{pedidos[0]}/change/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn('items-0-cantidad', resp.content.decode())
+        resp = self.client.post('/admin/store/pedido/', {
+            'action': 'delete_selected', '_selected_action': pedidos[:2], 'post': 'yes',
+        })
+        self.assertEqual(resp.status_code, 302)
+        resp = self.client.post(f'/admin/store/pedido/{pedidos[2]}/delete/', {'post': 'yes'})
+        self.assertEqual(resp.status_code, 302)
+        self.assertFalse(Pedido.objects.exists())
+
+        for tabla in self.resumenes():
+            self.assertTrue(all(fila[-3:] == (0, 0, 0) for fila in tabla), tabla)
+
+    def test_agrupar_por_mes_y_parametros(self):
+        data = self.client.get(self.url, {'agrupar': 'mes', 'limite': 1}).json()
+        self.assertEqual(len(data['serie']), 1)
+        self.assertEqual(len(data['productos']), 1)
+        self.assertEqual(self.client.get(self.url, {'agrupar': 'anio'}).status_code, 400)
+
+
+class ExplicarConsultasTests(APITestCase):
+
+    def test_ningun_endpoint_hace_scan_completo(self):
+        salida = io.StringIO()
+        call_command('explicar_consultas', fallar=True, stdout=salida)
+        self.assertIn('0 consultas con scan completo', salida.getvalue())
+
+
+class DatosSinteticosTests(APITestCase):
+
+    def generar(self, pedidos, **opciones):
+        call_command(
+            'generar_datos_sinteticos', productos=30, categorias=3, pedidos=pedidos,
+            clientes=5, dias=10, hasta='2024-03-10', prefijo='t', stdout=io.StringIO(), **opciones
+        )
+        return list(
+            Pedido.objects.filter(email__startswith='t-cliente-').order_by('id')
+            .values_list('user_uid', 'total', 'metodo_pago', 'creado_en')
+        )
+
+    def test_generacion_determinista_e_incremental(self):
+        self.generar(25)
+        por_etapas = self.generar(40)
+        call_command('generar_datos_sinteticos', prefijo='t', borrar=True, stdout=io.StringIO())
+        self.assertFalse(Producto.objects.filter(slug__startswith='t-producto-').exists())
+        self.assertEqual(self.generar(40), por_etapas)
+
+        pedidos = Pedido.objects.filter(email__startswith='t-cliente-').prefetch_related('items')
+        for pedido in pedidos:
+            self.assertEqual(pedido.total, sum(i.subtotal() for i in pedido.items.all()))
+            self.assertEqual(pedido.creado_en.year, 2024)
+        # Los resúmenes de ventas quedan al día
+        self.assertEqual(sum(VentaDiaria.objects.values_list('pedidos', flat=True)), 40)
+
+
+class ConexionFalsa:
+    def __init__(self):
+        self.viva = True
+        self.cerrada = False
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(SimpleTestCase):
+
+    def setUp(self):
+        self.ahora = 0.0
+        self.creadas = []
+
+    def pool(self, **opciones):
+        def crear():
+            self.creadas.append(ConexionFalsa())
+            return self.creadas[-1]
+
+        opciones.setdefault('verificar_despues', 1.0)
+        return pool_db.PoolConexiones(
+            crear=crear,
+            validar=lambda c: c.viva,
+            cerrar=lambda c: c.close(),
+            reloj=lambda: self.ahora,
+            **opciones,
+        )
+
+    def test_reutiliza_la_conexion_devuelta(self):
+        pool = self.pool()
+        conexion, nueva = pool.obtener()
+        self.assertTrue(nueva)
+        pool.devolver(conexion)
+        self.assertEqual(pool.obtener(), (conexion, False))
+        metricas = pool.metricas()
+        self.assertEqual((metricas['conexiones_creadas'], metricas['en_uso'], metricas['libres']), (1, 1, 0))
+
+    def test_verifica_ociosas_y_descarta_viejas(self):
+        pool = self.pool(max_edad=100)
+        muerta, _ = pool.obtener()
+        pool.devolver(muerta)
+        muerta.viva = False
+        self.ahora = 5   # ociosa más de verificar_despues → se verifica
+        conexion, nueva = pool.obtener()
+        self.assertTrue(nueva)
+        self.assertTrue(muerta.cerrada)
+        self.assertEqual(pool.metricas()['verificaciones_fallidas'], 1)
+
+        pool.devolver(conexion)
+        self.ahora = 200
+        self.assertIsNot(pool.obtener()[0], conexion)
+        self.assertTrue(conexion.cerrada)
+
+    def test_no_reutilizable_se_cierra(self):
+        pool = self.pool()
+        conexion, _ = pool.obtener()
+        pool.devolver(conexion, reutilizable=False)
+        self.assertTrue(conexion.cerrada)
+        self.assertEqual(pool.metricas()['libres'], 0)
+
+    def test_agotado_tras_esperar(self):
+        pool = self.pool(tamano=1, espera=0.05)
+        pool.reloj = time.monotonic
+        pool.obtener()
+        with self.assertRaises(pool_db.PoolAgotado):
+            pool.obtener()
+        metricas = pool.metricas()
+        self.assertEqual((metricas['esperas'], metricas['agotado']), (1, 1))
+
+    def test_espera_a_que_otro_hilo_devuelva(self):
+        pool = self.pool(tamano=1, espera=5)
+        pool.reloj = time.monotonic
+        conexion, _ = pool.obtener()
+        threading.Timer(0.05, pool.devolver, args=(conexion,)).start()
+        self.assertIs(pool.obtener()[0], conexion)
+        self.assertEqual(pool.metricas()['esperas'], 1)
+
+    def test_tras_fork_no_reutiliza_las_del_padre(self):
+        pool = self.pool()
+        conexion, _ = pool.obtener()
+        pool.devolver(conexion)
+        pool._pid = -1   # como si este proceso fuera el hijo
+        otra, nueva = pool.obtener()
+        self.assertTrue(nueva)
+        self.assertIsNot(otra, conexion)
+        self.assertFalse(conexion.cerrada)
+
+
+class MotorConPoolTests(SimpleTestCase):
+    """backend.db.sqlite3 contra un archivo temporal (el de MySQL es igual)."""
+
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+        self.conexiones = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.dummy'},
+            'pool_test': {
+                'ENGINE': 'backend.db.sqlite3',
+                'NAME': os.path.join(carpeta, 'pool.sqlite3'),
+                'POOL': {'TAMANO': 2, 'VERIFICAR_DESPUES': 0},
+            },
+        })
+        self.addCleanup(self.conexiones.close_all)
+        self.addCleanup(pool_db._pools.pop, 'pool_test', None)
+
+    def consultar(self):
+        conexion = self.conexiones['pool_test']
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            resultado = cursor.fetchone()[0]
+        conexion.close()
+        return resultado
+
+    def test_cerrar_devuelve_al_pool_y_se_reutiliza(self):
+        for _ in range(3):
+            self.assertEqual(self.consultar(), 1)
+        hilo = threading.Thread(target=self.consultar)
+        hilo.start()
+        hilo.join()
+
+        metricas = pool_db.metricas_pools()['pool_test']
+        self.assertEqual(metricas['conexiones_creadas'], 1)
+        self.assertEqual((metricas['en_uso'], metricas['libres']), (0, 1))
+
+    def test_transaccion_abierta_se_revierte_al_devolver(self):
+        conexion = self.conexiones['pool_test']
+        with conexion.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x INTEGER)')
+        conexion.set_autocommit(False)
+        with conexion.cursor() as cursor:
+            cursor.execute('INSERT INTO t VALUES (1)')
+        conexion.close()
+
+        conexion = self.conexiones['pool_test']
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM t')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertTrue(conexion.get_autocommit())
+        conexion.close()
+
+    def test_endpoint_de_metricas(self):
+        self.consultar()
+        self.assertEqual(self.client.get('/api/v1/sistema/db/').status_code, 404)
+        with override_settings(METRICAS_SIN_TOKEN=True):
+            response = self.client.get('/api/v1/sistema/db/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['pool_test']['libres'], 1)
+
+
+class MetricasTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        metricas.registro.reiniciar()
+
+    def serie(self, ruta, metodo='GET'):
+        return metricas.registro.copia()[(ruta, metodo)]
+
+    def test_nombre_por_ruta_y_accion(self):
+        catan = Producto.objects.get(slug='catan')
+        self.client.get('/api/v1/productos/')
+        self.client.post('/api/v1/productos/catan/disminuir_stock/', {'cantidad': 1}, format='json')
+        self.client.post('/api/v1/pedidos/', {
+            'email': 'm@example.com', 'user_uid': 'm', 'nombre_cliente': 'M', 'metodo_pago': 'Tarjeta',
+            'total': str(catan.precio),
+            'items': [{'producto': catan.id, 'cantidad': 1, 'precio_unitario': str(catan.precio)}],
+        }, format='json')
+        self.client.get('/api/v1/no-existe/')
+
+        self.assertEqual(
+            set(metricas.registro.copia()),
+            {('producto-list', 'GET'), ('producto-disminuir-stock', 'POST'),
+             ('pedido-create', 'POST'), ('sin-ruta', 'GET')},
+        )
+        self.assertEqual(self.serie('pedido-create', 'POST')[6], {201: 1})
+
+    @override_settings(CATALOGO_CACHE_HABILITADO=False)
+    def test_cuenta_consultas_y_bytes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/api/v1/categorias/estrategia/')
+        latencias, _, _, total_consultas, sql_segundos, total_bytes, _ = self.serie('categoria-retrieve')
+        self.assertEqual(sum(latencias), 1)
+        self.assertEqual(total_consultas, len(consultas))
+        self.assertGreater(sql_segundos, 0)
+        self.assertEqual(total_bytes, len(response.content))
+
+    @override_settings(METRICAS_TOKEN='secreto')
+    def test_endpoint_prometheus(self):
+        self.client.get('/api/v1/productos/')
+        self.client.get('/api/v1/productos/')
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = response.content.decode()
+        self.assertIn('ludoteka_peticiones_total{ruta="producto-list",metodo="GET",estado="200"} 2', texto)
+        self.assertIn('ludoteka_peticion_segundos_bucket{ruta="producto-list",metodo="GET",le="+Inf"} 2', texto)
+        self.assertIn('ludoteka_peticion_segundos_count{ruta="producto-list",metodo="GET"} 2', texto)
+        self.assertIn('ludoteka_cache_catalogo_total{resultado="hit"} 1', texto)
+        # /metrics no se mide a sí mismo
+        self.assertNotIn('ruta="metricas"', texto)
+
+    def test_metrics_exige_token_o_permiso_explicito(self):
+        # Sin configurar no se expone
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(METRICAS_SIN_TOKEN=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with override_settings(METRICAS_TOKEN='secreto', METRICAS_SIN_TOKEN=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 403
+            )
+            self.assertEqual(
+                self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200
+            )
+
+    def test_file_response_conserva_sendfile(self):
+        # Directo al middleware: el cliente de pruebas envuelve siempre
+        # el contenido en streaming
+        archivo = io.BytesIO(b'<p>factura</p>')
+        response = FileResponse(archivo, content_type='text/html')
+        request = RequestFactory().get('/api/v1/pedidos/1/factura/')
+        request.resolver_match = resolve('/api/v1/pedidos/1/factura/')
+        self.assertIs(metricas.MetricasMiddleware(lambda request: response)(request), response)
+        # Sin envolver: el servidor puede usar wsgi.file_wrapper (sendfile)
+        self.assertIs(response.file_to_stream, archivo)
+        self.assertEqual(self.serie('pedido-factura')[5], len(b'<p>factura</p>'))
+
+    @override_settings(METRICAS_LENTAS_MS=0, CATALOGO_CACHE_HABILITADO=False)
+    def test_log_de_peticiones_lentas_con_sql(self):
+        with self.assertLogs('store.lentas', level='WARNING') as logs:
+            self.client.get('/api/v1/productos/catan/')
+        self.assertIn('GET /api/v1/productos/catan/ 200 (producto-retrieve)', logs.output[0])
+        self.assertIn('FROM "store_producto"', logs.output[0])
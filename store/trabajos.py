@@ -0,0 +1,167 @@
+# store/trabajos.py
+#
+# Cola de trabajos en la misma base de datos (modelo Trabajo).
+#
+# encolar() inserta la fila dentro de la transacción de quien la llama:
+# si el pedido se revierte, su trabajo también, y si confirma, el
+# trabajo ya está en la cola (no se pierde aunque el proceso muera justo
+# después de responder).
+#
+# `manage.py procesar_trabajos` los toma y ejecuta en un pool de hilos
+# (y opcionalmente varios procesos). Para tomar un trabajo:
+#   - MySQL 8 / PostgreSQL: SELECT ... FOR UPDATE SKIP LOCKED; varios
+#     trabajadores leen la cola a la vez sin esperarse ni repetir filas.
+#   - SQLite: un único UPDATE ... WHERE id IN (SELECT ... LIMIT n) que
+#     marca las filas con un token del trabajador; SQLite serializa las
+#     escrituras, así que cada fila la gana uno solo.
+#
+# Si un trabajo falla se reintenta con espera exponencial hasta
+# max_intentos; los que quedan 'en_curso' más de TRABAJOS_VISIBILIDAD
+# segundos (trabajador caído) vuelven a la cola.
+#
+# Tipos de trabajo: funciones registradas con @tarea('nombre').
+
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+TAREAS = {}
+
+
+def tarea(nombre):
+    """Registra la función como tipo de trabajo `nombre`."""
+    def registrar(funcion):
+        TAREAS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, retraso=0, max_intentos=None, **argumentos):
+    """
+    Agrega un trabajo a la cola (en la transacción en curso, si la hay).
+    `argumentos` debe ser serializable a JSON.
+    """
+    if tipo not in TAREAS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    return Trabajo.objects.create(
+        tipo=tipo,
+        argumentos=argumentos,
+        disponible_en=timezone.now() + timedelta(seconds=retraso),
+        max_intentos=max_intentos or settings.TRABAJOS_MAX_INTENTOS,
+    )
+
+
+# ==============================
+# Tomar trabajos
+# ==============================
+
+def reclamar(trabajador, cantidad=1, tipos=None):
+    """Marca hasta `cantidad` trabajos pendientes como en curso y los devuelve."""
+    pendientes = Trabajo.objects.filter(
+        estado=Trabajo.PENDIENTE, disponible_en__lte=timezone.now()
+    ).order_by('disponible_en', 'id')
+    if tipos:
+        pendientes = pendientes.filter(tipo__in=tipos)
+    token = f"{trabajador}:{uuid.uuid4().hex[:12]}"
+    cambios = {
+        'estado': Trabajo.EN_CURSO,
+        'bloqueado_por': token,
+        'bloqueado_en': timezone.now(),
+        'intentos': F('intentos') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                pendientes.select_for_update(skip_locked=True).values_list('id', flat=True)[:cantidad]
+            )
+            if not ids:
+                return []
+            Trabajo.objects.filter(id__in=ids).update(**cambios)
+    else:
+        tomados = Trabajo.objects.filter(
+            id__in=pendientes.values('id')[:cantidad], estado=Trabajo.PENDIENTE
+        ).update(**cambios)
+        if not tomados:
+            return []
+    return list(Trabajo.objects.filter(bloqueado_por=token, estado=Trabajo.EN_CURSO).order_by('id'))
+
+
+def recuperar_abandonados():
+    """Devuelve a la cola los trabajos en curso de trabajadores que no terminaron."""
+    limite = timezone.now() - timedelta(seconds=settings.TRABAJOS_VISIBILIDAD)
+    return Trabajo.objects.filter(estado=Trabajo.EN_CURSO, bloqueado_en__lt=limite).update(
+        estado=Trabajo.PENDIENTE, bloqueado_por='', bloqueado_en=None,
+    )
+
+
+# ==============================
+# Ejecutar
+# ==============================
+
+def ejecutar(trabajo):
+    """
+    Corre un trabajo ya reclamado y guarda el resultado o el error.
+    Devuelve True si terminó bien. Solo se escribe si el trabajo sigue
+    siendo de este trabajador (no lo recuperó otro por vencido).
+
+    La tarea no va envuelta en una transacción: abre las suyas si las
+    necesita (una transacción larga mientras se renderiza retendría
+    bloqueos y, en SQLite, choca con las escrituras de los otros hilos).
+    Debe poder repetirse: un reintento vuelve a correrla entera.
+    """
+    propio = Trabajo.objects.filter(pk=trabajo.pk, bloqueado_por=trabajo.bloqueado_por)
+    try:
+        resultado = TAREAS[trabajo.tipo](**trabajo.argumentos)
+    except Exception as exc:
+        error = ''.join(traceback.format_exception(exc))[-4000:]
+        if trabajo.intentos >= trabajo.max_intentos:
+            logger.error("Trabajo %s (%s) fallido tras %s intentos", trabajo.pk, trabajo.tipo, trabajo.intentos)
+            propio.update(estado=Trabajo.FALLIDO, ultimo_error=error, terminado_en=timezone.now())
+        else:
+            espera = min(settings.TRABAJOS_REINTENTO_BASE * 2 ** (trabajo.intentos - 1), 3600)
+            logger.warning("Trabajo %s (%s) falló; reintento en %s s", trabajo.pk, trabajo.tipo, espera)
+            propio.update(
+                estado=Trabajo.PENDIENTE, ultimo_error=error, bloqueado_por='', bloqueado_en=None,
+                disponible_en=timezone.now() + timedelta(seconds=espera),
+            )
+        return False
+    propio.update(estado=Trabajo.HECHO, resultado=resultado, terminado_en=timezone.now())
+    return True
+
+
+def procesar_pendientes(trabajador='en-linea', tipos=None, lote=10):
+    """Ejecuta en este hilo todo lo pendiente y disponible. Devuelve cuántos corrió."""
+    total = 0
+    while trabajos := reclamar(trabajador, lote, tipos):
+        for trabajo in trabajos:
+            ejecutar(trabajo)
+            total += 1
+    return total
+
+
+def purgar(dias):
+    """Borra los trabajos hechos hace más de `dias` días."""
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = Trabajo.objects.filter(estado=Trabajo.HECHO, terminado_en__lt=limite).delete()
+    return borrados
+
+
+def estadisticas():
+    """{estado: cantidad} de la cola."""
+    conteo = dict.fromkeys((estado for estado, _ in Trabajo.ESTADOS), 0)
+    for estado, cantidad in (
+        Trabajo.objects.values_list('estado').order_by().annotate(n=Count('id'))
+    ):
+        conteo[estado] = cantidad
+    return conteo
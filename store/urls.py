@@ -2,13 +2,30 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoriaViewSet, ProductoViewSet, PedidoViewSet
+
+from .asincrono import asincrono_habilitado, con_lectura_asincrona
+from .views import (
+  CacheCatalogoView,
+  CategoriaViewSet,
+  PedidoViewSet,
+  PoolBaseDatosView,
+  ProductoViewSet,
+  ReservaViewSet,
+  VentasView,
+)
 
 router = DefaultRouter()
 router.register(r'categorias', CategoriaViewSet, basename='categoria')
 router.register(r'productos', ProductoViewSet, basename='producto')
 router.register(r'pedidos', PedidoViewSet, basename='pedido')  
+router.register(r'reservas', ReservaViewSet, basename='reserva')
+
+# Bajo ASGI los GET de lista/detalle del catálogo van por store/asincrono.py
+rutas_router = con_lectura_asincrona(router.urls) if asincrono_habilitado() else router.urls
 
 urlpatterns = [
-  path('', include(router.urls)),
+  path('catalogo/cache/', CacheCatalogoView.as_view(), name='catalogo-cache'),
+  path('analitica/ventas/', VentasView.as_view(), name='analitica-ventas'),
+  path('sistema/db/', PoolBaseDatosView.as_view(), name='sistema-db'),
+  path('', include(rutas_router)),
 ]
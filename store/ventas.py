@@ -0,0 +1,259 @@
+# store/ventas.py
+#
+# Resúmenes diarios de ventas (VentaDiaria, VentaDiariaCategoria y
+# VentaDiariaProducto) y las consultas de analítica que los leen.
+#
+# Se mantienen de forma incremental: PedidoSerializer.create suma el
+# pedido a las filas del día dentro de su misma transacción (un INSERT
+# que ignora las filas ya existentes + un UPDATE con incrementos
+# F() por tabla), así que nunca hay que recorrer PedidoItem para
+# responder. `manage.py reconstruir_ventas` los recalcula desde cero para
+# un rango de fechas.
+#
+# El día de un pedido es la fecha local (TIME_ZONE) de su creado_en.
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from rest_framework import serializers
+
+from .exportacion import filtro_rango
+from .models import PedidoItem, Producto, VentaDiaria, VentaDiariaCategoria, VentaDiariaProducto
+
+DINERO = DecimalField(max_digits=14, decimal_places=2)
+ENTERO = IntegerField()
+
+AGRUPACIONES = {
+    'dia': None,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+# ==============================
+# Mantenimiento incremental
+# ==============================
+
+def _acumular(modelo, fecha, campo, incrementos):
+    """
+    Suma `incrementos` = {clave: (pedidos, unidades, ingresos)} a las
+    filas de `fecha` (campo=None: la única fila del día).
+    """
+    if not incrementos:
+        return
+    if campo is None:
+        ((pedidos, unidades, ingresos),) = incrementos.values()
+        modelo.objects.bulk_create([modelo(fecha=fecha)], ignore_conflicts=True)
+        modelo.objects.filter(fecha=fecha).update(
+            pedidos=F('pedidos') + pedidos,
+            unidades=F('unidades') + unidades,
+            ingresos=F('ingresos') + ingresos,
+        )
+        return
+
+    modelo.objects.bulk_create(
+        [modelo(fecha=fecha, **{campo: clave}) for clave in incrementos],
+        ignore_conflicts=True,
+    )
+
+    def caso(indice, tipo):
+        return Case(
+            *[When(**{campo: clave}, then=Value(valores[indice], output_field=tipo))
+              for clave, valores in incrementos.items()],
+            output_field=tipo,
+        )
+
+    modelo.objects.filter(fecha=fecha, **{f'{campo}__in': list(incrementos)}).update(
+        pedidos=F('pedidos') + caso(0, ENTERO),
+        unidades=F('unidades') + caso(1, ENTERO),
+        ingresos=F('ingresos') + caso(2, DINERO),
+    )
+
+
+def registrar_pedido(pedido, items, categorias=None, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) un pedido a los resúmenes de su día.
+    Cada ítem cuenta en la categoría con que se vendió (PedidoItem.categoria),
+    así que restar un pedido deshace exactamente lo que sumó aunque el
+    producto haya cambiado de categoría. `categorias` = {producto_id:
+    categoria_id} para los ítems sin ella; las que falten se leen del
+    producto. Debe llamarse dentro de la transacción que crea/borra el
+    pedido.
+    """
+    por_producto = defaultdict(lambda: [0, Decimal('0')])
+    for item in items:
+        acumulado = por_producto[item.producto_id]
+        acumulado[0] += item.cantidad
+        acumulado[1] += item.cantidad * item.precio_unitario
+    if not por_producto:
+        return
+
+    categorias = dict(categorias or {})
+    categorias.update({item.producto_id: item.categoria_id for item in items if item.categoria_id})
+    faltan = set(por_producto) - set(categorias)
+    if faltan:
+        categorias.update(
+            Producto.objects.filter(id__in=list(faltan)).values_list('id', 'categoria_id')
+        )
+
+    por_categoria = defaultdict(lambda: [0, Decimal('0')])
+    for producto_id, (unidades, ingresos) in por_producto.items():
+        acumulado = por_categoria[categorias[producto_id]]
+        acumulado[0] += unidades
+        acumulado[1] += ingresos
+
+    def con_signo(agrupado):
+        # Un pedido cuenta una vez por producto/categoría que contiene
+        return {
+            clave: (signo, signo * unidades, signo * ingresos)
+            for clave, (unidades, ingresos) in agrupado.items()
+        }
+
+    fecha = timezone.localdate(pedido.creado_en)
+    unidades = sum(u for u, _ in por_producto.values())
+    ingresos = sum(i for _, i in por_producto.values())
+    _acumular(VentaDiaria, fecha, None, {None: (signo, signo * unidades, signo * ingresos)})
+    _acumular(VentaDiariaCategoria, fecha, 'categoria_id', con_signo(por_categoria))
+    _acumular(VentaDiariaProducto, fecha, 'producto_id', con_signo(por_producto))
+
+
+# ==============================
+# Reconstrucción
+# ==============================
+
+def reconstruir_ventas(desde=None, hasta=None, lote=5000):
+    """
+    Recalcula los resúmenes de los días entre `desde` y `hasta` (inclusive;
+    None = sin límite) agregando PedidoItem en la base de datos.
+    Devuelve {modelo: filas creadas}.
+    """
+    items = PedidoItem.objects.filter(filtro_rango(desde, hasta, campo='pedido__creado_en'))
+    dia = TruncDate('pedido__creado_en', tzinfo=timezone.get_current_timezone())
+    metricas = {
+        'pedidos': Count('pedido_id', distinct=True),
+        'unidades': Sum('cantidad'),
+        'ingresos': Sum(F('cantidad') * F('precio_unitario'), output_field=DINERO),
+    }
+    # campo del resumen → expresión sobre PedidoItem (la categoría, la de la
+    # venta; la del producto en ítems que no la guardaron)
+    tablas = (
+        (VentaDiaria, {}),
+        (VentaDiariaCategoria, {'categoria_id': Coalesce('categoria_id', 'producto__categoria_id')}),
+        (VentaDiariaProducto, {'producto_id': F('producto_id')}),
+    )
+
+    fechas = {}
+    if desde:
+        fechas['fecha__gte'] = desde
+    if hasta:
+        fechas['fecha__lte'] = hasta
+
+    creadas = {}
+    with transaction.atomic():
+        for modelo, claves in tablas:
+            modelo.objects.filter(**fechas).delete()
+            alias = {campo: f'clave_{campo}' for campo in claves}
+            filas = (
+                items.annotate(dia=dia, **{alias[k]: v for k, v in claves.items()})
+                .values('dia', *alias.values())
+                .annotate(**metricas)
+                .order_by()
+            )
+            total = 0
+            pendientes = []
+            for fila in filas.iterator(chunk_size=lote):
+                pendientes.append(modelo(
+                    fecha=fila['dia'],
+                    pedidos=fila['pedidos'],
+                    unidades=fila['unidades'],
+                    ingresos=fila['ingresos'],
+                    **{campo: fila[alias[campo]] for campo in claves},
+                ))
+                if len(pendientes) >= lote:
+                    total += len(modelo.objects.bulk_create(pendientes))
+                    pendientes = []
+            total += len(modelo.objects.bulk_create(pendientes))
+            creadas[modelo.__name__] = total
+    return creadas
+
+
+# ==============================
+# Consultas (solo leen los resúmenes)
+# ==============================
+
+class ConsultaVentasSerializer(serializers.Serializer):
+    """Parámetros de GET /analitica/ventas/ (por defecto, los últimos 30 días)."""
+    desde = serializers.DateField(required=False)
+    hasta = serializers.DateField(required=False)
+    agrupar = serializers.ChoiceField(choices=tuple(AGRUPACIONES), default='dia')
+    limite = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+    def validate(self, attrs):
+        attrs.setdefault('hasta', timezone.localdate())
+        attrs.setdefault('desde', attrs['hasta'] - timedelta(days=29))
+        if attrs['desde'] > attrs['hasta']:
+            raise serializers.ValidationError("'desde' no puede ser posterior a 'hasta'.")
+        return attrs
+
+
+def _metricas(fila):
+    return {
+        'pedidos': fila['pedidos'] or 0,
+        'unidades': fila['unidades'] or 0,
+        'ingresos': f"{fila['ingresos'] or 0:.2f}",
+    }
+
+
+def _sumas():
+    return {'pedidos': Sum('pedidos'), 'unidades': Sum('unidades'), 'ingresos': Sum('ingresos')}
+
+
+def consultar_ventas(desde, hasta, agrupar='dia', limite=10):
+    rango = {'fecha__gte': desde, 'fecha__lte': hasta}
+
+    dias = VentaDiaria.objects.filter(**rango)
+    truncar = AGRUPACIONES[agrupar]
+    if truncar is None:
+        serie = dias.order_by('fecha').values('fecha', 'pedidos', 'unidades', 'ingresos')
+    else:
+        serie = (
+            dias.annotate(periodo=truncar('fecha')).values('periodo')
+            .annotate(**_sumas()).order_by('periodo')
+        )
+
+    categorias = (
+        VentaDiariaCategoria.objects.filter(**rango)
+        .values('categoria_id', 'categoria__slug', 'categoria__nombre')
+        .annotate(**_sumas())
+        .order_by('-ingresos', 'categoria_id')
+    )
+    productos = (
+        VentaDiariaProducto.objects.filter(**rango)
+        .values('producto_id', 'producto__slug', 'producto__nombre')
+        .annotate(**_sumas())
+        .order_by('-ingresos', 'producto_id')[:limite]
+    )
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'agrupar': agrupar,
+        'totales': _metricas(dias.aggregate(**_sumas())),
+        'serie': [
+            {'fecha': fila.get('fecha') or fila.get('periodo'), **_metricas(fila)}
+            for fila in serie
+        ],
+        'categorias': [
+            {'id': f['categoria_id'], 'slug': f['categoria__slug'], 'nombre': f['categoria__nombre'], **_metricas(f)}
+            for f in categorias
+        ],
+        'productos': [
+            {'id': f['producto_id'], 'slug': f['producto__slug'], 'nombre': f['producto__nombre'], **_metricas(f)}
+            for f in productos
+        ],
+    }
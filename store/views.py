@@ -1,56 +1,175 @@
 # store/views.py
 
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.views import APIView
 
-from .models import Categoria, Producto, Pedido
+from backend.db.pool import metricas_pools
+from . import exportacion, reservas, stock_fragmentado, ventas
+from .busqueda import obtener_indice
+from .cache import CatalogoCacheMixin, estadisticas, memoizar
+from .facetas import aplicar_filtros, calcular_facetas, leer_filtros
+from .lectura_rapida import (
+    CAMPOS_PRODUCTO,
+    JSONRapidoRenderer,
+    LecturaRapidaMixin,
+    lectura_rapida_habilitada,
+    productos_a_dicts,
+)
+from .inventario import StockInsuficiente, disminuir_stock_lote
+from .metricas import AccesoMetricas
+from .models import Categoria, Producto, Pedido, PedidoItem, ReservaStock
+from .pagination import (
+    PaginacionOpcionalMixin,
+    PedidoCursorPagination,
+    ProductoCursorPagination,
+)
 from .serializers import (
+    AjusteReservaSerializer,
+    CategoriaResumenSerializer,
     CategoriaSerializer,
+    LoteStockSerializer,
     ProductoSerializer,
     PedidoSerializer,
+    ReservaSerializer,
+    ReservaStockSerializer,
 )
 
 
-class CategoriaViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoriaViewSet(CatalogoCacheMixin, LecturaRapidaMixin, viewsets.ReadOnlyModelViewSet):
     """
-    Ver todas las categorías con sus productos.
+    GET /categorias/          → índice liviano (id, nombre, slug, total_productos)
+    GET /categorias/<slug>/   → categoría con sus productos
+    GET /categorias/<slug>/productos/ → productos disponibles, paginados por cursor
+
+    Las respuestas se sirven desde la cache del catálogo (store/cache.py).
     """
-    queryset = Categoria.objects.all().prefetch_related('productos')
     serializer_class = CategoriaSerializer
     lookup_field = 'slug'
+    renderer_classes = (JSONRapidoRenderer, BrowsableAPIRenderer)
+    campos_rapidos = ('id', 'nombre', 'slug', 'total_productos')
+
+    def get_queryset(self):
+        if self.action == 'list':
+            # Una sola consulta: categorías + conteo de productos disponibles
+            return Categoria.objects.annotate(
+                total_productos=Count('productos', filter=Q(productos__disponible=True))
+            ).order_by('id')
+        if self.action == 'productos':
+            return Categoria.objects.only('id', 'slug')
+        return Categoria.objects.all().prefetch_related('productos')
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return CategoriaResumenSerializer
+        return super().get_serializer_class()
 
     def get_serializer_context(self):
         return {'request': self.request}
 
+    @action(detail=True, methods=['get'])
+    def productos(self, request, slug=None):
+        """
+        GET /api/v1/categorias/<slug>/productos/?cursor=...&orden=...
+        Igual que GET /productos/ pero limitado a la categoría.
+        """
+        return self.respuesta_cacheada(self._productos_paginados, request, slug=slug)
+
+    def _productos_paginados(self, request, slug=None):
+        categoria = self.get_object()
+        qs = (
+            Producto.objects.select_related('categoria')
+            .filter(categoria=categoria, disponible=True)
+        )
+        paginador = ProductoCursorPagination()
+        if lectura_rapida_habilitada():
+            pagina = paginador.paginate_queryset(qs.values(*CAMPOS_PRODUCTO), request, view=self)
+            return paginador.get_paginated_response(productos_a_dicts(pagina, request))
+        pagina = paginador.paginate_queryset(qs, request, view=self)
+        serializer = ProductoSerializer(pagina, many=True, context=self.get_serializer_context())
+        return paginador.get_paginated_response(serializer.data)
+
 
-class ProductoViewSet(viewsets.ModelViewSet):
+class ProductoViewSet(CatalogoCacheMixin, LecturaRapidaMixin, PaginacionOpcionalMixin, viewsets.ModelViewSet):
     """
     CRUD completo de productos + acción para disminuir stock.
+
+    La lista va paginada por cursor; con ?todos=1 se devuelve el listado
+    completo sin paginar (formato anterior). Lista y detalle se sirven
+    desde la cache del catálogo.
+
+    Filtros de la lista: ?categoria=slug[,slug] &precio_min= &precio_max=
+    &es_nuevo= &tiene_descuento= &en_stock=  (booleanos: true/false).
+    Con ?facetas=1 la respuesta paginada incluye los conteos por faceta.
     """
     serializer_class = ProductoSerializer
     lookup_field = 'slug'
+    pagination_class = ProductoCursorPagination
+    renderer_classes = (JSONRapidoRenderer, BrowsableAPIRenderer)
+    campos_rapidos = CAMPOS_PRODUCTO
 
     # 🔹 Aceptar multipart/form-data para subir imágenes
     parser_classes = (MultiPartParser, FormParser, JSONParser)
 
     def get_queryset(self):
-        qs = Producto.objects.all()
+        # select_related evita una consulta por fila al pintar 'categoria'
+        qs = Producto.objects.select_related('categoria')
         # Para la lista solo mostramos productos disponibles
         if self.action == 'list':
-            qs = qs.filter(disponible=True)
+            qs = aplicar_filtros(qs.filter(disponible=True), self.filtros)
         return qs
 
+    def convertir_filas(self, filas):
+        return productos_a_dicts(filas, self.request)
+
+    @property
+    def filtros(self):
+        if not hasattr(self, '_filtros'):
+            self._filtros = leer_filtros(self.request.query_params)
+        return self._filtros
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        facetas = self.facetas()
+        if facetas is not None:
+            response.data['facetas'] = facetas
+        return response
+
+    def facetas(self):
+        """Conteos por faceta si se pidieron con ?facetas=1 (si no, None)."""
+        if self.request.query_params.get('facetas') not in ('1', 'true', 'True'):
+            return None
+        # Las facetas no dependen del cursor: se reutilizan al paginar
+        return memoizar(
+            'facetas',
+            sorted(self.filtros.items()),
+            lambda: calcular_facetas(Producto.objects.filter(disponible=True), self.filtros),
+        )
+
     def get_serializer_context(self):
         return {'request': self.request}
 
+    def perform_update(self, serializer):
+        producto = serializer.save()
+        # Reposición de un producto fragmentado: se reparte el nuevo total
+        if producto.stock_fragmentado and 'stock' in serializer.validated_data:
+            stock_fragmentado.rebalancear(producto.pk, total=producto.stock)
+
     # Acción para disminuir stock (usada desde el checkout)
     @action(detail=True, methods=['post'])
     def disminuir_stock(self, request, slug=None):
         """
         POST /api/v1/productos/<slug>/disminuir_stock/
-        Body JSON: { "cantidad": 3 }
+        Body JSON: { "cantidad": 3, "carrito": "..." (opcional) }
         """
         producto = self.get_object()
 
@@ -68,23 +187,268 @@ class ProductoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if producto.stock < cantidad:
+        # Descuento condicional con F(): sin carreras entre compradores
+        try:
+            [linea] = disminuir_stock_lote(
+                [{'slug': producto.slug, 'cantidad': cantidad}],
+                carrito=request.data.get('carrito') or None,
+            )
+        except StockInsuficiente:
             return Response(
                 {"detail": "Stock insuficiente."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        producto.stock -= cantidad
-        producto.save()
-
+        producto.stock = linea['stock']
         serializer = self.get_serializer(producto)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    # Búsqueda de texto sobre el índice en memoria (store/busqueda.py)
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        GET /api/v1/productos/buscar/?q=pokemon&limite=20
 
-class PedidoViewSet(viewsets.ModelViewSet):
+        El ranking (BM25) se resuelve en memoria; a la base de datos solo
+        se va una vez para traer los productos de la página de resultados.
+        """
+        consulta = request.query_params.get('q', '').strip()
+        if not consulta:
+            return Response(
+                {"detail": "El parámetro 'q' es obligatorio."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+        except ValueError:
+            limite = 20
+
+        coincidencias, mejores = obtener_indice().buscar(consulta, limite)
+        ids = [producto_id for producto_id, _ in mejores]
+        productos = self.get_queryset().filter(disponible=True).in_bulk(ids)
+        ordenados = [productos[pk] for pk in ids if pk in productos]
+
+        serializer = self.get_serializer(ordenados, many=True)
+        return Response({
+            "q": consulta,
+            "count": coincidencias,
+            "results": serializer.data,
+        })
+
+    # Descuento de stock de todo el carrito en una sola petición
+    @action(detail=False, methods=['post'])
+    def disminuir_stock_lote(self, request):
+        """
+        POST /api/v1/productos/disminuir_stock_lote/
+        Body JSON: { "items": [{ "slug": "catan", "cantidad": 2 }, ...], "carrito": "..." }
+
+        Todo o nada: si alguna línea no tiene stock no se descuenta ninguna
+        y se responde 400 con el detalle de cada línea. Con "carrito", sus
+        reservas sobre esos productos se convierten en venta.
+        """
+        serializer = LoteStockSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            lineas = disminuir_stock_lote(
+                serializer.validated_data['items'],
+                carrito=serializer.validated_data.get('carrito'),
+            )
+        except StockInsuficiente as exc:
+            return Response(
+                {"detail": "Stock insuficiente.", "items": exc.lineas},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({"items": lineas}, status=status.HTTP_200_OK)
+
+
+class ReservaViewSet(viewsets.GenericViewSet):
+    """
+    Reservas de stock de un carrito (store/reservas.py). El carrito es
+    un identificador opaco que genera el frontend y se envía siempre.
+
+    POST   /reservas/               { "carrito": "...", "items": [{ "slug", "cantidad" }] }
+    GET    /reservas/?carrito=...   reservas vigentes del carrito
+    DELETE /reservas/<id>/?carrito=...
+    POST   /reservas/ajustar/       { "carrito", "slug", "cantidad" } → deja
+                                    apartada esa cantidad del producto (0 = libera)
+    POST   /reservas/liberar/       { "carrito": "..." } → libera todas
+    """
+    serializer_class = ReservaStockSerializer
+
+    def get_queryset(self):
+        carrito = self.request.query_params.get('carrito') or self.request.data.get('carrito')
+        return (
+            ReservaStock.objects.filter(carrito=carrito or '')
+            .select_related('producto').only('id', 'cantidad', 'expira_en', 'producto__slug')
+            .order_by('id')
+        )
+
+    def respuesta_carrito(self, carrito, codigo=status.HTTP_200_OK):
+        items = self.get_serializer(self.get_queryset(), many=True).data
+        return Response({"carrito": carrito, "items": items}, status=codigo)
+
+    def list(self, request):
+        carrito = request.query_params.get('carrito')
+        if not carrito:
+            return Response(
+                {"detail": "El parámetro 'carrito' es obligatorio."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.respuesta_carrito(carrito)
+
+    def create(self, request):
+        serializer = ReservaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        carrito = serializer.validated_data['carrito']
+        try:
+            reservas.reservar(carrito, serializer.validated_data['items'])
+        except StockInsuficiente as exc:
+            return Response(
+                {"detail": "Stock insuficiente.", "items": exc.lineas},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.respuesta_carrito(carrito, status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        reserva = self.get_object()
+        reservas.liberar(reserva.carrito, ids=[reserva.pk])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def ajustar(self, request):
+        serializer = AjusteReservaSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        try:
+            reservas.fijar(datos['carrito'], datos['slug'], datos['cantidad'])
+        except StockInsuficiente as exc:
+            return Response(
+                {"detail": "Stock insuficiente.", "items": exc.lineas},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return self.respuesta_carrito(datos['carrito'])
+
+    @action(detail=False, methods=['post'])
+    def liberar(self, request):
+        carrito = request.data.get('carrito')
+        if not carrito:
+            return Response(
+                {"detail": "El campo 'carrito' es obligatorio."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({"liberadas": reservas.liberar(carrito)})
+
+
+class PedidoViewSet(PaginacionOpcionalMixin, viewsets.ModelViewSet):
     """
     CRUD de pedidos. Por ahora dejamos acceso abierto.
+
+    La lista va paginada por cursor (más recientes primero) y acepta
+    ?user_uid=... y ?email=... para el historial de un cliente.
+
+    GET /pedidos/exportar/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&formato=csv|ndjson
+    descarga los pedidos del rango en streaming (store/exportacion.py).
+
+    GET /pedidos/<id>/factura/ devuelve la factura HTML, o 202 mientras
+    el trabajo que la genera sigue en la cola (store/facturas.py).
     """
-    queryset = Pedido.objects.all().order_by('-creado_en')
     serializer_class = PedidoSerializer
     lookup_field = 'id'
+    pagination_class = PedidoCursorPagination
+
+    def get_queryset(self):
+        # Los ítems de toda la página se traen en una sola consulta
+        qs = Pedido.objects.prefetch_related(
+            Prefetch(
+                'items',
+                queryset=PedidoItem.objects.only(
+                    'id', 'pedido_id', 'producto_id', 'categoria_id', 'cantidad', 'precio_unitario'
+                ),
+            )
+        ).order_by('-creado_en', '-id')
+
+        if self.action == 'list':
+            params = self.request.query_params
+            if params.get('user_uid'):
+                qs = qs.filter(user_uid=params['user_uid'])
+            if params.get('email'):
+                qs = qs.filter(email=params['email'])
+        return qs
+
+    def perform_destroy(self, instance):
+        # El pedido deja de contar en los resúmenes de ventas
+        with transaction.atomic():
+            ventas.registrar_pedido(instance, list(instance.items.all()), signo=-1)
+            instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        params = exportacion.RangoExportacionSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        formato, desde, hasta = (params.validated_data.get(k) for k in ('formato', 'desde', 'hasta'))
+
+        bloques = exportacion.exportar(formato, desde, hasta)
+        if isinstance(request._request, ASGIRequest):
+            bloques = exportacion.en_asincrono(bloques)
+        response = StreamingHttpResponse(
+            bloques,
+            content_type=exportacion.FORMATOS[formato][0],
+        )
+        archivo = exportacion.nombre_archivo(formato, desde, hasta)
+        response['Content-Disposition'] = f'attachment; filename="{archivo}"'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def factura(self, request, id=None):
+        pedido = get_object_or_404(Pedido.objects.only('id', 'factura'), id=id)
+        if not pedido.factura:
+            return Response(
+                {'detail': 'La factura se está generando.'},
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Retry-After': '5'},
+            )
+        return FileResponse(
+            default_storage.open(pedido.factura, 'rb'),
+            content_type='text/html; charset=utf-8',
+            filename=pedido.factura.rsplit('/', 1)[-1],
+        )
+
+
+class VentasView(APIView):
+    """
+    GET /api/v1/analitica/ventas/?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&agrupar=dia|semana|mes&limite=10
+    Totales, serie temporal, ventas por categoría y productos más
+    vendidos. Solo lee los resúmenes diarios (store/ventas.py).
+    """
+
+    def get(self, request):
+        params = ventas.ConsultaVentasSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(ventas.consultar_ventas(**params.validated_data))
+
+
+class CacheCatalogoView(APIView):
+    """
+    GET /api/v1/catalogo/cache/
+    Aciertos/fallos de la cache del catálogo en este proceso. Datos
+    internos: mismo acceso que /metrics.
+    """
+    permission_classes = [AccesoMetricas]
+
+    def get(self, request):
+        return Response(estadisticas())
+
+
+class PoolBaseDatosView(APIView):
+    """
+    GET /api/v1/sistema/db/
+    Estado del pool de conexiones de este proceso (vacío si el motor no usa pool).
+    Datos internos: mismo acceso que /metrics.
+    """
+    permission_classes = [AccesoMetricas]
+
+    def get(self, request):
+        return Response(metricas_pools())